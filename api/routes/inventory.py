@@ -3,11 +3,12 @@ inventory.py
 
 Defines FastAPI routes for inventory management.
 """
-from fastapi import APIRouter, UploadFile, File, Form
-from app.ocr import extract_text
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from app.ocr import extract_pdf_text, extract_text
 from app.parser import parse_items
 from app.inventory import update_inventory
 from app.logger import setup_logger
+from app.utils import UnreadableUpload, is_pdf
 import shutil
 import os
 
@@ -17,10 +18,10 @@ setup_logger()
 @router.post("/upload-bill/")
 async def upload_bill(file: UploadFile = File(...), bill_type: str = Form(...)):
     """
-    Uploads a bill image and updates inventory based on extracted data.
+    Uploads a bill image or PDF and updates inventory based on extracted data.
 
     Args:
-        file (UploadFile): Image file of the bill.
+        file (UploadFile): Image or PDF file of the bill.
         bill_type (str): Either "purchase" or "sale".
 
     Returns:
@@ -31,7 +32,12 @@ async def upload_bill(file: UploadFile = File(...), bill_type: str = Form(...)):
     with open(temp_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
-    text = extract_text(temp_path)
+    with open(temp_path, "rb") as buffer:
+        header = buffer.read(1024)
+    try:
+        text = extract_pdf_text(temp_path) if is_pdf(header) else extract_text(temp_path)
+    except UnreadableUpload as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     items = parse_items(text)
     update_inventory(items, bill_type)
 
@@ -0,0 +1,164 @@
+"""
+adjustments.py
+
+Applies stock counts and manual corrections in bulk.
+
+A request may carry tens of thousands of lines, so nothing here goes
+through per-object ORM flushes. The write lock is taken first, then
+items are resolved in chunks of IN queries. New quantities are computed
+in memory. Quantities are updated with one executemany and movements
+and alerts are inserted in bulk, all in the caller's transaction. Bulk
+statements skip the session events in models, so low-stock alerts and
+data_version are handled here explicitly.
+"""
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from . import config, models, schemas
+
+CHUNK_SIZE = 500  # IN-list size, well below SQLite's bind-parameter limit
+EVENT_ITEM_LIMIT = 500  # larger batches publish a reset instead of every changed item
+
+
+class UnknownItems(Exception):
+    """Raised when adjustment lines reference items the owner does not have."""
+
+    def __init__(self, references: List):
+        super().__init__(f"{len(references)} unknown item reference(s)")
+        self.references = references
+
+
+def _chunks(values: List, size: int = CHUNK_SIZE) -> Iterable[List]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _begin_write(db: Session):
+    """
+    Take the write lock before items are read.
+
+    New quantities are computed from the rows read, so a bill committed
+    between the read and the update would be overwritten. pysqlite only
+    begins a transaction at the first write, so on SQLite the transaction
+    is started with BEGIN IMMEDIATE; other backends lock the rows with
+    SELECT ... FOR UPDATE in _load_items.
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def _load_items(db: Session, owner_id: int, lines: List[schemas.StockAdjustmentLine]) -> Tuple[Dict, Dict]:
+    ids = sorted({line.item_id for line in lines if line.item_id is not None})
+    skus = sorted({line.sku for line in lines if line.sku is not None})
+    columns = (models.Item.id, models.Item.name, models.Item.sku, models.Item.quantity,
+               models.Item.unit_price, models.Item.reorder_threshold)
+
+    by_id, by_sku = {}, {}
+    for column, values in ((models.Item.id, ids), (models.Item.sku, skus)):
+        for chunk in _chunks(values):
+            rows = db.execute(
+                select(*columns).where(models.Item.owner_id == owner_id, column.in_(chunk)).with_for_update()
+            ).mappings()
+            for row in rows:
+                row = dict(row)
+                row = by_id.setdefault(row["id"], row)
+                if row["sku"] is not None:
+                    by_sku[row["sku"]] = row
+    return by_id, by_sku
+
+
+def apply_adjustments(db: Session, owner_id: int, lines: List[schemas.StockAdjustmentLine],
+                      note: Optional[str] = None) -> Tuple[str, List[Dict]]:
+    """
+    Apply adjustment lines to an owner's stock as one transaction.
+
+    Lines are applied in order, so several lines for one item compose.
+    ``counted`` sets the quantity, ``delta`` adds to it. Every line that
+    moves stock records a StockMovement. Lines that leave the quantity
+    unchanged record nothing.
+
+    Args:
+        db (Session): Database session; committed on success.
+        owner_id (int): Owner of the items.
+        lines (list): StockAdjustmentLine entries.
+        note (str, optional): Stored on every movement.
+
+    Returns:
+        tuple: The batch id and the changed items as {id, name, sku, quantity, unit_price}
+        dicts, complete enough for clients to add items they have not loaded.
+
+    Raises:
+        UnknownItems: Some lines reference missing items; nothing is written.
+    """
+    _begin_write(db)
+    by_id, by_sku = _load_items(db, owner_id, lines)
+    unknown = [
+        {"item_id": line.item_id} if line.item_id is not None else {"sku": line.sku}
+        for line in lines
+        if (by_id.get(line.item_id) if line.item_id is not None else by_sku.get(line.sku)) is None
+    ]
+    if unknown:
+        db.rollback()
+        raise UnknownItems(unknown)
+
+    batch_id = uuid.uuid4().hex
+    original = {item_id: row["quantity"] for item_id, row in by_id.items()}
+    movements = []
+    for line in lines:
+        row = by_id[line.item_id] if line.item_id is not None else by_sku[line.sku]
+        previous = row["quantity"] or 0
+        quantity = line.counted if line.counted is not None else previous + line.delta
+        if quantity == previous:
+            continue
+        row["quantity"] = quantity
+        movements.append({
+            "item_id": row["id"],
+            "owner_id": owner_id,
+            "batch_id": batch_id,
+            "reason": "count" if line.counted is not None else "delta",
+            "previous_quantity": previous,
+            "quantity": quantity,
+            "change": quantity - previous,
+            "note": note,
+        })
+
+    changed = [row for item_id, row in by_id.items() if row["quantity"] != original[item_id]]
+    if changed:
+        db.execute(update(models.Item), [{"id": row["id"], "quantity": row["quantity"]} for row in changed])
+        db.execute(insert(models.StockMovement), movements)
+        _update_alerts(db, owner_id, changed, original)
+        models.increment_data_versions(db, [owner_id])
+    db.commit()
+    return batch_id, [
+        {key: row[key] for key in ("id", "name", "sku", "quantity", "unit_price")} for row in changed
+    ]
+
+
+def _update_alerts(db: Session, owner_id: int, changed: List[Dict], original: Dict):
+    """Open and resolve low-stock alerts the way models.check_reorder_thresholds does."""
+    opened, recovered = [], []
+    for row in changed:
+        threshold = row["reorder_threshold"] if row["reorder_threshold"] is not None else config.LOW_STOCK_THRESHOLD
+        previous = original[row["id"]]
+        was_low = previous is not None and previous < threshold
+        is_low = row["quantity"] < threshold
+        if is_low and not was_low:
+            opened.append({"item_id": row["id"], "owner_id": owner_id,
+                           "quantity": row["quantity"], "threshold": threshold})
+        elif was_low and not is_low:
+            recovered.append(row["id"])
+
+    if opened:
+        db.execute(insert(models.StockAlert), opened)
+    for chunk in _chunks(recovered):
+        db.execute(
+            update(models.StockAlert)
+            .where(models.StockAlert.item_id.in_(chunk), models.StockAlert.resolved_at.is_(None))
+            .values(resolved_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
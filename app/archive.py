@@ -0,0 +1,238 @@
+"""
+archive.py
+
+Moves old bills out of the database into compressed Parquet files.
+
+Bills older than ARCHIVE_AFTER_DAYS are written, together with their line
+items, to one directory per owner and month
+(``ARCHIVE_DIR/owner=<id>/<YYYY-MM>/part-<digest>.parquet``) and then
+deleted from ``bills`` and ``bill_items``. Each batch adds new part files
+rather than rewriting the month. Item stock levels are left untouched:
+archiving moves history, it does not undo it.
+
+Usage:
+    python -m app.archive [--older-than-days 365]
+"""
+import argparse
+import hashlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session, selectinload
+
+from . import config, models
+
+BILL_FIELDS = ("id", "bill_number", "bill_date", "total_amount", "bill_type", "image_path",
+               "owner_id", "created_at", "updated_at")
+BILL_ITEM_FIELDS = ("id", "item_id", "quantity", "unit_price", "total_price", "created_at")
+
+
+def _schema():
+    import pyarrow as pa
+
+    timestamp = pa.timestamp("us")
+    return pa.schema([
+        ("bill_id", pa.int64()),
+        ("bill_number", pa.string()),
+        ("bill_date", timestamp),
+        ("total_amount", pa.float64()),
+        ("bill_type", pa.string()),
+        ("image_path", pa.string()),
+        ("owner_id", pa.int64()),
+        ("bill_created_at", timestamp),
+        ("bill_updated_at", timestamp),
+        ("bill_item_id", pa.int64()),
+        ("item_id", pa.int64()),
+        ("quantity", pa.int64()),
+        ("unit_price", pa.float64()),
+        ("total_price", pa.float64()),
+        ("bill_item_created_at", timestamp),
+    ])
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def archive_path(owner_id: int, month: str, directory: Path = None) -> Path:
+    """The directory holding an owner's part files for a month."""
+    return (directory or config.ARCHIVE_DIR) / f"owner={owner_id}" / month
+
+
+def history_key(bill: Dict):
+    """Sort key of bill history: by date (undated first), then id."""
+    return (bill["bill_date"] or datetime.min, bill["id"])
+
+
+def bill_rows(bill: models.Bill) -> List[Dict]:
+    """Flatten a bill into one row per line item (one row with empty item fields if it has none)."""
+    base = {f"bill_{name}" if name in ("id", "created_at", "updated_at") else name: getattr(bill, name)
+            for name in BILL_FIELDS}
+    base = {key: _naive_utc(value) if isinstance(value, datetime) else value for key, value in base.items()}
+    empty = {"bill_item_id": None, "item_id": None, "quantity": None, "unit_price": None,
+             "total_price": None, "bill_item_created_at": None}
+    if not bill.items:
+        return [{**base, **empty}]
+    return [
+        {
+            **base,
+            "bill_item_id": bill_item.id,
+            "item_id": bill_item.item_id,
+            "quantity": bill_item.quantity,
+            "unit_price": bill_item.unit_price,
+            "total_price": bill_item.total_price,
+            "bill_item_created_at": _naive_utc(bill_item.created_at),
+        }
+        for bill_item in bill.items
+    ]
+
+
+def write_month(month_dir: Path, rows: List[Dict]) -> Path:
+    """
+    Add rows to a month as a new part file.
+
+    The file is named after a digest of its rows, so re-running a batch
+    after an interrupted archive replaces its part instead of adding a
+    second copy; readers also drop repeated rows.
+
+    Returns:
+        Path: The part file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    digest = hashlib.sha256(repr(sorted(rows, key=lambda row: (row["bill_id"], row["bill_item_id"] or 0)))
+                            .encode()).hexdigest()[:16]
+    path = month_dir / f"part-{digest}.parquet"
+    month_dir.mkdir(parents=True, exist_ok=True)
+    tmp = month_dir / f".{path.name}.tmp"  # dot files are skipped when the month is read
+    pq.write_table(pa.Table.from_pylist(rows, schema=_schema()), tmp, compression="zstd")
+    tmp.replace(path)
+    return path
+
+
+def archive_bills(db: Session, older_than: datetime, batch_size: int = 500,
+                  directory: Path = None) -> int:
+    """
+    Archive and delete every bill dated before ``older_than``.
+
+    Each batch is written to Parquet before it is deleted, and deleted in a
+    single transaction.
+
+    Returns:
+        int: Number of bills archived.
+    """
+    archived = 0
+    while True:
+        batch = db.query(models.Bill).options(selectinload(models.Bill.items)).filter(
+            models.Bill.bill_date < older_than
+        ).order_by(models.Bill.id).limit(batch_size).all()
+        if not batch:
+            return archived
+
+        months = defaultdict(list)
+        for bill in batch:
+            months[(bill.owner_id, bill.bill_date.strftime("%Y-%m"))].extend(bill_rows(bill))
+        for (owner_id, month), rows in months.items():
+            write_month(archive_path(owner_id, month, directory), rows)
+
+        for bill in batch:
+            for bill_item in bill.items:
+                db.delete(bill_item)
+            db.delete(bill)
+        db.commit()
+        archived += len(batch)
+
+
+def _months(start: Optional[datetime], end: Optional[datetime], paths: Iterable[Path]) -> List[Path]:
+    low = start.strftime("%Y-%m") if start else ""
+    high = end.strftime("%Y-%m") if end else "9999-99"
+    return sorted(path for path in paths if path.is_dir() and low <= path.name <= high)
+
+
+def read_archived_bills(owner_id: int, start: Optional[datetime] = None,
+                        end: Optional[datetime] = None, directory: Path = None,
+                        limit: Optional[int] = None) -> List[Dict]:
+    """
+    Load an owner's archived bills dated in [start, end).
+
+    Only the months overlapping the range are opened, oldest first, and
+    with ``limit`` reading stops at the first month that completes it.
+
+    Returns:
+        list: Bill dicts shaped like schemas.Bill, oldest first; at most
+        ``limit`` of them.
+    """
+    import pyarrow.parquet as pq
+
+    owner_dir = (directory or config.ARCHIVE_DIR) / f"owner={owner_id}"
+    if not owner_dir.exists():
+        return []
+
+    filters = []
+    if start:
+        filters.append(("bill_date", ">=", _naive_utc(start)))
+    if end:
+        filters.append(("bill_date", "<", _naive_utc(end)))
+
+    bills = {}
+    seen_items = set()
+    for month_dir in _months(start, end, owner_dir.iterdir()):
+        if limit is not None and len(bills) >= limit:
+            break
+        table = pq.read_table(month_dir, filters=filters or None, schema=_schema())
+        for row in table.to_pylist():
+            bill = bills.get(row["bill_id"])
+            if bill is None:
+                bill = bills[row["bill_id"]] = {
+                    "id": row["bill_id"],
+                    "bill_number": row["bill_number"],
+                    "bill_date": row["bill_date"],
+                    "total_amount": row["total_amount"],
+                    "bill_type": row["bill_type"],
+                    "image_path": row["image_path"],
+                    "owner_id": row["owner_id"],
+                    "created_at": row["bill_created_at"],
+                    "updated_at": row["bill_updated_at"],
+                    "items": [],
+                }
+            if row["bill_item_id"] is not None and row["bill_item_id"] not in seen_items:
+                seen_items.add(row["bill_item_id"])
+                bill["items"].append({
+                    "id": row["bill_item_id"],
+                    "bill_id": row["bill_id"],
+                    "item_id": row["item_id"],
+                    "quantity": row["quantity"],
+                    "unit_price": row["unit_price"],
+                    "total_price": row["total_price"],
+                    "created_at": row["bill_item_created_at"],
+                })
+    return sorted(bills.values(), key=history_key)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old bills to Parquet")
+    parser.add_argument("--older-than-days", type=int, default=config.ARCHIVE_AFTER_DAYS,
+                        help="Archive bills dated more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=500, help="Bills per transaction")
+    args = parser.parse_args()
+
+    from .sharding import tenant_sessionmakers
+
+    cutoff = datetime.now() - timedelta(days=args.older_than_days)
+    count = 0
+    for session_maker in tenant_sessionmakers():
+        db = session_maker()
+        try:
+            count += archive_bills(db, cutoff, args.batch_size)
+        finally:
+            db.close()
+    print(f"Archived {count} bills dated before {cutoff:%Y-%m-%d}.")
+
+
+if __name__ == "__main__":
+    main()
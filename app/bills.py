@@ -0,0 +1,89 @@
+"""
+bills.py
+
+Applies processed bills to the inventory.
+"""
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def record_bill(db: Session, owner_id: int, bill_data: Dict, bill_type: str,
+                image_path: Optional[str]) -> Tuple[models.Bill, List[Dict]]:
+    """
+    Store a parsed bill and update stock for each of its items.
+
+    Args:
+        db (Session): Database session.
+        owner_id (int): Owner of the bill and items.
+        bill_data (dict): Parsed bill as returned by OCRService.parse_bill_data.
+        bill_type (str): 'purchase' or 'sale'.
+        image_path (str, optional): Where the bill image came from.
+
+    Returns:
+        tuple: The bill and a list of the changed items' new stock levels.
+    """
+    # Create bill record; bill numbers are unique, and several unnumbered
+    # bills can finish within the same second
+    db_bill = models.Bill(
+        bill_number=bill_data["bill_number"] or f"BILL-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}",
+        bill_date=bill_data["bill_date"] or datetime.now(),
+        total_amount=bill_data["total_amount"],
+        bill_type=bill_type,
+        image_path=image_path,
+        owner_id=owner_id
+    )
+    db.add(db_bill)
+    db.commit()
+    db.refresh(db_bill)
+
+    # Process items
+    changed_items = {}
+    for item_data in bill_data["items"]:
+        # Check if item exists
+        db_item = db.query(models.Item).filter(
+            models.Item.name == item_data["name"],
+            models.Item.owner_id == owner_id
+        ).first()
+
+        if not db_item:
+            # Create new item
+            db_item = models.Item(
+                name=item_data["name"],
+                quantity=item_data["quantity"],
+                unit_price=item_data["price"],
+                owner_id=owner_id
+            )
+            db.add(db_item)
+            db.commit()
+            db.refresh(db_item)
+        else:
+            # Update existing item
+            if bill_type == "purchase":
+                db_item.quantity += item_data["quantity"]
+            else:  # sale
+                db_item.quantity -= item_data["quantity"]
+            db.commit()
+
+        # Create bill item record
+        db_bill_item = models.BillItem(
+            bill_id=db_bill.id,
+            item_id=db_item.id,
+            quantity=item_data["quantity"],
+            unit_price=item_data["price"],
+            total_price=item_data["quantity"] * item_data["price"]
+        )
+        db.add(db_bill_item)
+        changed_items[db_item.id] = {
+            "id": db_item.id,
+            "name": db_item.name,
+            "quantity": db_item.quantity,
+            "unit_price": db_item.unit_price
+        }
+
+    db.commit()
+    return db_bill, list(changed_items.values())
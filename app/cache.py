@@ -0,0 +1,91 @@
+"""
+cache.py
+
+Conditional GET and response caching for per-owner list endpoints.
+
+Every write to an owner's items or bills bumps ``User.data_version`` (see
+models.bump_data_versions), so the version loaded with the authenticated
+user identifies the state of everything that owner can list. It serves as
+the ETag, lets ``If-None-Match`` be answered without querying the item
+tables, and keys an optional in-process cache of serialized responses.
+"""
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response, status
+
+from . import config, models
+
+
+class ResponseCache:
+    """Small thread-safe LRU of serialized response bodies."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: Hashable, body: bytes):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE)
+
+
+def etag_for(user: models.User) -> str:
+    return f'"{user.id}-{user.data_version}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check an If-None-Match header against the current ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def versioned_response(request: Request, user: models.User,
+                             build: Callable[[], Awaitable[object]]) -> Response:
+    """
+    Answer a list request for ``user`` with ETag support.
+
+    Args:
+        request (Request): Incoming request; its path and query string key the cache.
+        user (User): Authenticated owner whose data_version tags the response.
+        build (callable): Coroutine function producing the JSON-serializable payload on a cache miss.
+
+    Returns:
+        Response: 304 when the client copy is current, otherwise the JSON body.
+    """
+    etag = etag_for(user)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = (user.id, user.data_version, request.url.path, tuple(sorted(request.query_params.multi_items())))
+    body = response_cache.get(key)
+    if body is None:
+        import orjson
+
+        body = orjson.dumps(await build())
+        response_cache.set(key, body)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -17,18 +17,85 @@ DATABASE_URL = os.getenv(
     f"sqlite:///{BASE_DIR}/inventory.db"
 )
 
+# Sharding settings; 0 keeps every owner in DATABASE_URL
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_URL_TEMPLATE = os.getenv("SHARD_URL_TEMPLATE", f"sqlite:///{BASE_DIR}/shards/shard-{{shard}}.db")
+
 # Security settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
 # File upload settings
-UPLOAD_DIR = BASE_DIR / "uploads"
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", str(BASE_DIR / "uploads")))
 UPLOAD_DIR.mkdir(exist_ok=True)
+IMAGE_STORE_FORMAT = os.getenv("IMAGE_STORE_FORMAT", "webp")  # webp or jpeg
+IMAGE_STORE_QUALITY = int(os.getenv("IMAGE_STORE_QUALITY", "80"))
+IMAGE_STORE_MAX_SIDE = int(os.getenv("IMAGE_STORE_MAX_SIDE", "2400"))  # pixels; larger photos are downscaled
+THUMBNAIL_SIZE = int(os.getenv("THUMBNAIL_SIZE", "320"))  # pixels
+IMAGE_URL_EXPIRE_SECONDS = int(os.getenv("IMAGE_URL_EXPIRE_SECONDS", "300"))  # lifetime of signed image URLs
+
+# Inventory settings
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "10"))  # default reorder threshold per item
+
+# Archive settings
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", str(BASE_DIR / "archive")))
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+
+# Response settings
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "0"))  # entries; 0 disables
+
+# Change feed settings
+FEED_HISTORY_SIZE = int(os.getenv("FEED_HISTORY_SIZE", "1000"))  # events kept per owner for resume
+FEED_CLIENT_BUFFER = int(os.getenv("FEED_CLIENT_BUFFER", "100"))  # queued events per subscriber
+FEED_HEARTBEAT_SECONDS = float(os.getenv("FEED_HEARTBEAT_SECONDS", "15"))
+# "memory" keeps events in the worker process; "database" shares them between workers
+FEED_BACKEND = os.getenv("FEED_BACKEND", "memory")
+FEED_POLL_SECONDS = float(os.getenv("FEED_POLL_SECONDS", "0.5"))  # database backend only
+FEED_OUTBOX_SIZE = int(os.getenv("FEED_OUTBOX_SIZE", "100000"))  # events kept in the table for resume
+FEED_GAP_SECONDS = float(os.getenv("FEED_GAP_SECONDS", "30"))  # how long skipped outbox ids are still polled for
+
+# Profiling settings
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles")))
+PROFILE_MAX_PER_MINUTE = int(os.getenv("PROFILE_MAX_PER_MINUTE", "6"))  # per process
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_MAX_SQL = int(os.getenv("PROFILE_MAX_SQL", "1000"))  # statements kept per profile
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))  # longer requests are cut off
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))  # newest profiles kept in PROFILE_DIR
 
 # OCR settings
 OCR_LANGUAGE = "en"
 OCR_MODEL_PATH = os.getenv("OCR_MODEL_PATH", str(BASE_DIR / "models"))
+OCR_PRELOAD = os.getenv("OCR_PRELOAD", "False").lower() == "true"
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "2"))  # OCR threads per process
+OCR_TENANT_CONCURRENCY = int(os.getenv("OCR_TENANT_CONCURRENCY", "1"))  # running jobs per owner
+OCR_TENANT_QUEUE_DEPTH = int(os.getenv("OCR_TENANT_QUEUE_DEPTH", "50"))  # queued jobs per owner; 0 = unbounded
+OCR_TILED_MIN_ASPECT = float(os.getenv("OCR_TILED_MIN_ASPECT", "2.5"))  # height/width read in strips; 0 disables
+OCR_STRIP_ASPECT = float(os.getenv("OCR_STRIP_ASPECT", "1.0"))  # strip height as a multiple of image width
+OCR_STRIP_OVERLAP = float(os.getenv("OCR_STRIP_OVERLAP", "0.2"))  # fraction of a strip shared with the next
+OCR_STRIP_WORKERS = int(os.getenv("OCR_STRIP_WORKERS", "1"))  # strips OCR'd in parallel per image
+OCR_COST_PIXELS = int(os.getenv("OCR_COST_PIXELS", "2000000"))  # image area counted as one unit of OCR work
+
+
+def _tenant_weights(text: str) -> dict:
+    """Parse "owner_id=weight,..." into {owner_id: weight}; weights must be positive."""
+    weights = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        owner_id, _, weight = part.partition("=")
+        weights[int(owner_id)] = float(weight)
+        if not weights[int(owner_id)] > 0:
+            raise ValueError(f"OCR_TENANT_WEIGHTS: weight for owner {owner_id} must be positive")
+    return weights
+
+
+# Owners' shares of OCR workers relative to the default 1.0, e.g. "12=2,40=0.5"
+OCR_TENANT_WEIGHTS = _tenant_weights(os.getenv("OCR_TENANT_WEIGHTS", ""))
+
+# PDF settings
+PDF_RASTER_DPI = int(os.getenv("PDF_RASTER_DPI", "200"))
+PDF_OCR_WORKERS = int(os.getenv("PDF_OCR_WORKERS", "2"))
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", "20"))
 
 # Application settings
 APP_NAME = "Smart Inventory Scanner"
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -8,11 +9,78 @@ load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./inventory.db")
 
-engine = create_engine(
+# Async drivers for the sync URL's backend; set ASYNC_DATABASE_URL to override
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """Swap a database URL's driver for its asyncio counterpart."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.get_backend_name()!r}; set ASYNC_DATABASE_URL")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def use_wal(engine):
+    """
+    Put SQLite databases in write-ahead-log mode.
+
+    In the default rollback-journal mode a commit locks out readers, so the
+    async list endpoints fail with "database is locked" while bills are
+    being written; under WAL readers and the single writer do not block
+    each other. The mode is stored in the database file, so the async
+    engine on the same file picks it up once the sync engine has connected
+    (the schema is created through it at startup). Other backends are left
+    alone.
+    """
+    if engine.dialect.name == "sqlite":
+        @event.listens_for(engine, "connect")
+        def set_journal_mode(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.close()
+    return engine
+
+
+engine = use_wal(create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+# Created on first use: sqlalchemy.ext.asyncio and the async driver are only imported then
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    """A new asyncio session, like ``SessionLocal()`` for the sync engine."""
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+        # Objects stay readable after commit: endpoints return them once the session is gone
+        _async_session_factory = async_sessionmaker(
+            get_async_engine(), class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory()
+
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
 Base = declarative_base()
 
 # Dependency
@@ -21,4 +89,8 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -4,7 +4,7 @@ Database initialization script for Smart Inventory Scanner.
 import os
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from .models import Base, User
+from .models import User, create_schema
 from .config import DATABASE_URL
 from passlib.context import CryptContext
 
@@ -16,8 +16,8 @@ def init_db():
     # Create database engine
     engine = create_engine(DATABASE_URL)
     
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Create all tables, adding columns missing from older databases
+    create_schema(engine)
     
     # Create session
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -32,7 +32,8 @@ def init_db():
                 email="admin@example.com",
                 hashed_password=pwd_context.hash("admin123"),
                 business_name="Admin Business",
-                is_active=True
+                is_active=True,
+                is_admin=True
             )
             db.add(admin_user)
             db.commit()
@@ -0,0 +1,252 @@
+"""
+events.py
+
+In-process fan-out of per-owner stock change events.
+
+Each owner has a short history of recent events with increasing ids so a
+client reconnecting with ``Last-Event-ID`` can resume where it left off.
+Every subscriber gets a bounded queue; a subscriber that falls behind is
+dropped rather than allowed to grow without limit, and recovers by
+reconnecting and resuming from history.
+
+ChangeFeed only reaches subscribers connected to the same worker process.
+With several workers set FEED_BACKEND=database: OutboxFeed writes events
+to the feed_events table and every worker polls it, so event ids are
+shared and a client can resume on any worker.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, or_, select
+
+from . import config, models
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED_GAP = 1000  # larger id jumps are not waited for
+
+
+class Subscription:
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_buffer: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_buffer)
+        self.overflowed = False
+
+    def deliver(self, event: Dict):
+        """Queue an event; must run on the subscriber's event loop."""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class ChangeFeed:
+    def __init__(self, history_size: int = config.FEED_HISTORY_SIZE,
+                 client_buffer: int = config.FEED_CLIENT_BUFFER):
+        self.client_buffer = client_buffer
+        self._lock = threading.Lock()
+        self._history = defaultdict(lambda: deque(maxlen=history_size))
+        self._last_id = defaultdict(int)
+        self._subscribers = defaultdict(set)
+
+    def publish(self, owner_id: int, event_type: str, data: Dict) -> int:
+        """
+        Record an event for an owner and push it to their subscribers.
+
+        Safe to call from any thread.
+
+        Returns:
+            int: The event id.
+        """
+        with self._lock:
+            self._last_id[owner_id] += 1
+            event = {"id": self._last_id[owner_id], "event": event_type, "data": data}
+            self._history[owner_id].append(event)
+            subscribers = list(self._subscribers.get(owner_id, ()))
+
+        for subscription in subscribers:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+        return event["id"]
+
+    def subscribe(self, owner_id: int, last_event_id: Optional[int] = None,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Tuple[Subscription, List[Dict]]:
+        """
+        Register a subscriber on an event loop.
+
+        Args:
+            owner_id (int): Owner whose events to receive.
+            last_event_id (int, optional): Last event the client saw.
+            loop (AbstractEventLoop, optional): Loop the subscriber reads on;
+                defaults to the running loop.
+
+        Returns:
+            tuple: The subscription and the events to replay first. When the
+            requested id is no longer in history a single ``reset`` event is
+            replayed instead, telling the client to refetch its data.
+        """
+        subscription = Subscription(loop or asyncio.get_running_loop(), self.client_buffer)
+        with self._lock:
+            self._subscribers[owner_id].add(subscription)
+            if last_event_id is None:
+                return subscription, []
+
+            history = self._history[owner_id]
+            latest = self._last_id[owner_id]
+            oldest = history[0]["id"] if history else latest + 1
+            if last_event_id > latest or last_event_id < oldest - 1:
+                return subscription, [{"id": latest, "event": "reset", "data": {}}]
+            return subscription, [event for event in history if event["id"] > last_event_id]
+
+    def unsubscribe(self, owner_id: int, subscription: Subscription):
+        with self._lock:
+            self._subscribers[owner_id].discard(subscription)
+            if not self._subscribers[owner_id]:
+                del self._subscribers[owner_id]
+
+
+class OutboxFeed(ChangeFeed):
+    """
+    ChangeFeed shared by worker processes through the feed_events table.
+
+    ``publish`` inserts a row and returns its id. Each process runs ``poll``
+    to fan new rows out to its own subscribers, so delivery lags by up to
+    FEED_POLL_SECONDS. The newest FEED_OUTBOX_SIZE rows are kept for resume.
+
+    Ids are allocated at insert but become visible at commit, so with
+    concurrent writers (PostgreSQL) a lower id can show up after a higher
+    one. Polling keeps asking for ids it skipped over for FEED_GAP_SECONDS,
+    which also covers rolled-back inserts, and delivers them late; on
+    SQLite writers are serialized and ids always commit in order. Resuming
+    from Last-Event-ID still only replays ids above it.
+    """
+
+    def __init__(self, engine, poll_seconds: float = config.FEED_POLL_SECONDS,
+                 outbox_size: int = config.FEED_OUTBOX_SIZE,
+                 client_buffer: int = config.FEED_CLIENT_BUFFER,
+                 gap_seconds: float = config.FEED_GAP_SECONDS):
+        super().__init__(history_size=0, client_buffer=client_buffer)
+        self.engine = engine
+        self.poll_seconds = poll_seconds
+        self.outbox_size = outbox_size
+        self.gap_seconds = gap_seconds
+        self._cursor = None
+        self._gaps: Dict[int, float] = {}  # skipped id -> when it was first missed
+        self.table = models.FeedEvent.__table__
+
+    @staticmethod
+    def _event(row) -> Dict:
+        import orjson
+
+        return {"id": row.id, "event": row.event, "data": orjson.loads(row.data)}
+
+    def publish(self, owner_id: int, event_type: str, data: Dict) -> int:
+        import orjson
+
+        with self.engine.begin() as conn:
+            result = conn.execute(insert(self.table).values(
+                owner_id=owner_id, event=event_type, data=orjson.dumps(data).decode()
+            ))
+        return result.inserted_primary_key[0]
+
+    def subscribe(self, owner_id: int, last_event_id: Optional[int] = None,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Tuple[Subscription, List[Dict]]:
+        """
+        Like ChangeFeed.subscribe, replaying from the table.
+
+        Queries the database, so call it from a worker thread with ``loop``
+        set. Events published meanwhile may arrive both in the replay and
+        on the queue; consumers skip ids they have already sent.
+        """
+        subscription = Subscription(loop or asyncio.get_running_loop(), self.client_buffer)
+        with self._lock:
+            self._subscribers[owner_id].add(subscription)
+        if last_event_id is None:
+            return subscription, []
+
+        with self.engine.connect() as conn:
+            oldest, latest = conn.execute(select(func.min(self.table.c.id), func.max(self.table.c.id))).one()
+            latest = latest or 0
+            if last_event_id > latest or last_event_id < (oldest or latest + 1) - 1:
+                return subscription, [{"id": latest, "event": "reset", "data": {}}]
+            rows = conn.execute(
+                select(self.table)
+                .where(self.table.c.owner_id == owner_id, self.table.c.id > last_event_id)
+                .order_by(self.table.c.id)
+            )
+            return subscription, [self._event(row) for row in rows]
+
+    def poll_once(self) -> int:
+        """Deliver rows published since the last poll; returns how many were read."""
+        with self.engine.connect() as conn:
+            if self._cursor is None:
+                # Start at the end: older events are only replayed on request
+                self._cursor = conn.execute(select(func.max(self.table.c.id))).scalar() or 0
+                return 0
+            now = time.monotonic()
+            self._gaps = {event_id: missed for event_id, missed in self._gaps.items()
+                          if now - missed < self.gap_seconds}
+            condition = self.table.c.id > self._cursor
+            if self._gaps:
+                condition = or_(condition, self.table.c.id.in_(self._gaps))
+            rows = conn.execute(
+                select(self.table).where(condition).order_by(self.table.c.id).limit(1000)
+            ).all()
+        for row in rows:
+            if row.id > self._cursor:
+                if row.id - self._cursor - 1 <= MAX_TRACKED_GAP:
+                    self._gaps.update(dict.fromkeys(range(self._cursor + 1, row.id), now))
+                self._cursor = row.id
+            else:
+                del self._gaps[row.id]
+            with self._lock:
+                subscribers = list(self._subscribers.get(row.owner_id, ()))
+            event = self._event(row)
+            for subscription in subscribers:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+        return len(rows)
+
+    def prune(self):
+        with self.engine.begin() as conn:
+            latest = conn.execute(select(func.max(self.table.c.id))).scalar() or 0
+            conn.execute(delete(self.table).where(self.table.c.id <= latest - self.outbox_size))
+
+    async def poll(self):
+        """Poll the table until cancelled; run one per worker process."""
+        polls = 0
+        while True:
+            try:
+                read = await asyncio.to_thread(self.poll_once)
+                polls += 1
+                if polls % 600 == 0:
+                    await asyncio.to_thread(self.prune)
+            except Exception:
+                logger.exception("Polling the change feed failed")
+                read = 0
+            if read < 1000:
+                await asyncio.sleep(self.poll_seconds)
+
+
+def format_sse(event: Dict) -> bytes:
+    import orjson
+
+    return (
+        f"id: {event['id']}\nevent: {event['event']}\n".encode()
+        + b"data: " + orjson.dumps(event["data"]) + b"\n\n"
+    )
+
+
+def make_feed() -> ChangeFeed:
+    if config.FEED_BACKEND == "database":
+        from .database import engine
+
+        return OutboxFeed(engine)
+    return ChangeFeed()
+
+
+change_feed = make_feed()
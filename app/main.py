@@ -1,23 +1,53 @@
-from fastapi import FastAPI, Depends, HTTPException, status, File, UploadFile
+from fastapi import BackgroundTasks, FastAPI, Depends, Header, HTTPException, Path, Query, Request, Response, status, File, UploadFile
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse, StreamingResponse
+from sqlalchemy import distinct, func, select
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.orm.attributes import set_committed_value
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
 import os
+import time
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from PIL import Image
-import io
 
-from . import models, schemas
-from .database import engine, get_db
+from . import adjustments, archive, bills, cache, config, models, profiling, queries, schemas, sharding
+from .database import SessionLocal, dispose_async_engine, engine, get_async_db, get_db
+from .events import OutboxFeed, change_feed, format_sse
+from .services.image_store import ImageStore, media_type
+from .services.ocr_scheduler import OCRQueueFull, OCRScheduler, pixel_cost
 from .services.ocr_service import OCRService
+from .services.pdf_service import PDFService
+from .utils import UnreadableUpload, allowed_file, is_pdf, open_image, parse_range
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
 
-app = FastAPI(title="Smart Inventory Scanner")
+def init_schema():
+    """Create database tables and add columns missing from older databases."""
+    models.create_schema(engine)
+    if sharding.shard_set is not None:
+        sharding.shard_set.create_all()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_schema()
+    poller = asyncio.create_task(change_feed.poll()) if isinstance(change_feed, OutboxFeed) else None
+    yield
+    if poller is not None:
+        poller.cancel()
+    await dispose_async_engine()
+    if sharding.shard_set is not None:
+        await sharding.shard_set.dispose()
+
+app = FastAPI(title="Smart Inventory Scanner", lifespan=lifespan, default_response_class=ORJSONResponse)
+app.router.route_class = profiling.ProfiledRoute
 
 # CORS middleware
 app.add_middleware(
@@ -28,6 +58,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class LazyBrotliMiddleware:
+    """BrotliMiddleware, imported on the first request instead of at import time."""
+
+    def __init__(self, app, **options):
+        self.app = app
+        self.options = options
+        self.middleware = None
+
+    async def __call__(self, scope, receive, send):
+        if self.middleware is None:
+            from brotli_asgi import BrotliMiddleware
+
+            self.middleware = BrotliMiddleware(self.app, **self.options)
+        await self.middleware(scope, receive, send)
+
+# Brotli for clients that accept it, gzip otherwise; event streams must not be buffered
+# and stored images are already compressed (and may be served as byte ranges)
+app.add_middleware(
+    LazyBrotliMiddleware,
+    minimum_size=config.COMPRESSION_MINIMUM_SIZE,
+    gzip_fallback=True,
+    excluded_handlers=[r"/events$", r"/image$", r"/thumbnail$"]
+)
+
 # Security
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
@@ -35,9 +89,17 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 # Initialize OCR service
 ocr_service = OCRService()
+pdf_service = PDFService(ocr_service)
+ocr_scheduler = OCRScheduler()
+image_store = ImageStore(config.UPLOAD_DIR)
+
+# Load the model before gunicorn forks so workers share it copy-on-write
+if config.OCR_PRELOAD:
+    ocr_service.load_reader()
 
 # Helper functions
 def verify_password(plain_password, hashed_password):
@@ -53,24 +115,149 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def credentials_error():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def token_payload(token: Optional[str], scope: Optional[str] = None) -> dict:
+    """Decode a token, accepting only tokens issued for ``scope`` (None for access tokens)."""
+    if not token:
+        raise credentials_error()
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_error()
+    if payload.get("sub") is None or payload.get("scope") != scope:
+        raise credentials_error()
+    return payload
+
+def token_email(token: Optional[str]) -> str:
+    return token_payload(token)["sub"]
+
+def create_image_token(user: models.User, bill_id: int) -> str:
+    """Short-lived token that only grants access to one bill's image and thumbnail."""
+    expire = datetime.utcnow() + timedelta(seconds=config.IMAGE_URL_EXPIRE_SECONDS)
+    return jwt.encode({"sub": user.email, "scope": "bill-image", "bill": bill_id, "exp": expire},
+                      SECRET_KEY, algorithm=ALGORITHM)
+
+def user_from_token(token: Optional[str], db: Session):
+    user = db.query(models.User).filter(models.User.email == token_email(token)).first()
+    if user is None:
+        raise credentials_error()
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: "AsyncSession" = Depends(get_async_db)):
+    # The user is read on the event loop; it stays usable after the session closes
+    result = await db.execute(select(models.User).where(models.User.email == token_email(token)))
+    user = result.scalar_one_or_none()
+    if user is None:
+        raise credentials_error()
+    if sharding.shard_of(user) is not None:
+        # The directory row is authoritative; only the data_version that inventory
+        # writes bump lives on the shard's copy. Set it without dirtying the row.
+        async with sharding.async_session_for(user) as shard_db:
+            version = await shard_db.scalar(select(models.User.data_version).where(models.User.id == user.id))
+        if version is not None:
+            set_committed_value(user, "data_version", version)
+    return user
+
+def get_admin_user(current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+def token_subject(token: str) -> Optional[str]:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
+        return None
+    return None if payload.get("scope") else payload.get("sub")
+
+def is_admin_email(email: str) -> bool:
+    db = SessionLocal()
+    try:
+        return bool(db.query(models.User.is_admin).filter(models.User.email == email).scalar())
+    finally:
+        db.close()
+
+# Opt-in request profiling, with SQL statements recorded from every engine (including
+# the async and shard engines, which are created on first use)
+profiling.instrument_engine(Engine)
+app.add_middleware(profiling.ProfilingMiddleware, token_subject=token_subject, is_admin=is_admin_email)
+
+def get_stream_user(header_token: Optional[str] = Depends(optional_oauth2_scheme), token: Optional[str] = None):
+    """
+    Authenticate a long-lived stream.
+
+    EventSource cannot send headers, so the token may also come from the
+    ``token`` query parameter. The session is closed straight away so an
+    open stream does not hold a pooled connection.
+    """
+    db = SessionLocal()
+    try:
+        return user_from_token(header_token or token, db)
+    finally:
+        db.close()
+
+def get_tenant_db(current_user: models.User = Depends(get_current_user)):
+    """Session on the database holding the current owner's inventory (their shard, if sharded)."""
+    db = sharding.session_for(current_user)
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_tenant_db(current_user: models.User = Depends(get_current_user),
+                              db: "AsyncSession" = Depends(get_async_db)):
+    if sharding.shard_of(current_user) is None:
+        # Inventory is in the main database; reuse the request's session
+        yield db
+        return
+    async with sharding.async_session_for(current_user) as shard_db:
+        yield shard_db
+
+def get_stream_tenant_db(current_user: models.User = Depends(get_stream_user)):
+    db = sharding.session_for(current_user)
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_image_user(bill_id: int, header_token: Optional[str] = Depends(optional_oauth2_scheme),
+                   signature: Optional[str] = None):
+    """
+    Authenticate a bill image request.
+
+    <img> tags cannot send headers, so instead of the access token they use a
+    signed URL from /bills/image-urls: ``signature`` is a short-lived token
+    valid only for that bill's image and thumbnail.
+    """
+    if header_token:
+        email = token_email(header_token)
+    else:
+        payload = token_payload(signature, scope="bill-image")
+        if payload.get("bill") != bill_id:
+            raise credentials_error()
+        email = payload["sub"]
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.email == email).first()
+    finally:
+        db.close()
     if user is None:
-        raise credentials_exception
+        raise credentials_error()
     return user
 
+def get_image_tenant_db(current_user: models.User = Depends(get_image_user)):
+    db = sharding.session_for(current_user)
+    try:
+        yield db
+    finally:
+        db.close()
+
 # Authentication endpoints
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
@@ -98,97 +285,385 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    sharding.register_tenant(db, db_user)
     return db_user
 
 # Bill processing endpoints
 @app.post("/bills/upload/")
 async def upload_bill(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     bill_type: str = "purchase",
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_tenant_db)
 ):
-    # Read and process the image
+    if not allowed_file(file.filename or ""):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Upload a JPEG, PNG or PDF bill"
+        )
+
+    # Read and process the upload
     contents = await file.read()
-    image = Image.open(io.BytesIO(contents))
-    
-    # Process the bill using OCR
-    bill_data = ocr_service.process_bill_image(image)
-    
-    # Create bill record
-    db_bill = models.Bill(
-        bill_number=bill_data["bill_number"] or f"BILL-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        bill_date=bill_data["bill_date"] or datetime.now(),
-        total_amount=bill_data["total_amount"],
-        bill_type=bill_type,
-        image_path=file.filename,
-        owner_id=current_user.id
-    )
-    db.add(db_bill)
-    db.commit()
-    db.refresh(db_bill)
-    
-    # Process items
-    for item_data in bill_data["items"]:
-        # Check if item exists
-        db_item = db.query(models.Item).filter(
-            models.Item.name == item_data["name"],
-            models.Item.owner_id == current_user.id
-        ).first()
-        
-        if not db_item:
-            # Create new item
-            db_item = models.Item(
-                name=item_data["name"],
-                quantity=item_data["quantity"],
-                unit_price=item_data["price"],
-                owner_id=current_user.id
-            )
-            db.add(db_item)
-            db.commit()
-            db.refresh(db_item)
+    pdf = is_pdf(contents)
+
+    # OCR runs on the scheduler's worker threads, queued fairly per owner and
+    # charged by pixel area; each scanned PDF page is its own job
+    def submit_page(fn, image):
+        return ocr_scheduler.submit(current_user.id, profiling.profile_threads(fn), image,
+                                    cost=pixel_cost(*image.size))
+
+    try:
+        if pdf:
+            bill_data = await asyncio.to_thread(profiling.profile_threads(pdf_service.process_bill_pdf),
+                                                contents, submit_page)
         else:
-            # Update existing item
-            if bill_type == "purchase":
-                db_item.quantity += item_data["quantity"]
-            else:  # sale
-                db_item.quantity -= item_data["quantity"]
-            db.commit()
-        
-        # Create bill item record
-        db_bill_item = models.BillItem(
-            bill_id=db_bill.id,
-            item_id=db_item.id,
-            quantity=item_data["quantity"],
-            unit_price=item_data["price"],
-            total_price=item_data["quantity"] * item_data["price"]
+            image = await asyncio.to_thread(open_image, contents)
+            bill_data = await ocr_scheduler.run(current_user.id,
+                                                profiling.profile_threads(ocr_service.process_bill_image),
+                                                image, cost=pixel_cost(*image.size))
+        # Keep a recompressed copy for review; the thumbnail is made after responding
+        image_path, stored = await asyncio.to_thread(profiling.profile_threads(image_store.add), contents, pdf)
+    except OCRQueueFull as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(exc),
+            headers={"Retry-After": "30"},
         )
-        db.add(db_bill_item)
-    
-    db.commit()
-    return {"message": "Bill processed successfully", "bill_id": db_bill.id}
+    except UnreadableUpload as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    background_tasks.add_task(image_store.make_thumbnail, image_path)
+
+    def save_bill():
+        unused = None
+        try:
+            db_bill, changed_items = bills.record_bill(db, current_user.id, bill_data, bill_type, image_path)
+            # Read the id here: the commit expired the bill, and reloading it on the
+            # event loop would wait there for a pooled connection
+            return db_bill.id, changed_items
+        except Exception:
+            db.rollback()
+            if stored:
+                # Drop the image this upload stored unless a bill (e.g. one committed
+                # before the failure by an upload of the same file) refers to it
+                def unused():
+                    return db.query(models.Bill.id).filter(models.Bill.image_path == image_path).first() is None
+            raise
+        finally:
+            image_store.release(image_path, unused)
+
+    # The sync session blocks while it waits for SQLite's write lock; off the event
+    # loop, the async readers holding that lock can finish and release it
+    bill_id, changed_items = await asyncio.to_thread(profiling.profile_threads(save_bill))
+    await asyncio.to_thread(change_feed.publish, current_user.id, "stock", {
+        "bill_id": bill_id,
+        "bill_type": bill_type,
+        "items": changed_items
+    })
+    return {"message": "Bill processed successfully", "bill_id": bill_id}
+
+@app.get("/items/events")
+async def item_events(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    current_user: models.User = Depends(get_stream_user)
+):
+    """
+    Server-sent stream of the owner's stock changes.
+
+    Reconnecting clients send Last-Event-ID and receive what they missed; a
+    ``reset`` event means the gap is too old to replay and the client should
+    refetch /items/.
+    """
+    try:
+        last_seen = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_seen = None
+    owner_id = current_user.id
+    # The database-backed feed replays from its table, so subscribe off the event loop
+    subscription, backlog = await asyncio.to_thread(
+        change_feed.subscribe, owner_id, last_seen, asyncio.get_running_loop()
+    )
+
+    async def stream():
+        replayed = {event["id"] for event in backlog}
+        try:
+            for event in backlog:
+                yield format_sse(event)
+            while not subscription.overflowed:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), config.FEED_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": keep-alive\n\n"
+                    continue
+                if subscription.overflowed:
+                    # Too slow; end the stream and let the client resume from history
+                    break
+                if event["id"] in replayed:
+                    continue
+                # Not "<= last sent": the database feed may deliver a lower id late
+                yield format_sse(event)
+        finally:
+            change_feed.unsubscribe(owner_id, subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/bills/processing/metrics")
+def get_processing_metrics(current_user: models.User = Depends(get_current_user)):
+    """OCR queue depth and wait times for the current owner on this worker."""
+    return ocr_scheduler.metrics(current_user.id).get(current_user.id, {})
+
+# Profiling endpoints
+@app.post("/admin/profiling/toggles", response_model=schemas.ProfilingToggle)
+def create_profiling_toggle(
+    toggle: schemas.ProfilingToggleCreate,
+    admin: models.User = Depends(get_admin_user)
+):
+    data = toggle.model_dump(exclude={"ttl_seconds"})
+    data["expires_at"] = time.time() + toggle.ttl_seconds
+    return profiling.toggle_store.add(data)
+
+@app.get("/admin/profiling/toggles", response_model=List[schemas.ProfilingToggle])
+def get_profiling_toggles(admin: models.User = Depends(get_admin_user)):
+    return profiling.toggle_store.active()
+
+@app.delete("/admin/profiling/toggles/{toggle_id}")
+def delete_profiling_toggle(toggle_id: str, admin: models.User = Depends(get_admin_user)):
+    if not profiling.toggle_store.remove(toggle_id):
+        raise HTTPException(status_code=404, detail="Toggle not found")
+    return {"message": "Toggle removed"}
+
+@app.get("/admin/profiles")
+def get_profiles(admin: models.User = Depends(get_admin_user)):
+    return profiling.list_profiles()
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(
+    profile_id: str = Path(..., pattern="^[0-9a-f]{32}$"),
+    admin: models.User = Depends(get_admin_user)
+):
+    path = config.PROFILE_DIR / f"{profile_id}.json"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
+
+@app.get("/admin/profiles/{profile_id}/download")
+def download_profile(
+    profile_id: str = Path(..., pattern="^[0-9a-f]{32}$"),
+    admin: models.User = Depends(get_admin_user)
+):
+    for mode in profiling.MODES:
+        path = config.PROFILE_DIR / profiling.dump_name(profile_id, mode)
+        if path.exists():
+            return FileResponse(path, filename=path.name, media_type="application/octet-stream")
+    raise HTTPException(status_code=404, detail="Profile not found")
 
 # Inventory endpoints
 @app.get("/items/", response_model=List[schemas.Item])
-def get_items(
+async def get_items(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: "AsyncSession" = Depends(get_async_tenant_db)
 ):
-    items = db.query(models.Item).filter(
+    # Returning a response directly skips per-row response_model validation
+    return await cache.versioned_response(
+        request, current_user, lambda: queries.list_items_async(db, current_user.id, skip, limit)
+    )
+
+@app.put("/items/{item_id}/reorder-threshold", response_model=schemas.Item)
+def set_reorder_threshold(
+    item_id: int,
+    update: schemas.ReorderThresholdUpdate,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_tenant_db)
+):
+    db_item = db.query(models.Item).filter(
+        models.Item.id == item_id,
         models.Item.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return items
+    ).first()
+    if db_item is None:
+        raise HTTPException(status_code=404, detail="Item not found")
+    db_item.reorder_threshold = update.reorder_threshold
+    db.commit()
+    db.refresh(db_item)
+    return db_item
+
+@app.post("/items/adjustments", response_model=schemas.StockAdjustmentResult)
+def adjust_stock(
+    adjustment: schemas.StockAdjustmentRequest,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_tenant_db)
+):
+    """Apply a stock count or list of corrections in one transaction."""
+    try:
+        batch_id, changed_items = adjustments.apply_adjustments(
+            db, current_user.id, adjustment.lines, adjustment.note
+        )
+    except adjustments.UnknownItems as exc:
+        raise HTTPException(status_code=422, detail={"message": str(exc), "unknown": exc.references})
+
+    if len(changed_items) > adjustments.EVENT_ITEM_LIMIT:
+        change_feed.publish(current_user.id, "reset", {})
+    elif changed_items:
+        change_feed.publish(current_user.id, "stock", {"batch_id": batch_id, "items": changed_items})
+    return {"batch_id": batch_id, "lines": len(adjustment.lines), "changed": len(changed_items)}
+
+@app.get("/items/adjustments/{batch_id}", response_model=List[schemas.StockMovement])
+def get_adjustment(
+    batch_id: str,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_tenant_db)
+):
+    return db.query(models.StockMovement).filter(
+        models.StockMovement.batch_id == batch_id,
+        models.StockMovement.owner_id == current_user.id
+    ).order_by(models.StockMovement.id).all()
+
+@app.get("/alerts/", response_model=List[schemas.StockAlert])
+def get_alerts(
+    open_only: bool = True,
+    skip: int = 0,
+    limit: int = 100,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_tenant_db)
+):
+    query = db.query(models.StockAlert).filter(models.StockAlert.owner_id == current_user.id)
+    if open_only:
+        query = query.filter(models.StockAlert.resolved_at.is_(None))
+    return query.order_by(models.StockAlert.id.desc()).offset(skip).limit(limit).all()
+
+@app.get("/alerts/count", response_model=schemas.AlertCount)
+def count_alerts(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_tenant_db)
+):
+    """Number of items with an open low-stock alert, for the dashboard."""
+    count = db.query(func.count(distinct(models.StockAlert.item_id))).filter(
+        models.StockAlert.owner_id == current_user.id,
+        models.StockAlert.resolved_at.is_(None)
+    ).scalar()
+    return {"low_stock_items": count}
 
 @app.get("/bills/", response_model=List[schemas.Bill])
-def get_bills(
+async def get_bills(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: "AsyncSession" = Depends(get_async_tenant_db)
 ):
-    bills = db.query(models.Bill).filter(
+    return await cache.versioned_response(
+        request, current_user, lambda: queries.list_bills_async(db, current_user.id, skip, limit)
+    )
+
+@app.get("/bills/history", response_model=List[schemas.Bill])
+def get_bill_history(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 100,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_tenant_db)
+):
+    """Bills dated in [start, end), oldest first, from both the database and the archive."""
+    # Neither source can contribute more than the first skip + limit bills of the merged page
+    window = skip + limit
+    archived = archive.read_archived_bills(current_user.id, start, end, limit=window)
+    recent = queries.list_bills(db, current_user.id, 0, window, start, end, by_date=True)
+    merged = heapq.merge(archived, recent, key=archive.history_key)
+    return ORJSONResponse(list(itertools.islice(merged, skip, window)))
+
+# Bill image endpoints
+def stored_file_response(request: Request, path, etag: str) -> Response:
+    """
+    Serve a content-addressed file with long-lived caching and single byte ranges.
+
+    Stored files never change, so the ETag is their name and clients may
+    cache them indefinitely.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable", "Accept-Ranges": "bytes"}
+    if cache.is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    range_header = request.headers.get("range")
+    if range_header and request.headers.get("if-range", etag) == etag:
+        size = path.stat().st_size
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                            headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        with open(path, "rb") as f:
+            f.seek(start)
+            body = f.read(end - start + 1)
+        return Response(content=body, status_code=status.HTTP_206_PARTIAL_CONTENT, media_type=media_type(path),
+                        headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"})
+    return FileResponse(path, media_type=media_type(path), headers=headers)
+
+def owned_bill_image(bill_id: int, user: models.User, db: Session) -> str:
+    db_bill = db.query(models.Bill).filter(
+        models.Bill.id == bill_id,
+        models.Bill.owner_id == user.id
+    ).first()
+    if db_bill is None or image_store.path(db_bill.image_path) is None:
+        raise HTTPException(status_code=404, detail="Bill image not found")
+    return db_bill.image_path
+
+@app.get("/bills/image-urls", response_model=Dict[int, schemas.BillImageUrls])
+def get_bill_image_urls(
+    request: Request,
+    bill_id: List[int] = Query(...),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_tenant_db)
+):
+    """
+    Signed, short-lived URLs for the given bills' images, for use in <img> tags.
+
+    Bills that are not the owner's or have no stored image are left out.
+    """
+    owned = db.query(models.Bill.id, models.Bill.image_path).filter(
+        models.Bill.id.in_(bill_id),
         models.Bill.owner_id == current_user.id
-    ).offset(skip).limit(limit).all()
-    return bills 
\ No newline at end of file
+    ).all()
+    urls = {}
+    for owned_id, image_path in owned:
+        if image_store.path(image_path) is None:
+            continue
+        signature = create_image_token(current_user, owned_id)
+        urls[owned_id] = {
+            kind: str(request.url_for(f"get_bill_{kind}", bill_id=owned_id).include_query_params(signature=signature))
+            for kind in ("image", "thumbnail")
+        }
+    return urls
+
+@app.get("/bills/{bill_id}/image")
+def get_bill_image(
+    bill_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_image_user),
+    db: Session = Depends(get_image_tenant_db)
+):
+    """The stored bill image. Accepts a signed URL from /bills/image-urls so it can be used in <img> tags."""
+    key = owned_bill_image(bill_id, current_user, db)
+    path = image_store.path(key)
+    return stored_file_response(request, path, f'"{path.stem}"')
+
+@app.get("/bills/{bill_id}/thumbnail")
+def get_bill_thumbnail(
+    bill_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_image_user),
+    db: Session = Depends(get_image_tenant_db)
+):
+    # Made on demand if the background task has not run yet
+    path = image_store.make_thumbnail(owned_bill_image(bill_id, current_user, db))
+    return stored_file_response(request, path, f'"{path.stem}-thumb"')
@@ -1,6 +1,8 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, DateTime, Table, event, inspect, select, update
+from sqlalchemy.orm import Session, relationship
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.sql import func
+from . import config
 from .database import Base
 
 class User(Base):
@@ -10,7 +12,11 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
+    is_admin = Column(Boolean, default=False, server_default="0", nullable=False)
     business_name = Column(String)
+    # Bumped whenever any of the user's items, bills or bill items change
+    data_version = Column(Integer, default=0, server_default="0", nullable=False)
+    shard = Column(Integer, nullable=True)  # inventory shard when sharding is enabled; see app.sharding
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -26,12 +32,15 @@ class Item(Base):
     quantity = Column(Integer, default=0)
     unit_price = Column(Float)
     sku = Column(String, unique=True, index=True)
+    reorder_threshold = Column(Integer, nullable=True)  # None falls back to config.LOW_STOCK_THRESHOLD
     owner_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     owner = relationship("User", back_populates="items")
     bill_items = relationship("BillItem", back_populates="item")
+    alerts = relationship("StockAlert", back_populates="item")
+    movements = relationship("StockMovement", back_populates="item")
 
 class Bill(Base):
     __tablename__ = "bills"
@@ -61,4 +70,143 @@ class BillItem(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     bill = relationship("Bill", back_populates="items")
-    item = relationship("Item", back_populates="bill_items") 
\ No newline at end of file
+    item = relationship("Item", back_populates="bill_items")
+
+class StockAlert(Base):
+    __tablename__ = "stock_alerts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    quantity = Column(Integer)  # stock level when the threshold was crossed
+    threshold = Column(Integer)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    resolved_at = Column(DateTime(timezone=True), nullable=True)
+
+    item = relationship("Item", back_populates="alerts")
+
+class StockMovement(Base):
+    __tablename__ = "stock_movements"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("items.id"), index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), index=True)
+    batch_id = Column(String, index=True)  # groups the movements of one adjustment request
+    reason = Column(String)  # "count" or "delta"
+    previous_quantity = Column(Integer)
+    quantity = Column(Integer)  # stock level after the movement
+    change = Column(Integer)
+    note = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    item = relationship("Item", back_populates="movements")
+
+class FeedEvent(Base):
+    """Change feed outbox shared by worker processes; see app.events.OutboxFeed."""
+    __tablename__ = "feed_events"
+    # Never reuse the ids of pruned rows: they are the event ids clients resume from
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    owner_id = Column(Integer, index=True)
+    event = Column(String)
+    data = Column(String)  # JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+def _previous(attr, current):
+    history = attr.history
+    if not history.has_changes():
+        return current
+    return history.deleted[0] if history.deleted else None
+
+@event.listens_for(Session, "before_flush")
+def check_reorder_thresholds(session, flush_context, instances):
+    """
+    Record low-stock crossings for the items written in this flush.
+
+    Only items whose quantity or threshold changed are looked at, so the
+    cost follows the size of the write rather than the catalog.
+    """
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, Item):
+            continue
+        state = inspect(obj)
+        threshold = obj.reorder_threshold if obj.reorder_threshold is not None else config.LOW_STOCK_THRESHOLD
+        if state.pending:
+            was_low = False
+        else:
+            quantity_attr, threshold_attr = state.attrs.quantity, state.attrs.reorder_threshold
+            if not (quantity_attr.history.has_changes() or threshold_attr.history.has_changes()):
+                continue
+            previous_quantity = _previous(quantity_attr, obj.quantity)
+            previous_threshold = _previous(threshold_attr, obj.reorder_threshold)
+            if previous_threshold is None:
+                previous_threshold = config.LOW_STOCK_THRESHOLD
+            was_low = previous_quantity is not None and previous_quantity < previous_threshold
+        is_low = obj.quantity is not None and obj.quantity < threshold
+
+        if is_low and not was_low:
+            session.add(StockAlert(item=obj, owner_id=obj.owner_id, quantity=obj.quantity, threshold=threshold))
+        elif was_low and not is_low:
+            with session.no_autoflush:
+                open_alerts = session.query(StockAlert).filter(
+                    StockAlert.item_id == obj.id,
+                    StockAlert.resolved_at.is_(None)
+                ).all()
+            for alert in open_alerts:
+                alert.resolved_at = func.now()
+
+@event.listens_for(Session, "after_flush")
+def bump_data_versions(session, flush_context):
+    """Move the owner's data_version in the same transaction as any inventory write."""
+    owner_ids = set()
+    bill_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, (Item, Bill)):
+            owner_ids.add(obj.owner_id)
+        elif isinstance(obj, BillItem):
+            bill_ids.add(obj.bill_id)
+
+    if bill_ids:
+        owner_ids.update(session.execute(
+            select(Bill.owner_id).where(Bill.id.in_(bill_ids))
+        ).scalars())
+
+    increment_data_versions(session, owner_ids)
+
+def increment_data_versions(session, owner_ids):
+    """
+    Bump data_version for the given owners.
+
+    Bulk statements bypass the flush events, so code writing inventory with
+    them calls this directly.
+    """
+    owner_ids = set(owner_ids)
+    owner_ids.discard(None)
+    if owner_ids:
+        session.execute(
+            update(User)
+            .where(User.id.in_(owner_ids))
+            .values(data_version=User.data_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+def create_schema(engine):
+    """
+    Create missing tables and add columns introduced since a database was created.
+
+    create_all never alters existing tables, so an inventory.db from before
+    a column was added would fail every query touching it. New columns are
+    nullable or carry a server default, which is what ALTER TABLE ... ADD
+    COLUMN needs; running this again is a no-op.
+    """
+    Base.metadata.create_all(bind=engine)
+    existing = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            present = {column["name"] for column in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    table_name = engine.dialect.identifier_preparer.format_table(table)
+                    spec = CreateColumn(column).compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(f"ALTER TABLE {table_name} ADD COLUMN {spec}")
@@ -6,6 +6,9 @@ Handles OCR processing using pytesseract.
 import pytesseract
 from PIL import Image
 
+from . import config
+from .utils import UnreadableUpload, open_image
+
 def extract_text(image_path: str) -> str:
     """
     Extracts text from a given image using Tesseract OCR.
@@ -15,6 +18,42 @@ def extract_text(image_path: str) -> str:
 
     Returns:
         str: Extracted text.
+
+    Raises:
+        UnreadableUpload: The file is not a readable image.
     """
-    image = Image.open(image_path)
+    with open(image_path, "rb") as file:
+        image = open_image(file.read())
     return pytesseract.image_to_string(image)
+
+def extract_pdf_text(pdf_path: str) -> str:
+    """
+    Extracts text from a PDF bill, page by page.
+
+    Pages with an embedded text layer are read directly; scanned pages are
+    rendered at PDF_RASTER_DPI and OCR'd with Tesseract.
+
+    Args:
+        pdf_path (str): Path to the PDF bill.
+
+    Returns:
+        str: Extracted text.
+
+    Raises:
+        UnreadableUpload: The file is not a PDF MuPDF can open.
+    """
+    import pymupdf
+
+    try:
+        doc = pymupdf.open(pdf_path, filetype="pdf")
+    except pymupdf.FileDataError as exc:
+        raise UnreadableUpload("The bill is not a readable PDF file") from exc
+    pages = []
+    with doc:
+        for page in doc:
+            text = page.get_text("text")
+            if len(text.strip()) < config.PDF_MIN_TEXT_CHARS:
+                pix = page.get_pixmap(dpi=config.PDF_RASTER_DPI, alpha=False)
+                text = pytesseract.image_to_string(Image.frombytes("RGB", (pix.width, pix.height), pix.samples))
+            pages.append(text)
+    return "\n".join(pages)
@@ -0,0 +1,497 @@
+"""
+profiling.py
+
+On-demand profiling of individual production requests.
+
+A request is profiled when an admin sends it with the ``X-Profile-Request``
+header, or when it matches a toggle an admin created for a tenant (email,
+path prefix, sampling probability, count and expiry). Profiled requests
+run under either a low-overhead stack sampler, whose output is in the
+folded format flame graph tools read, or under cProfile. Every SQL
+statement issued through the engine during the request is recorded with
+its duration.
+
+The sampler sees every thread, including other requests'. cProfile is
+enabled only while the request's own task runs on the event loop, and
+in the worker threads it hands work to through ``profile_threads``
+(sync endpoints, OCR jobs); the thread profiles are merged into one dump.
+From Python 3.12 cProfile runs on sys.monitoring, which allows a single
+enabled profiler per process, so there steps and threads that start while
+another profiler is enabled run unprofiled instead of failing.
+
+Overhead is bounded by profiling at most one request at a time per process
+and at most PROFILE_MAX_PER_MINUTE requests per minute, so toggles can stay
+enabled on production instances. Profiles stop after PROFILE_MAX_SECONDS,
+streaming responses are not profiled, and only the newest PROFILE_KEEP
+profiles are kept. Toggles are stored in PROFILE_DIR and picked up by
+every worker; match counts are tracked per worker.
+"""
+import asyncio
+import contextvars
+import cProfile
+import functools
+import json
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from . import config
+
+PROFILE_HEADER = b"x-profile-request"
+MODES = ("sample", "cprofile")
+
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class StackSampler:
+    """Samples every thread's stack at a fixed interval and counts folded stacks."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class RequestProfile:
+    def __init__(self, mode: str, method: str, path: str, subject: Optional[str], reason: str):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.subject = subject
+        self.reason = reason
+        self.status_code = None
+        self.sql: List[Dict] = []
+        self.sql_dropped = 0
+        self.thread_profilers: List[cProfile.Profile] = []
+        self._profiler = None
+        self._started = None
+        self.duration = None
+        self.finished = False
+        self.truncated = False  # stopped after PROFILE_MAX_SECONDS
+        self.skipped = False  # streaming response; not saved
+
+    def start(self):
+        if self.mode == "cprofile":
+            # Enabled per task step by TaskProfiler
+            self._profiler = cProfile.Profile()
+        else:
+            self._profiler = StackSampler(config.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+            self._profiler.start()
+        self._started = time.perf_counter()
+
+    def stop(self, truncated: bool = False):
+        if self.finished:
+            return
+        self.finished = True
+        self.truncated = truncated
+        self.duration = time.perf_counter() - self._started
+        if self.mode == "cprofile":
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+
+    def record_sql(self, statement: str, duration: float):
+        if self.finished:
+            return
+        if len(self.sql) >= config.PROFILE_MAX_SQL:
+            self.sql_dropped += 1
+            return
+        self.sql.append({"statement": statement, "duration_ms": round(duration * 1e3, 3)})
+
+    def metadata(self) -> Dict:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "method": self.method,
+            "path": self.path,
+            "subject": self.subject,
+            "reason": self.reason,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration * 1e3, 3),
+            "truncated": self.truncated,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "sql_count": len(self.sql) + self.sql_dropped,
+            "sql_time_ms": round(sum(entry["duration_ms"] for entry in self.sql), 3),
+            "download": dump_name(self.id, self.mode),
+        }
+
+    def save(self, directory: Path):
+        directory.mkdir(parents=True, exist_ok=True)
+        if self.mode == "cprofile":
+            stats = pstats.Stats(self._profiler)
+            for profiler in self.thread_profilers:
+                stats.add(profiler)
+            stats.dump_stats(directory / dump_name(self.id, self.mode))
+        else:
+            (directory / dump_name(self.id, self.mode)).write_text(self._profiler.folded())
+        (directory / f"{self.id}.json").write_text(json.dumps({**self.metadata(), "sql": self.sql}, indent=2))
+
+
+def dump_name(profile_id: str, mode: str) -> str:
+    return f"{profile_id}.pstats" if mode == "cprofile" else f"{profile_id}.folded"
+
+
+def prune_profiles(directory: Path, keep: int):
+    """Delete all but the newest ``keep`` profiles."""
+    saved = sorted(
+        (path for path in directory.glob("*.json") if path.name != "toggles.json"),
+        key=lambda path: path.stat().st_mtime, reverse=True,
+    )
+    for path in saved[keep:]:
+        for mode in MODES:
+            directory.joinpath(dump_name(path.stem, mode)).unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
+
+
+# Python 3.12+ raises ValueError when a second cProfile.Profile is enabled
+EXCLUSIVE_CPROFILE = sys.version_info >= (3, 12)
+_cprofile_slot = threading.Lock()
+
+
+def _enable(profiler: cProfile.Profile) -> bool:
+    """Enable ``profiler`` unless that would clash with an active one; tell whether it was enabled."""
+    if not EXCLUSIVE_CPROFILE:
+        profiler.enable()
+        return True
+    if not _cprofile_slot.acquire(blocking=False):
+        return False
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another tool (debugger, coverage) holds the profiler slot
+        _cprofile_slot.release()
+        return False
+    return True
+
+
+def _disable(profiler: cProfile.Profile):
+    profiler.disable()
+    if EXCLUSIVE_CPROFILE:
+        _cprofile_slot.release()
+
+
+class TaskProfiler:
+    """
+    Awaitable running a coroutine with the request's cProfile enabled only
+    while that coroutine executes, so other tasks on the loop stay out of it.
+    """
+
+    def __init__(self, coro, profile: RequestProfile):
+        self.coro = coro
+        self.profile = profile
+
+    def __await__(self):
+        value, error = None, None
+        while True:
+            active = not self.profile.finished and _enable(self.profile._profiler)
+            try:
+                future = self.coro.throw(error) if error is not None else self.coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                if active:
+                    _disable(self.profile._profiler)
+            value, error = None, None
+            try:
+                value = yield future
+            except BaseException as exc:
+                error = exc
+
+
+def profile_threads(fn: Callable) -> Callable:
+    """
+    Wrap a function that runs in a worker thread so the cProfile profile of
+    the request that scheduled it covers it too.
+
+    The caller's context must be carried into the thread (asyncio.to_thread,
+    the threadpool of sync endpoints and OCRScheduler all do).
+    """
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None or profile.mode != "cprofile" or profile.finished:
+            return fn(*args, **kwargs)
+        profiler = cProfile.Profile()
+        if not _enable(profiler):
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _disable(profiler)
+            profile.thread_profilers.append(profiler)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route whose sync endpoint is covered by cProfile request profiles in its threadpool thread."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = profile_threads(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def instrument_engine(engine):
+    """
+    Record SQL statements for the profile active in the calling context.
+
+    ``engine`` may be an Engine or the Engine class, which covers every engine.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        if conn.info.get("profile_query_start"):
+            started = conn.info["profile_query_start"].pop()
+            if profile is not None:
+                profile.record_sql(statement, time.perf_counter() - started)
+
+
+class RateLimiter:
+    """Allows at most ``per_minute`` acquisitions in any sliding minute."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self._times = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._times = [t for t in self._times if now - t < 60]
+            if len(self._times) >= self.per_minute:
+                return False
+            self._times.append(now)
+            return True
+
+
+class ToggleStore:
+    """Profiling toggles shared between workers through a JSON file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._toggles: List[Dict] = []
+        self._mtime = None
+        self._checked = 0.0
+        self._matched = Counter()
+        self._lock = threading.Lock()
+
+    def load(self) -> List[Dict]:
+        now = time.monotonic()
+        if now - self._checked < 1.0:
+            return self._toggles
+        self._checked = now
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self._toggles, self._mtime = [], None
+            return self._toggles
+        if mtime != self._mtime:
+            self._toggles, self._mtime = json.loads(self.path.read_text()), mtime
+        return self._toggles
+
+    def save(self, toggles: List[Dict]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(toggles, indent=2))
+        tmp.replace(self.path)
+        self._checked = 0.0
+
+    def add(self, toggle: Dict) -> Dict:
+        with self._lock:
+            self._checked = 0.0
+            toggle = {**toggle, "id": uuid.uuid4().hex[:12]}
+            self.save(self.active() + [toggle])
+            return toggle
+
+    def remove(self, toggle_id: str) -> bool:
+        with self._lock:
+            self._checked = 0.0
+            toggles = self.load()
+            remaining = [toggle for toggle in toggles if toggle["id"] != toggle_id]
+            self.save(remaining)
+            return len(remaining) != len(toggles)
+
+    def active(self) -> List[Dict]:
+        now = time.time()
+        return [toggle for toggle in self.load() if toggle["expires_at"] > now]
+
+    def match(self, subject: Optional[str], path: str) -> Optional[Dict]:
+        """Return the first live toggle this request falls under, honouring its sample rate and count."""
+        for toggle in self.active():
+            if toggle["email"] and toggle["email"] != subject:
+                continue
+            if not path.startswith(toggle["path_prefix"]):
+                continue
+            with self._lock:
+                if self._matched[toggle["id"]] >= toggle["max_profiles"]:
+                    continue
+                if random.random() >= toggle["sample_rate"]:
+                    continue
+                self._matched[toggle["id"]] += 1
+            return toggle
+        return None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware deciding which requests to profile.
+
+    Args:
+        token_subject: Maps a bearer token to its user's email, or None.
+        is_admin: Tells whether the user with that email is an admin.
+    """
+
+    def __init__(self, app, token_subject: Callable[[str], Optional[str]],
+                 is_admin: Callable[[str], bool], store: "ToggleStore" = None,
+                 limiter: RateLimiter = None):
+        self.app = app
+        self.token_subject = token_subject
+        self.is_admin = is_admin
+        self._store = store
+        self._limiter = limiter
+        self._busy = threading.Lock()
+
+    @property
+    def store(self) -> "ToggleStore":
+        return self._store or toggle_store
+
+    @property
+    def limiter(self) -> RateLimiter:
+        return self._limiter or rate_limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        requested = headers.get(PROFILE_HEADER)
+        if requested is None and not self.store.active():
+            return await self.app(scope, receive, send)
+
+        subject = self._subject(headers)
+        mode, reason = None, None
+        # is_admin may query the database; keep it off the event loop
+        if requested is not None and subject and await asyncio.to_thread(self.is_admin, subject):
+            mode = requested.decode() if requested.decode() in MODES else "sample"
+            reason = "header"
+        elif requested is None:
+            toggle = self.store.match(subject, scope["path"])
+            if toggle:
+                mode, reason = toggle["mode"], f"toggle:{toggle['id']}"
+
+        if mode is None or not self._busy.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+        if not self.limiter.acquire():
+            self._busy.release()
+            return await self.app(scope, receive, send)
+        await self._profiled(scope, receive, send, RequestProfile(
+            mode, scope["method"], scope["path"], subject, reason
+        ))
+
+    async def _profiled(self, scope, receive, send, profile: RequestProfile):
+        def finish(truncated: bool = False):
+            # Free the slot as soon as profiling ends, even if the response goes on
+            if not profile.finished:
+                profile.stop(truncated)
+                self._busy.release()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not profile.finished:
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if content_type.startswith(b"text/event-stream"):
+                    profile.skipped = True
+                    finish()
+                else:
+                    message.setdefault("headers", []).append((b"x-profile-id", profile.id.encode()))
+                    profile.status_code = message["status"]
+            await send(message)
+
+        timer = asyncio.get_running_loop().call_later(config.PROFILE_MAX_SECONDS, finish, True)
+        token = current_profile.set(profile)
+        profile.start()
+        try:
+            app = self.app(scope, receive, send_wrapper)
+            await (TaskProfiler(app, profile) if profile.mode == "cprofile" else app)
+        finally:
+            timer.cancel()
+            finish()
+            current_profile.reset(token)
+            if not profile.skipped:
+                await asyncio.to_thread(save_profile, profile, config.PROFILE_DIR)
+
+    def _subject(self, headers) -> Optional[str]:
+        authorization = headers.get(b"authorization", b"").decode()
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        return self.token_subject(token)
+
+
+def save_profile(profile: RequestProfile, directory: Path):
+    profile.save(directory)
+    prune_profiles(directory, config.PROFILE_KEEP)
+
+
+def list_profiles(directory: Path = None) -> List[Dict]:
+    directory = directory or config.PROFILE_DIR
+    if not directory.exists():
+        return []
+    profiles = []
+    for path in directory.glob("*.json"):
+        if path.name == "toggles.json":
+            continue
+        data = json.loads(path.read_text())
+        data.pop("sql", None)
+        profiles.append(data)
+    return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+
+toggle_store = ToggleStore(config.PROFILE_DIR / "toggles.json")
+rate_limiter = RateLimiter(config.PROFILE_MAX_PER_MINUTE)
@@ -0,0 +1,162 @@
+"""
+queries.py
+
+Read queries that build API payloads straight from SQL rows.
+
+List endpoints can return thousands of rows; hydrating each one into an ORM
+object and then validating it through a pydantic model costs far more than
+the query itself. These helpers select only the needed columns and return
+plain dicts that serialize directly with orjson.
+
+Each list has a sync and an ``_async`` variant built from the same
+statements, for the sync and asyncio sessions in app.database.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+ITEM_COLUMNS = (
+    models.Item.id,
+    models.Item.name,
+    models.Item.description,
+    models.Item.quantity,
+    models.Item.unit_price,
+    models.Item.sku,
+    models.Item.reorder_threshold,
+    models.Item.owner_id,
+    models.Item.created_at,
+    models.Item.updated_at,
+)
+
+BILL_COLUMNS = (
+    models.Bill.id,
+    models.Bill.bill_number,
+    models.Bill.bill_date,
+    models.Bill.total_amount,
+    models.Bill.bill_type,
+    models.Bill.image_path,
+    models.Bill.owner_id,
+    models.Bill.created_at,
+    models.Bill.updated_at,
+)
+
+BILL_ITEM_COLUMNS = (
+    models.BillItem.id,
+    models.BillItem.bill_id,
+    models.BillItem.item_id,
+    models.BillItem.quantity,
+    models.BillItem.unit_price,
+    models.BillItem.total_price,
+    models.BillItem.created_at,
+)
+
+
+def items_query(owner_id: int, skip: int = 0, limit: int = 100):
+    return (
+        select(*ITEM_COLUMNS)
+        .where(models.Item.owner_id == owner_id)
+        .order_by(models.Item.id)
+        .offset(skip)
+        .limit(limit)
+    )
+
+
+def list_items(db: Session, owner_id: int, skip: int = 0, limit: int = 100) -> List[Dict]:
+    """
+    Fetch a page of an owner's items.
+
+    Args:
+        db (Session): Database session.
+        owner_id (int): Owner of the items.
+        skip (int): Number of rows to skip.
+        limit (int): Maximum number of rows to return.
+
+    Returns:
+        list: Item dicts shaped like schemas.Item.
+    """
+    return [dict(row) for row in db.execute(items_query(owner_id, skip, limit)).mappings()]
+
+
+async def list_items_async(db: "AsyncSession", owner_id: int, skip: int = 0, limit: int = 100) -> List[Dict]:
+    """Async variant of list_items."""
+    result = await db.execute(items_query(owner_id, skip, limit))
+    return [dict(row) for row in result.mappings()]
+
+
+def bills_query(owner_id: int, skip: int, limit: Optional[int], start: Optional[datetime],
+                end: Optional[datetime], *columns, by_date: bool = False):
+    stmt = select(*columns).where(models.Bill.owner_id == owner_id)
+    if start is not None:
+        stmt = stmt.where(models.Bill.bill_date >= start)
+    if end is not None:
+        stmt = stmt.where(models.Bill.bill_date < end)
+    order = (models.Bill.bill_date.asc().nulls_first(), models.Bill.id) if by_date else (models.Bill.id,)
+    return stmt.order_by(*order).offset(skip).limit(limit)
+
+
+def bill_items_query(page):
+    # Select the page's ids in a subquery so large pages don't hit bind-parameter limits
+    return (
+        select(*BILL_ITEM_COLUMNS)
+        .where(models.BillItem.bill_id.in_(page.scalar_subquery()))
+        .order_by(models.BillItem.id)
+    )
+
+
+def attach_items(bills: List[Dict], item_rows) -> List[Dict]:
+    items_by_bill = defaultdict(list)
+    for row in item_rows:
+        items_by_bill[row["bill_id"]].append(dict(row))
+    for bill in bills:
+        bill["items"] = items_by_bill[bill["id"]]
+    return bills
+
+
+def list_bills(db: Session, owner_id: int, skip: int = 0, limit: Optional[int] = 100,
+               start: Optional[datetime] = None, end: Optional[datetime] = None,
+               by_date: bool = False) -> List[Dict]:
+    """
+    Fetch a page of an owner's bills with their line items.
+
+    Line items for the whole page are loaded in one query instead of one
+    lazy load per bill.
+
+    Args:
+        db (Session): Database session.
+        owner_id (int): Owner of the bills.
+        skip (int): Number of rows to skip.
+        limit (int, optional): Maximum number of rows to return; None for all.
+        start (datetime, optional): Only bills dated on or after this.
+        end (datetime, optional): Only bills dated before this.
+        by_date (bool): Order by bill date, then id, instead of by id.
+
+    Returns:
+        list: Bill dicts shaped like schemas.Bill.
+    """
+    bills = [dict(row) for row in db.execute(
+        bills_query(owner_id, skip, limit, start, end, *BILL_COLUMNS, by_date=by_date)
+    ).mappings()]
+    if not bills:
+        return bills
+    page = bills_query(owner_id, skip, limit, start, end, models.Bill.id, by_date=by_date)
+    return attach_items(bills, db.execute(bill_items_query(page)).mappings())
+
+
+async def list_bills_async(db: "AsyncSession", owner_id: int, skip: int = 0, limit: Optional[int] = 100,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict]:
+    """Async variant of list_bills."""
+    result = await db.execute(bills_query(owner_id, skip, limit, start, end, *BILL_COLUMNS))
+    bills = [dict(row) for row in result.mappings()]
+    if not bills:
+        return bills
+    page = bills_query(owner_id, skip, limit, start, end, models.Bill.id)
+    result = await db.execute(bill_items_query(page))
+    return attach_items(bills, result.mappings())
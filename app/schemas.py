@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class ItemBase(BaseModel):
@@ -8,6 +8,7 @@ class ItemBase(BaseModel):
     quantity: int
     unit_price: float
     sku: Optional[str] = None
+    reorder_threshold: Optional[int] = None
 
 class ItemCreate(ItemBase):
     pass
@@ -21,6 +22,66 @@ class Item(ItemBase):
     class Config:
         from_attributes = True
 
+class ReorderThresholdUpdate(BaseModel):
+    reorder_threshold: Optional[int] = Field(None, ge=0)
+
+class StockAlert(BaseModel):
+    id: int
+    item_id: int
+    owner_id: int
+    quantity: int
+    threshold: int
+    created_at: datetime
+    resolved_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+class BillImageUrls(BaseModel):
+    image: str
+    thumbnail: str
+
+class AlertCount(BaseModel):
+    low_stock_items: int
+
+class StockAdjustmentLine(BaseModel):
+    """One counted line: identify the item by id or SKU, give a counted quantity or a delta."""
+    item_id: Optional[int] = None
+    sku: Optional[str] = None
+    counted: Optional[int] = Field(None, ge=0)
+    delta: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_exclusive(self):
+        if (self.item_id is None) == (self.sku is None):
+            raise ValueError("give exactly one of item_id or sku")
+        if (self.counted is None) == (self.delta is None):
+            raise ValueError("give exactly one of counted or delta")
+        return self
+
+class StockAdjustmentRequest(BaseModel):
+    lines: List[StockAdjustmentLine] = Field(..., min_length=1, max_length=100_000)
+    note: Optional[str] = None
+
+class StockAdjustmentResult(BaseModel):
+    batch_id: str
+    lines: int
+    changed: int  # items whose quantity moved; movements are recorded per line
+
+class StockMovement(BaseModel):
+    id: int
+    item_id: int
+    batch_id: str
+    reason: str
+    previous_quantity: int
+    quantity: int
+    change: int
+    note: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class BillItemBase(BaseModel):
     quantity: int
     unit_price: float
@@ -81,4 +142,21 @@ class Token(BaseModel):
     token_type: str
 
 class TokenData(BaseModel):
-    email: Optional[str] = None 
\ No newline at end of file
+    email: Optional[str] = None
+
+class ProfilingToggleCreate(BaseModel):
+    email: Optional[EmailStr] = None  # None profiles any tenant
+    path_prefix: str = "/"
+    sample_rate: float = Field(1.0, gt=0, le=1)
+    max_profiles: int = Field(5, ge=1, le=100)
+    mode: Literal["sample", "cprofile"] = "sample"
+    ttl_seconds: int = Field(3600, ge=1, le=7 * 24 * 3600)
+
+class ProfilingToggle(BaseModel):
+    id: str
+    email: Optional[str]
+    path_prefix: str
+    sample_rate: float
+    max_profiles: int
+    mode: str
+    expires_at: float
@@ -0,0 +1,174 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from .. import config
+from ..utils import open_image
+
+MEDIA_TYPES = {".webp": "image/webp", ".jpg": "image/jpeg", ".pdf": "application/pdf"}
+FORMATS = {"webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+
+
+class ImageStore:
+    """
+    Content-addressed store for bill images.
+
+    Each upload is saved once under the SHA-256 of its original bytes
+    (``<root>/images/ab/<digest>.<ext>``), so re-uploading the same photo
+    reuses the stored copy. Images are recompressed to ``format`` at
+    ``quality`` and downscaled to ``max_side``; PDFs are kept as they are.
+    Thumbnails live under ``<root>/thumbnails`` and are generated separately,
+    usually from a background task after the upload has been answered.
+
+    Keys returned by ``save`` are paths relative to ``root`` and are what
+    ``Bill.image_path`` stores. Uploads hold their key from ``add`` until
+    ``release``, so one that fails never deletes a file another upload in
+    this process is about to refer to.
+    """
+
+    def __init__(self, root: Path, format: str = config.IMAGE_STORE_FORMAT,
+                 quality: int = config.IMAGE_STORE_QUALITY,
+                 max_side: int = config.IMAGE_STORE_MAX_SIDE,
+                 thumbnail_size: int = config.THUMBNAIL_SIZE):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported image format {format!r}; choose from {', '.join(FORMATS)}")
+        self.root = Path(root)
+        self.format = format
+        self.quality = quality
+        self.max_side = max_side
+        self.thumbnail_size = thumbnail_size
+        self._lock = threading.Lock()
+        self._holds = Counter()
+
+    def _find(self, digest: str) -> Optional[str]:
+        directory = self.root / "images" / digest[:2]
+        for suffix in MEDIA_TYPES:
+            if (directory / f"{digest}{suffix}").exists():
+                return f"images/{digest[:2]}/{digest}{suffix}"
+        return None
+
+    def _write(self, path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent uploads of one image never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _encode(self, image, max_side: int) -> bytes:
+        from PIL import ImageOps
+
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("L" if image.mode in ("1", "L", "I;16") else "RGB")
+        image.thumbnail((max_side, max_side))
+        buffer = io.BytesIO()
+        image.save(buffer, format=FORMATS[self.format][0], quality=self.quality)
+        return buffer.getvalue()
+
+    def save(self, contents: bytes, is_pdf: bool = False) -> str:
+        """
+        Store an upload unless an identical one is already stored.
+
+        Returns:
+            str: The image key.
+        """
+        key, _ = self.add(contents, is_pdf)
+        self.release(key)
+        return key
+
+    def add(self, contents: bytes, is_pdf: bool = False) -> Tuple[str, bool]:
+        """
+        Like ``save``, but also report whether this call wrote the file, and
+        hold the key until ``release``.
+
+        Returns:
+            tuple: The image key and True if it was not stored before.
+
+        Raises:
+            UnreadableUpload: ``contents`` is not a readable image.
+        """
+        digest = hashlib.sha256(contents).hexdigest()
+        with self._lock:
+            key = self._find(digest)
+            if key is not None:
+                self._holds[key] += 1
+                return key, False
+
+        # Encoding is slow; concurrent first uploads of one image both write it
+        if is_pdf:
+            data, suffix = contents, ".pdf"
+        else:
+            data, suffix = self._encode(open_image(contents), self.max_side), FORMATS[self.format][1]
+        key = f"images/{digest[:2]}/{digest}{suffix}"
+        with self._lock:
+            self._write(self.root / key, data)
+            self._holds[key] += 1
+        return key, True
+
+    def release(self, key: str, unused: Optional[Callable[[], bool]] = None):
+        """
+        Drop a hold taken by ``add``.
+
+        Args:
+            key (str): The image key.
+            unused (callable, optional): For a failed upload; when no other
+                upload holds the key it is called, still under the lock, and
+                the image is deleted if it returns True (no bill refers to it).
+        """
+        with self._lock:
+            self._holds[key] -= 1
+            if self._holds[key] > 0:
+                return
+            del self._holds[key]
+            if unused is not None and unused():
+                self.delete(key)
+
+    def delete(self, key: str):
+        """Remove a stored image and its thumbnail, if present."""
+        path = self.path(key)
+        if path is None:
+            return
+        (self.root / self.thumbnail_key(key)).unlink(missing_ok=True)
+        path.unlink(missing_ok=True)
+
+    def path(self, key: str) -> Optional[Path]:
+        """Resolve a key to its file, or None for keys that are not in the store."""
+        if not key or not key.startswith("images/") or ".." in key:
+            return None
+        path = self.root / key
+        return path if path.is_file() else None
+
+    def thumbnail_key(self, key: str) -> str:
+        return "thumbnails/" + key[len("images/"):].rsplit(".", 1)[0] + FORMATS[self.format][1]
+
+    def make_thumbnail(self, key: str) -> Optional[Path]:
+        """Create the thumbnail for a stored image if it does not exist yet."""
+        source = self.path(key)
+        if source is None:
+            return None
+        target = self.root / self.thumbnail_key(key)
+        if target.exists():
+            return target
+
+        if source.suffix == ".pdf":
+            import pymupdf
+            from PIL import Image
+
+            with pymupdf.open(source) as doc:
+                pix = doc[0].get_pixmap(dpi=72, alpha=False)
+                image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        else:
+            from PIL import Image
+
+            image = Image.open(source)
+        self._write(target, self._encode(image, self.thumbnail_size))
+        return target
+
+
+def media_type(path: Path) -> str:
+    return MEDIA_TYPES.get(path.suffix, "application/octet-stream")
@@ -0,0 +1,203 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from .. import config
+
+
+class OCRQueueFull(Exception):
+    """Raised when a tenant already has the maximum number of queued OCR jobs."""
+
+
+def pixel_cost(width: int, height: int) -> float:
+    """Scheduling cost of OCR'ing an image, in units of OCR_COST_PIXELS."""
+    return width * height / config.OCR_COST_PIXELS
+
+
+class _Job:
+    __slots__ = ("fn", "args", "cost", "future", "enqueued_at", "context")
+
+    def __init__(self, fn: Callable, args: tuple, cost: float):
+        self.fn = fn
+        self.args = args
+        self.cost = cost
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+        # Run in the submitter's context, as asyncio.to_thread does (request profiling relies on it)
+        self.context = contextvars.copy_context()
+
+
+class _Tenant:
+    def __init__(self, wait_samples: int):
+        self.queue = deque()
+        self.deficit = 0.0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.waits = deque(maxlen=wait_samples)
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class OCRScheduler:
+    """
+    Fair scheduling of OCR jobs across tenants.
+
+    Each owner gets their own queue and jobs are dispatched to a fixed pool
+    of worker threads by deficit round-robin, so a tenant with a bulk import
+    waits behind its own backlog instead of everyone else's. Tenants are
+    also capped on concurrently running jobs and on queue depth.
+
+    A job's ``cost`` is the work it represents (see ``pixel_cost``), so a
+    tenant's share is measured in pixels OCR'd rather than in jobs. A
+    tenant's ``weight`` scales its share; it defaults to
+    OCR_TENANT_WEIGHTS and must be positive.
+    """
+
+    def __init__(self, workers: int = config.OCR_WORKERS,
+                 per_tenant_concurrency: int = config.OCR_TENANT_CONCURRENCY,
+                 max_queue_depth: int = config.OCR_TENANT_QUEUE_DEPTH,
+                 quantum: float = 1.0,
+                 weight: Optional[Callable[[int], float]] = None,
+                 wait_samples: int = 1000):
+        if not quantum > 0:
+            raise ValueError("quantum must be positive")
+        self.workers = max(1, workers)
+        self.per_tenant_concurrency = max(1, per_tenant_concurrency)
+        self.max_queue_depth = max_queue_depth
+        self.quantum = quantum
+        self.weight = weight or (lambda owner_id: config.OCR_TENANT_WEIGHTS.get(owner_id, 1.0))
+        self.wait_samples = wait_samples
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr")
+        self._lock = threading.Lock()
+        self._tenants: Dict[int, _Tenant] = {}
+        self._active = deque()
+        self._running = 0
+
+    def submit(self, owner_id: int, fn: Callable, *args, cost: float = 1.0) -> Future:
+        """
+        Queue ``fn(*args)`` on behalf of an owner.
+
+        Raises:
+            OCRQueueFull: The owner already has max_queue_depth jobs waiting.
+            ValueError: The owner's weight is not positive; such a tenant
+                could never be scheduled.
+        """
+        weight = self.weight(owner_id)
+        if not weight > 0:
+            raise ValueError(f"OCR weight for owner {owner_id} must be positive, got {weight}")
+        job = _Job(fn, args, cost)
+        with self._lock:
+            tenant = self._tenants.get(owner_id)
+            if tenant is None:
+                tenant = self._tenants[owner_id] = _Tenant(self.wait_samples)
+            if self.max_queue_depth and len(tenant.queue) >= self.max_queue_depth:
+                tenant.rejected += 1
+                raise OCRQueueFull(f"Too many bills queued for processing ({len(tenant.queue)})")
+            if not tenant.queue:
+                self._active.append(owner_id)
+            tenant.queue.append(job)
+            self._dispatch()
+        return job.future
+
+    async def run(self, owner_id: int, fn: Callable, *args, cost: float = 1.0):
+        """Await ``fn(*args)`` scheduled fairly for the owner."""
+        return await asyncio.wrap_future(self.submit(owner_id, fn, *args, cost=cost))
+
+    def _next_job(self):
+        """Pick the next job by deficit round-robin; caller holds the lock."""
+        if all(self._tenants[owner].running >= self.per_tenant_concurrency for owner in self._active):
+            return None, None
+
+        while True:
+            owner_id = self._active[0]
+            tenant = self._tenants[owner_id]
+            if tenant.running >= self.per_tenant_concurrency:
+                self._active.rotate(-1)
+                continue
+
+            job = tenant.queue[0]
+            if tenant.deficit < job.cost:
+                tenant.deficit += self.quantum * self.weight(owner_id)
+                if tenant.deficit < job.cost:
+                    self._active.rotate(-1)
+                    continue
+
+            tenant.deficit -= job.cost
+            tenant.queue.popleft()
+            if not tenant.queue:
+                self._active.popleft()
+                tenant.deficit = 0.0
+            elif tenant.deficit < tenant.queue[0].cost:
+                self._active.rotate(-1)
+            return owner_id, job
+
+    def _dispatch(self):
+        """Start jobs while workers are free; caller holds the lock."""
+        while self._running < self.workers and self._active:
+            owner_id, job = self._next_job()
+            if job is None:
+                return
+            if not job.future.set_running_or_notify_cancel():
+                continue  # caller went away while queued
+
+            tenant = self._tenants[owner_id]
+            tenant.running += 1
+            tenant.waits.append(time.monotonic() - job.enqueued_at)
+            self._running += 1
+            self._executor.submit(self._execute, owner_id, job)
+
+    def _execute(self, owner_id: int, job: _Job):
+        try:
+            job.future.set_result(job.context.run(job.fn, *job.args))
+        except BaseException as exc:
+            job.future.set_exception(exc)
+        finally:
+            with self._lock:
+                tenant = self._tenants[owner_id]
+                tenant.running -= 1
+                tenant.completed += 1
+                self._running -= 1
+                self._dispatch()
+
+    def metrics(self, owner_id: Optional[int] = None) -> Dict:
+        """
+        Queue and wait-time statistics, per tenant.
+
+        Args:
+            owner_id (int, optional): Restrict the report to one tenant.
+
+        Returns:
+            dict: Tenant id -> queued, running, completed, rejected and wait
+            percentiles (seconds from enqueue to start) over recent jobs.
+        """
+        with self._lock:
+            owners = [owner_id] if owner_id is not None else list(self._tenants)
+            report = {}
+            for owner in owners:
+                tenant = self._tenants.get(owner)
+                if tenant is None:
+                    continue
+                waits = list(tenant.waits)
+                report[owner] = {
+                    "queued": len(tenant.queue),
+                    "running": tenant.running,
+                    "completed": tenant.completed,
+                    "rejected": tenant.rejected,
+                    "wait_p50": _percentile(waits, 0.50),
+                    "wait_p99": _percentile(waits, 0.99),
+                    "wait_max": max(waits, default=0.0),
+                }
+            return report
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
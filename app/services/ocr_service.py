@@ -1,17 +1,58 @@
-import easyocr
-import cv2
-import numpy as np
-from PIL import Image
-import io
 import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import TYPE_CHECKING, Iterator, List, Dict, Tuple
+
+from .. import config
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image
 
 class OCRService:
-    def __init__(self):
-        self.reader = easyocr.Reader(['en'])
+    """
+    OCR for bill images.
+
+    cv2, numpy and easyocr (and through it torch) are imported on first use
+    rather than at module load, so importing the API stays fast for code
+    paths that never touch OCR.
+
+    Tall images (height at least ``tiled_min_aspect`` times the width, such
+    as long thermal receipts) are read in overlapping horizontal strips:
+    the detector would otherwise shrink the whole frame to its canvas size
+    and lose small print, and the preprocessing buffers would grow with the
+    receipt. At most ``strip_workers`` strips are in flight at once, so the
+    working memory stays flat however long the receipt is.
+    """
+
+    def __init__(self, tiled_min_aspect: float = config.OCR_TILED_MIN_ASPECT,
+                 strip_aspect: float = config.OCR_STRIP_ASPECT,
+                 strip_overlap: float = config.OCR_STRIP_OVERLAP,
+                 strip_workers: int = config.OCR_STRIP_WORKERS):
+        self._reader = None
+        self.tiled_min_aspect = tiled_min_aspect
+        self.strip_aspect = strip_aspect
+        self.strip_overlap = strip_overlap
+        self.strip_workers = max(1, strip_workers)
+
+    @property
+    def reader(self):
+        if self._reader is None:
+            self.load_reader()
+        return self._reader
+
+    def load_reader(self):
+        """Build the easyocr reader, downloading model weights if needed."""
+        import easyocr
+
+        self._reader = easyocr.Reader(['en'])
+        return self._reader
         
-    def preprocess_image(self, image: Image.Image) -> np.ndarray:
+    def preprocess_image(self, image: "Image.Image") -> "np.ndarray":
+        import cv2
+        import numpy as np
+
         # Convert PIL Image to numpy array
         img_array = np.array(image)
         
@@ -26,7 +67,10 @@ class OCRService:
         
         return denoised
 
-    def extract_text(self, image: Image.Image) -> List[Tuple[str, float]]:
+    def extract_text(self, image: "Image.Image") -> List[Tuple[str, float]]:
+        if self.tiled_min_aspect and image.height >= self.tiled_min_aspect * image.width:
+            return self.extract_text_tiled(image)
+
         # Preprocess the image
         processed_image = self.preprocess_image(image)
         
@@ -34,6 +78,91 @@ class OCRService:
         results = self.reader.readtext(processed_image)
         return results
 
+    def iter_strips(self, image: "Image.Image") -> Iterator[Tuple[int, int]]:
+        """
+        Yield (top, bottom) pixel rows of overlapping strips covering the image.
+
+        The last strip is aligned with the bottom edge rather than cut short.
+        """
+        height = max(1, round(image.width * self.strip_aspect))
+        if height >= image.height:
+            yield 0, image.height
+            return
+        step = max(1, round(height * (1 - self.strip_overlap)))
+        top = 0
+        while top + height < image.height:
+            yield top, top + height
+            top += step
+        yield image.height - height, image.height
+
+    def _read_strip(self, image: "Image.Image", top: int, bottom: int) -> List[Tuple]:
+        """OCR one strip, moving boxes into image coordinates and dropping text cut by a strip edge."""
+        strip = image.crop((0, top, image.width, bottom))
+        results = self.reader.readtext(self.preprocess_image(strip))
+        del strip
+
+        margin = 2  # pixels; a box this close to a cut edge is probably truncated
+        kept = []
+        for bbox, text, confidence in results:
+            bbox = [[x, y + top] for x, y in bbox]
+            ys = [y for _, y in bbox]
+            if top > 0 and min(ys) <= top + margin:
+                continue
+            if bottom < image.height and max(ys) >= bottom - margin:
+                continue
+            kept.append((bbox, text, confidence))
+        return kept
+
+    @staticmethod
+    def _same_box(a, b) -> bool:
+        """Whether two boxes mostly cover the same area (intersection over the smaller box)."""
+        ax0, ay0 = min(x for x, _ in a), min(y for _, y in a)
+        ax1, ay1 = max(x for x, _ in a), max(y for _, y in a)
+        bx0, by0 = min(x for x, _ in b), min(y for _, y in b)
+        bx1, by1 = max(x for x, _ in b), max(y for _, y in b)
+        width, height = min(ax1, bx1) - max(ax0, bx0), min(ay1, by1) - max(ay0, by0)
+        if width <= 0 or height <= 0:
+            return False
+        smaller = min((ax1 - ax0) * (ay1 - ay0), (bx1 - bx0) * (by1 - by0))
+        return smaller > 0 and width * height / smaller > 0.5
+
+    def extract_text_tiled(self, image: "Image.Image") -> List[Tuple]:
+        """
+        OCR a tall image strip by strip and merge the results top to bottom.
+
+        Text in the overlap between two strips is read twice; the copy with
+        the higher confidence is kept. Text lines must be shorter than the
+        overlap, or they are cut in both strips.
+        """
+        image.load()  # decode once, before worker threads crop it
+        merged = []
+        previous = []  # positions in merged of the last strip's detections
+
+        def merge(results):
+            nonlocal previous
+            current = []
+            for detection in results:
+                duplicate = next((i for i in previous if self._same_box(merged[i][0], detection[0])), None)
+                if duplicate is None:
+                    current.append(len(merged))
+                    merged.append(detection)
+                else:
+                    if detection[2] > merged[duplicate][2]:
+                        merged[duplicate] = detection
+                    current.append(duplicate)
+            previous = current
+
+        with ThreadPoolExecutor(max_workers=self.strip_workers) as executor:
+            pending = deque()
+            for top, bottom in self.iter_strips(image):
+                pending.append(executor.submit(self._read_strip, image, top, bottom))
+                # Keep the window bounded so strip buffers don't pile up
+                while len(pending) >= self.strip_workers:
+                    merge(pending.popleft().result())
+            while pending:
+                merge(pending.popleft().result())
+        return merged
+
     def parse_bill_data(self, ocr_results: List[Tuple[str, float]]) -> Dict:
         bill_data = {
             "items": [],
@@ -47,7 +176,9 @@ class OCRService:
         date_pattern = r'\d{1,2}[-/]\d{1,2}[-/]\d{2,4}'
         bill_number_pattern = r'(?:Bill|Invoice|Receipt)\s*(?:#|No\.?)?\s*[:#]?\s*(\d+)'
         
-        for text, confidence in ocr_results:
+        for result in ocr_results:
+            # easyocr yields (bbox, text, confidence); the PDF text layer yields (text, confidence)
+            text, confidence = result[-2], result[-1]
             text = text.strip()
             
             # Extract bill number
@@ -106,7 +237,7 @@ class OCRService:
         
         return bill_data
 
-    def process_bill_image(self, image: Image.Image) -> Dict:
+    def process_bill_image(self, image: "Image.Image") -> Dict:
         """
         Process a bill image and return structured data
         """
@@ -0,0 +1,100 @@
+import itertools
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .. import config
+from ..utils import UnreadableUpload
+
+if TYPE_CHECKING:
+    import pymupdf
+    from PIL import Image
+
+
+class PDFService:
+    """
+    Turns PDF invoices into OCR-style results.
+
+    Pages with an embedded text layer are read directly and never OCR'd.
+    Scanned pages are rasterized one at a time and OCR'd on a small thread
+    pool, or through a caller's ``submit`` such as the OCR scheduler; at
+    most ``max_workers`` page bitmaps are alive at once.
+    """
+
+    def __init__(self, ocr_service, dpi: int = config.PDF_RASTER_DPI,
+                 max_workers: int = config.PDF_OCR_WORKERS,
+                 min_text_chars: int = config.PDF_MIN_TEXT_CHARS):
+        self.ocr_service = ocr_service
+        self.dpi = dpi
+        self.max_workers = max(1, max_workers)
+        self.min_text_chars = min_text_chars
+
+    def extract_text_layer(self, page: "pymupdf.Page") -> List[Tuple[str, float]]:
+        """
+        Return the page's embedded text as (line, confidence) pairs, or an
+        empty list when the page looks scanned.
+        """
+        text = page.get_text("text")
+        if len(text.strip()) < self.min_text_chars:
+            return []
+        return [(line, 1.0) for line in text.splitlines() if line.strip()]
+
+    def rasterize_page(self, page: "pymupdf.Page") -> "Image.Image":
+        from PIL import Image
+
+        pix = page.get_pixmap(dpi=self.dpi, alpha=False)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    def iter_page_results(self, contents: bytes, submit: Optional[Callable[..., Future]] = None
+                          ) -> Iterator[List[Tuple[str, float]]]:
+        """
+        Yield OCR-style results for each page, in page order.
+
+        MuPDF is not thread-safe, so rendering stays on the calling thread;
+        only the OCR of rendered pages runs in parallel.
+
+        Args:
+            contents (bytes): The PDF.
+            submit (callable, optional): ``submit(fn, image) -> Future`` that
+                runs ``fn(image)`` elsewhere; defaults to a private pool.
+
+        Raises:
+            UnreadableUpload: ``contents`` is not a PDF MuPDF can open.
+        """
+        import pymupdf
+
+        try:
+            doc = pymupdf.open(stream=contents, filetype="pdf")
+        except pymupdf.FileDataError as exc:
+            raise UnreadableUpload("The bill is not a readable PDF file") from exc
+        with doc, ExitStack() as stack:
+            if submit is None:
+                submit = stack.enter_context(ThreadPoolExecutor(max_workers=self.max_workers)).submit
+            pending = deque()
+            for page in doc:
+                text_results = self.extract_text_layer(page)
+                if text_results:
+                    pending.append(text_results)
+                else:
+                    image = self.rasterize_page(page)
+                    pending.append(submit(self.ocr_service.extract_text, image))
+                    del image
+
+                # Keep the window bounded so bitmaps don't pile up
+                while len(pending) > self.max_workers or (pending and isinstance(pending[0], list)):
+                    yield self._resolve(pending.popleft())
+
+            while pending:
+                yield self._resolve(pending.popleft())
+
+    @staticmethod
+    def _resolve(entry):
+        return entry if isinstance(entry, list) else entry.result()
+
+    def process_bill_pdf(self, contents: bytes, submit: Optional[Callable[..., Future]] = None) -> Dict:
+        """
+        Process a PDF bill and return structured data
+        """
+        ocr_results = itertools.chain.from_iterable(self.iter_page_results(contents, submit))
+        return self.ocr_service.parse_bill_data(ocr_results)
@@ -0,0 +1,326 @@
+"""
+sharding.py
+
+Optional per-tenant database sharding.
+
+With SHARD_COUNT > 0, every owner's inventory (items, bills, bill items,
+alerts and stock movements) lives in one of SHARD_COUNT databases built
+from SHARD_URL_TEMPLATE. The main database (DATABASE_URL) becomes the
+directory. It keeps the authoritative ``users`` table, and ``User.shard``
+records where each owner's data is. Owners are placed by ``owner_id %
+SHARD_COUNT`` when they register. Each shard also holds a copy of its
+owners' user rows. These are the foreign-key target for the inventory
+tables, and they carry the ``data_version`` that inventory writes bump.
+
+SQLite allows one writer per database file, so spreading owners over
+shards lets their uploads commit in parallel.
+
+With SHARD_COUNT = 0 (the default) every helper here falls back to the
+main database, and nothing changes.
+
+Usage:
+    python -m app.sharding status
+    python -m app.sharding move --owner 12 --to 3
+    python -m app.sharding rebalance [--dry-run]
+"""
+import argparse
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import config, models
+from .database import AsyncSessionLocal, SessionLocal, async_database_url, use_wal
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Owner-scoped tables in foreign-key order
+TENANT_MODELS = (models.Item, models.Bill, models.BillItem, models.StockAlert, models.StockMovement)
+
+
+class ShardSet:
+    """The shard databases, each with a sync and an async engine (created on first use)."""
+
+    def __init__(self, count: int, url_template: str):
+        self.count = count
+        self.urls = [url_template.format(shard=shard) for shard in range(count)]
+        self.engines = []
+        self.sessionmakers = []
+        self.async_engines = {}
+        self._async_sessionmakers = {}
+        for url in self.urls:
+            parsed = make_url(url)
+            if parsed.get_backend_name() == "sqlite" and parsed.database:
+                Path(parsed.database).parent.mkdir(parents=True, exist_ok=True)
+            engine = use_wal(create_engine(url, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {}))
+            self.engines.append(engine)
+            self.sessionmakers.append(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+
+    def async_session(self, shard: int) -> "AsyncSession":
+        maker = self._async_sessionmakers.get(shard)
+        if maker is None:
+            from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+            engine = self.async_engines[shard] = create_async_engine(async_database_url(self.urls[shard]))
+            maker = self._async_sessionmakers[shard] = async_sessionmaker(
+                engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+        return maker()
+
+    def create_all(self):
+        for engine in self.engines:
+            models.create_schema(engine)
+
+    async def dispose(self):
+        for engine in self.async_engines.values():
+            await engine.dispose()
+
+    def assign(self, owner_id: int) -> int:
+        return owner_id % self.count
+
+
+shard_set: Optional[ShardSet] = (
+    ShardSet(config.SHARD_COUNT, config.SHARD_URL_TEMPLATE) if config.SHARD_COUNT > 0 else None
+)
+
+
+def shard_of(owner: models.User) -> Optional[int]:
+    """The shard holding ``owner``'s inventory, or None for the main database."""
+    if shard_set is None or owner.shard is None:
+        return None
+    return owner.shard
+
+
+def session_for(owner: models.User) -> Session:
+    """A session on the database holding ``owner``'s inventory."""
+    shard = shard_of(owner)
+    return SessionLocal() if shard is None else shard_set.sessionmakers[shard]()
+
+
+def async_session_for(owner: models.User) -> "AsyncSession":
+    shard = shard_of(owner)
+    return AsyncSessionLocal() if shard is None else shard_set.async_session(shard)
+
+
+def tenant_sessionmakers() -> List:
+    """
+    Sessionmakers for every database holding inventory, for jobs that scan all owners.
+
+    The main database is always included: owners registered before sharding
+    was enabled stay there until they are moved.
+    """
+    return [SessionLocal] + (list(shard_set.sessionmakers) if shard_set is not None else [])
+
+
+def _user_row(user: models.User) -> Dict:
+    return {column.key: getattr(user, column.key) for column in models.User.__table__.columns}
+
+
+def register_tenant(directory: Session, user: models.User):
+    """Place a new owner on a shard and copy their user row there."""
+    if shard_set is None:
+        return
+    user.shard = shard_set.assign(user.id)
+    directory.commit()
+    with shard_set.sessionmakers[user.shard]() as db:
+        db.execute(insert(models.User.__table__), [_user_row(user)])
+        db.commit()
+
+
+def tenant_rows(db: Session, owner_id: int) -> Dict[type, List[Dict]]:
+    """Every row the owner has in ``db``, per model."""
+    bill_ids = select(models.Bill.id).where(models.Bill.owner_id == owner_id).scalar_subquery()
+    filters = {
+        models.Item: models.Item.owner_id == owner_id,
+        models.Bill: models.Bill.owner_id == owner_id,
+        models.BillItem: models.BillItem.bill_id.in_(bill_ids),
+        models.StockAlert: models.StockAlert.owner_id == owner_id,
+        models.StockMovement: models.StockMovement.owner_id == owner_id,
+    }
+    return {
+        model: [dict(row) for row in db.execute(select(model.__table__).where(filters[model])).mappings()]
+        for model in TENANT_MODELS
+    }
+
+
+def copy_tenant(rows: Dict[type, List[Dict]], target: Session):
+    """
+    Insert an owner's rows into another database.
+
+    Row ids are allocated per database, so they are reassigned by the target
+    and foreign keys are remapped to the new ids.
+    """
+    new_ids = {model: {} for model in TENANT_MODELS}
+    references = {
+        models.BillItem: {"bill_id": models.Bill, "item_id": models.Item},
+        models.StockAlert: {"item_id": models.Item},
+        models.StockMovement: {"item_id": models.Item},
+    }
+    for model in TENANT_MODELS:
+        for row in rows[model]:
+            row = dict(row)
+            old_id = row.pop("id")
+            for column, referenced in references.get(model, {}).items():
+                if row[column] is not None:
+                    row[column] = new_ids[referenced][row[column]]
+            new_ids[model][old_id] = target.execute(insert(model.__table__).values(**row)).inserted_primary_key[0]
+
+
+def delete_rows(db: Session, rows: Dict[type, List[Dict]]):
+    for model in reversed(TENANT_MODELS):
+        ids = [row["id"] for row in rows[model]]
+        for start in range(0, len(ids), 500):
+            db.execute(delete(model.__table__).where(model.__table__.c.id.in_(ids[start:start + 500])))
+
+
+def move_tenant(owner_id: int, to_shard: int, directory: Session = None):
+    """
+    Move an owner's inventory to another shard.
+
+    The copy is committed on the target before the directory is switched,
+    and the source rows are deleted last, so an interrupted move leaves
+    the owner readable on the old shard. Writes made during the move are
+    lost: run it while the owner is idle. Item and bill ids change.
+    """
+    if shard_set is None:
+        raise RuntimeError("Sharding is disabled; set SHARD_COUNT")
+    own_directory = directory is None
+    directory = directory or SessionLocal()
+    try:
+        user = directory.get(models.User, owner_id)
+        if user is None:
+            raise ValueError(f"No owner {owner_id}")
+        from_shard = user.shard
+        if from_shard == to_shard:
+            return
+
+        source = SessionLocal() if from_shard is None else shard_set.sessionmakers[from_shard]()
+        target = shard_set.sessionmakers[to_shard]()
+        try:
+            rows = tenant_rows(source, owner_id)
+            source_user = source.get(models.User, owner_id)
+            user_row = _user_row(source_user or user)
+            user_row["shard"] = to_shard
+            # Bump so cached responses from the old shard are never served again
+            user_row["data_version"] = (user_row["data_version"] or 0) + 1
+            # Clear what an earlier, interrupted move may have left on the target
+            delete_rows(target, tenant_rows(target, owner_id))
+            target.execute(delete(models.User.__table__).where(models.User.id == owner_id))
+            target.execute(insert(models.User.__table__), [user_row])
+            copy_tenant(rows, target)
+            target.commit()
+
+            user.shard = to_shard
+            directory.commit()
+
+            delete_rows(source, rows)
+            if from_shard is not None:
+                source.execute(delete(models.User.__table__).where(models.User.id == owner_id))
+            source.commit()
+        finally:
+            source.close()
+            target.close()
+    finally:
+        if own_directory:
+            directory.close()
+
+
+def tenant_loads(directory: Session) -> Dict[int, Tuple[Optional[int], int]]:
+    """Each owner's shard and row count (items + bills), the weight used for balancing."""
+    shards = dict(directory.execute(select(models.User.id, models.User.shard)).all())
+    loads = {owner_id: (shard, 0) for owner_id, shard in shards.items()}
+    sources = [(None, SessionLocal)] + list(enumerate(shard_set.sessionmakers if shard_set else []))
+    for shard, maker in sources:
+        with maker() as db:
+            for model in (models.Item, models.Bill):
+                counts = db.execute(select(model.owner_id, func.count()).group_by(model.owner_id))
+                for owner_id, count in counts:
+                    if owner_id in loads and loads[owner_id][0] == shard:
+                        loads[owner_id] = (shard, loads[owner_id][1] + count)
+    return loads
+
+
+def plan_moves(loads: Dict[int, Tuple[Optional[int], int]], shard_count: int) -> List[Tuple[int, int]]:
+    """
+    Greedy plan of (owner_id, to_shard) moves evening out shard weights.
+
+    Owners without a shard are placed first. Then the heaviest shard gives
+    the lightest one the owner whose weight is closest to half the gap,
+    until no move narrows it. Each owner appears at most once in the plan.
+    """
+    original = {owner_id: shard for owner_id, (shard, _) in loads.items()}
+    placement = dict(original)
+    weights = {owner_id: weight for owner_id, (_, weight) in loads.items()}
+    totals = [0] * shard_count
+    for owner_id, shard in placement.items():
+        if shard is not None and shard < shard_count:
+            totals[shard] += weights[owner_id]
+
+    for owner_id in sorted(placement, key=lambda owner: -weights[owner]):
+        if placement[owner_id] is None or placement[owner_id] >= shard_count:
+            to_shard = totals.index(min(totals))
+            totals[to_shard] += weights[owner_id]
+            placement[owner_id] = to_shard
+
+    while True:
+        heaviest = totals.index(max(totals))
+        lightest = totals.index(min(totals))
+        gap = totals[heaviest] - totals[lightest]
+        candidates = [owner_id for owner_id, shard in placement.items()
+                      if shard == heaviest and 0 < weights[owner_id] < gap]
+        if not candidates:
+            break
+        owner_id = min(candidates, key=lambda owner: abs(gap - 2 * weights[owner]))
+        placement[owner_id] = lightest
+        totals[heaviest] -= weights[owner_id]
+        totals[lightest] += weights[owner_id]
+
+    return [(owner_id, shard) for owner_id, shard in placement.items() if shard != original[owner_id]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and rebalance tenant shards")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show owners and rows per shard")
+    move = commands.add_parser("move", help="Move one owner to a shard")
+    move.add_argument("--owner", type=int, required=True)
+    move.add_argument("--to", type=int, required=True, dest="to_shard")
+    rebalance = commands.add_parser("rebalance", help="Even out shards by row count")
+    rebalance.add_argument("--dry-run", action="store_true", help="Print the plan without moving anything")
+    args = parser.parse_args()
+
+    if shard_set is None:
+        parser.error("sharding is disabled; set SHARD_COUNT")
+    shard_set.create_all()
+
+    directory = SessionLocal()
+    try:
+        if args.command == "status":
+            totals = {}
+            for shard, weight in tenant_loads(directory).values():
+                owners, rows = totals.get(shard, (0, 0))
+                totals[shard] = (owners + 1, rows + weight)
+            for shard in sorted(totals, key=lambda shard: -1 if shard is None else shard):
+                owners, rows = totals[shard]
+                print(f"{'main' if shard is None else shard:>6}  {owners:>6} owners  {rows:>10} rows")
+        elif args.command == "move":
+            if not 0 <= args.to_shard < shard_set.count:
+                parser.error(f"--to must be between 0 and {shard_set.count - 1}")
+            move_tenant(args.owner, args.to_shard, directory)
+            print(f"Moved owner {args.owner} to shard {args.to_shard}.")
+        else:
+            moves = plan_moves(tenant_loads(directory), shard_set.count)
+            for owner_id, to_shard in moves:
+                print(f"owner {owner_id} -> shard {to_shard}")
+                if not args.dry_run:
+                    move_tenant(owner_id, to_shard, directory)
+            print(f"{len(moves)} move(s){' planned' if args.dry_run else ''}.")
+    finally:
+        directory.close()
+
+
+if __name__ == "__main__":
+    main()
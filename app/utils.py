@@ -3,5 +3,64 @@ utils.py
 
 Utility functions.
 """
+import io
+import re
+from typing import Optional, Tuple
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
 def allowed_file(filename):
-    return filename.lower().endswith((".jpg", ".jpeg", ".png"))
+    return filename.lower().endswith((".jpg", ".jpeg", ".png", ".pdf"))
+
+
+class UnreadableUpload(ValueError):
+    """Raised when an uploaded bill cannot be decoded as an image or PDF."""
+
+
+def is_pdf(contents: bytes) -> bool:
+    # Decided by content, not by name; readers allow junk before the header
+    return b"%PDF-" in contents[:1024]
+
+
+def open_image(contents: bytes):
+    """
+    Open and fully decode an uploaded image.
+
+    Raises:
+        UnreadableUpload: The bytes are not an image PIL can read, or the
+            image is truncated or too large to decode safely.
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        image = Image.open(io.BytesIO(contents))
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+        raise UnreadableUpload("The bill is not a readable JPEG, PNG or PDF file") from exc
+    return image
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range ``Range`` header against a resource of ``size`` bytes.
+
+    Returns:
+        tuple: Inclusive (start, end) byte positions, or None when the range
+        is malformed, has several parts or cannot be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return None
+    return start, end
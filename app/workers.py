@@ -0,0 +1,23 @@
+"""
+workers.py
+
+Gunicorn worker class used by the production launcher.
+"""
+import os
+
+from uvicorn.workers import UvicornWorker
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    """
+    Uvicorn worker running on uvloop with the httptools parser.
+
+    Gunicorn only passes its own settings through to the worker, so the
+    concurrency limit is read from the environment set by ``main.py``.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "limit_concurrency": int(os.getenv("LIMIT_CONCURRENCY", "0")) or None,
+    }
@@ -0,0 +1,104 @@
+"""
+bench_list_responses.py
+
+Requests/sec for /items/ and /bills/ on large pages, compared with the
+previous ORM + response_model serialization path.
+
+Usage:
+    python -m benchmarks.bench_list_responses [--rows 1000] [--requests 50]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import List
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-')}/bench.db"
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app import models, schemas
+from app.database import SessionLocal, engine
+from app.main import app, create_access_token, get_current_user, get_db
+
+# The handlers as they were before the row-based path, for comparison
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/items/", response_model=List[schemas.Item])
+def legacy_items(skip: int = 0, limit: int = 100,
+                 current_user: models.User = Depends(get_current_user),
+                 db: Session = Depends(get_db)):
+    return db.query(models.Item).filter(
+        models.Item.owner_id == current_user.id
+    ).offset(skip).limit(limit).all()
+
+
+@legacy_app.get("/bills/", response_model=List[schemas.Bill])
+def legacy_bills(skip: int = 0, limit: int = 100,
+                 current_user: models.User = Depends(get_current_user),
+                 db: Session = Depends(get_db)):
+    return db.query(models.Bill).filter(
+        models.Bill.owner_id == current_user.id
+    ).offset(skip).limit(limit).all()
+
+
+def seed(rows: int) -> str:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(email="bench@example.com", hashed_password="x", business_name="Bench")
+    db.add(user)
+    db.flush()
+    items = [
+        models.Item(name=f"Item {i}", quantity=i, unit_price=1.25, sku=f"SKU-{i}", owner_id=user.id)
+        for i in range(rows)
+    ]
+    bills = [
+        models.Bill(bill_number=f"B-{i}", bill_date=datetime(2024, 1, 1), total_amount=3.75,
+                    bill_type="purchase", image_path="bill.png", owner_id=user.id)
+        for i in range(rows)
+    ]
+    db.add_all(items + bills)
+    db.flush()
+    db.add_all([
+        models.BillItem(bill_id=bill.id, item_id=items[(i + j) % rows].id,
+                        quantity=1, unit_price=1.25, total_price=1.25)
+        for i, bill in enumerate(bills) for j in range(3)
+    ])
+    email = user.email
+    db.commit()
+    db.close()
+    return create_access_token(data={"sub": email})
+
+
+def requests_per_second(client: TestClient, path: str, headers: dict, requests: int) -> float:
+    client.get(path, headers=headers).raise_for_status()  # warm up
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers).raise_for_status()
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List endpoint serialization benchmark")
+    parser.add_argument("--rows", type=int, default=1000, help="Rows per page")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per measurement")
+    args = parser.parse_args()
+
+    token = seed(args.rows)
+    headers = {"Authorization": f"Bearer {token}"}
+    clients = {"legacy": TestClient(legacy_app), "optimized": TestClient(app)}
+
+    print(f"{'endpoint':<10}{'path':<12}{'req/s':>10}")
+    for endpoint in ("/items/", "/bills/"):
+        path = f"{endpoint}?limit={args.rows}"
+        for name, client in clients.items():
+            rps = requests_per_second(client, path, headers, args.requests)
+            print(f"{endpoint:<10}{name:<12}{rps:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+load.py
+
+HTTP load generator for the FastAPI app.
+
+Runs a weighted mix of scenarios (login, bill upload with generated
+receipts, /items/ and /bills/ pagination) from a number of concurrent
+virtual users and reports throughput, latency percentiles and error rates
+as JSON, so runs can be compared with --compare.
+
+By default the app runs in-process against a temporary SQLite database,
+upload directory and profile directory, all removed afterwards; --spawn
+starts a local uvicorn server on them instead, and --url targets a
+running deployment.
+
+Usage:
+    python -m benchmarks.load --duration 30 --concurrency 50 --fake-ocr
+    python -m benchmarks.load --spawn --mix items=8,bills=2
+    python -m benchmarks.load --url http://staging:8000 --output run.json
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from . import receipts
+
+PASSWORD = "load-test"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def receipt_png(seed: int, line_count: int) -> bytes:
+    """Render a unique receipt; its seed travels in PNG text chunks for --fake-ocr."""
+    from PIL.PngImagePlugin import PngInfo
+
+    info = PngInfo()
+    info.add_text("seed", str(seed))
+    info.add_text("lines", str(line_count))
+    buffer = io.BytesIO()
+    receipts.render_receipt(seed=seed, line_count=line_count).save(buffer, format="PNG", pnginfo=info)
+    return buffer.getvalue()
+
+
+class VirtualUser:
+    def __init__(self, index: int, args, seeds):
+        self.email = f"load-{index}@example.com"
+        self.rng = random.Random(index)
+        self.args = args
+        self.seeds = seeds
+        self.headers = {}
+
+    async def setup(self, client: httpx.AsyncClient):
+        await client.post("/users/", json={
+            "email": self.email, "business_name": "Load Test", "password": PASSWORD
+        })  # already exists on reruns against a live server
+        await login(client, self)
+
+
+async def login(client: httpx.AsyncClient, user: VirtualUser):
+    response = await client.post("/token", data={"username": user.email, "password": PASSWORD})
+    response.raise_for_status()
+    user.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def upload(client: httpx.AsyncClient, user: VirtualUser):
+    png = await asyncio.to_thread(receipt_png, next(user.seeds), user.args.receipt_lines)
+    response = await client.post(
+        "/bills/upload/", headers=user.headers,
+        files={"file": ("receipt.png", png, "image/png")}
+    )
+    response.raise_for_status()
+
+
+async def list_items(client: httpx.AsyncClient, user: VirtualUser):
+    skip = user.rng.randrange(user.args.pages) * user.args.page_size
+    response = await client.get(f"/items/?skip={skip}&limit={user.args.page_size}", headers=user.headers)
+    response.raise_for_status()
+
+
+async def list_bills(client: httpx.AsyncClient, user: VirtualUser):
+    skip = user.rng.randrange(user.args.pages) * user.args.page_size
+    response = await client.get(f"/bills/?skip={skip}&limit={user.args.page_size}", headers=user.headers)
+    response.raise_for_status()
+
+
+SCENARIOS = {"login": login, "upload": upload, "items": list_items, "bills": list_bills}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run_load(client: httpx.AsyncClient, args) -> Dict:
+    seeds = itertools.count(int(time.time()))  # unique bill numbers across runs
+    users = [VirtualUser(index, args, seeds) for index in range(args.users)]
+    for user in users:
+        await user.setup(client)
+
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(Counter)
+    deadline = time.perf_counter() + args.duration
+
+    async def worker(index: int):
+        user = users[index % len(users)]
+        rng = random.Random(index)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                await SCENARIOS[name](client, user)
+            except httpx.HTTPStatusError as exc:
+                errors[name][str(exc.response.status_code)] += 1
+            except Exception as exc:
+                # Count anything else too rather than let one failure stop this worker
+                errors[name][type(exc).__name__] += 1
+            else:
+                latencies[name].append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    report = {}
+    for name in names + ["total"]:
+        if name == "total":
+            samples = [value for values in latencies.values() for value in values]
+            failed = sum(sum(counter.values()) for counter in errors.values())
+            error_kinds = sum(errors.values(), Counter())
+        else:
+            samples = latencies[name]
+            failed = sum(errors[name].values())
+            error_kinds = errors[name]
+        attempts = len(samples) + failed
+        report[name] = {
+            "requests": attempts,
+            "errors": failed,
+            "error_rate": failed / attempts if attempts else 0.0,
+            "error_kinds": dict(error_kinds),
+            "throughput_rps": len(samples) / elapsed,
+            "latency_ms": {
+                "mean": 1e3 * sum(samples) / len(samples) if samples else 0.0,
+                "p50": 1e3 * percentile(samples, 0.50),
+                "p90": 1e3 * percentile(samples, 0.90),
+                "p99": 1e3 * percentile(samples, 0.99),
+                "max": 1e3 * max(samples, default=0.0),
+            },
+        }
+    return {"elapsed_s": elapsed, "scenarios": report}
+
+
+@contextmanager
+def prepare_database():
+    """
+    Point the app's database, uploads and profiles at a fresh temporary
+    directory, removed on exit; must be entered before importing app.
+    """
+    directory = Path(tempfile.mkdtemp(prefix="load-"))
+    settings = {
+        "DATABASE_URL": f"sqlite:///{directory / 'load.db'}",
+        "UPLOAD_DIR": str(directory / "uploads"),
+        "PROFILE_DIR": str(directory / "profiles"),
+    }
+    previous = {name: os.environ.get(name) for name in settings}
+    os.environ.update(settings)
+    try:
+        yield directory
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def seed_items(owner_emails: List[str], count: int):
+    """Give each load-test user ``count`` items so pagination returns full pages."""
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for user in db.query(models.User).filter(models.User.email.in_(owner_emails)):
+            db.add_all([
+                models.Item(name=f"Seed {n}", quantity=100, unit_price=1.0, owner_id=user.id)
+                for n in range(count)
+            ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def install_fake_ocr():
+    """Replace OCR with a lookup of the generated receipt, to load-test everything around it."""
+    from app import main
+    from app.services.ocr_service import OCRService
+
+    parser = OCRService()
+
+    def process_bill_image(image):
+        seed = int(image.info["seed"])
+        bill = parser.parse_bill_data(receipts.ocr_results(seed=seed, line_count=int(image.info["lines"])))
+        bill["bill_number"] = f"LOAD-{seed}"
+        return bill
+
+    main.ocr_service.process_bill_image = process_bill_image
+
+
+async def run_in_process(args) -> Dict:
+    with prepare_database():
+        from app.database import dispose_async_engine, engine
+        from app.main import app, init_schema
+
+        init_schema()
+        if args.fake_ocr:
+            install_fake_ocr()
+        # Unhandled app errors become 500 responses, as they would from a server
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://load",
+                                         timeout=args.timeout) as client:
+                return await run_seeded(client, args)
+        finally:
+            await dispose_async_engine()
+            engine.dispose()
+
+
+async def run_seeded(client: httpx.AsyncClient, args) -> Dict:
+    if args.seed_items and not args.url:
+        # Create the users first so their items can be inserted directly
+        for index in range(args.users):
+            await client.post("/users/", json={
+                "email": f"load-{index}@example.com", "business_name": "Load Test", "password": PASSWORD
+            })
+        seed_items([f"load-{index}@example.com" for index in range(args.users)], args.seed_items)
+    return await run_load(client, args)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_spawned(args) -> Dict:
+    with prepare_database():
+        from app.database import engine
+        from app.main import init_schema
+
+        init_schema()
+        engine.dispose()
+        port = free_port()
+        # The server inherits the temporary DATABASE_URL, UPLOAD_DIR and PROFILE_DIR
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=Path(__file__).resolve().parent.parent,
+            env=dict(os.environ),
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+                for _ in range(100):
+                    try:
+                        await client.get("/docs")
+                        break
+                    except httpx.TransportError:
+                        await asyncio.sleep(0.1)
+                return await run_seeded(client, args)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+async def run_remote(args) -> Dict:
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        return await run_load(client, args)
+
+
+def compare(current: Dict, previous: Dict):
+    print(f"{'scenario':<10}{'rps':>10}{'Δ':>8}{'p99 ms':>10}{'Δ':>8}{'errors':>9}")
+    for name, stats in current["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        rps, p99 = stats["throughput_rps"], stats["latency_ms"]["p99"]
+        if before and before["throughput_rps"] and before["latency_ms"]["p99"]:
+            rps_change = f"{rps / before['throughput_rps'] - 1:+.0%}"
+            p99_change = f"{p99 / before['latency_ms']['p99'] - 1:+.0%}"
+        else:
+            rps_change = p99_change = "-"
+        print(f"{name:<10}{rps:>10.1f}{rps_change:>8}{p99:>10.1f}{p99_change:>8}{stats['error_rate']:>9.1%}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Smart Inventory Scanner load test")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Base URL of a running server (default: run the app in-process)")
+    target.add_argument("--spawn", action="store_true", help="Start a local uvicorn server on a temp database")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to generate load")
+    parser.add_argument("--concurrency", type=int, default=10, help="Concurrent in-flight requests")
+    parser.add_argument("--users", type=int, default=2, help="Distinct accounts (tenants) to spread load over")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("login=1,upload=1,items=5,bills=3"),
+                        help="Scenario weights, e.g. items=5,bills=3,upload=1")
+    parser.add_argument("--page-size", type=int, default=100, help="limit for list requests")
+    parser.add_argument("--pages", type=int, default=5, help="Pages to spread list requests over")
+    parser.add_argument("--seed-items", type=int, default=500, help="Items to create per user before the run")
+    parser.add_argument("--receipt-lines", type=int, default=15, help="Item lines per generated receipt")
+    parser.add_argument("--fake-ocr", action="store_true",
+                        help="In-process only: skip OCR and use the generated receipt's known contents")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="Previous JSON report to compare with")
+    args = parser.parse_args(argv)
+    if args.fake_ocr and (args.url or args.spawn):
+        parser.error("--fake-ocr only applies to in-process runs")
+
+    if args.url:
+        result = asyncio.run(run_remote(args))
+    elif args.spawn:
+        result = asyncio.run(run_spawned(args))
+    else:
+        result = asyncio.run(run_in_process(args))
+
+    result["config"] = {
+        "target": args.url or ("spawn" if args.spawn else "in-process"),
+        "duration": args.duration,
+        "concurrency": args.concurrency,
+        "users": args.users,
+        "mix": args.mix,
+        "page_size": args.page_size,
+        "fake_ocr": args.fake_ocr,
+    }
+    report = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(report + "\n")
+    else:
+        print(report)
+
+    if args.compare:
+        compare(result, json.loads(Path(args.compare).read_text()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+receipts.py
+
+Deterministic synthetic receipts for benchmarks and tests.
+
+The same seed always yields the same items, text and pixels, so timings
+from different runs are measured on identical inputs.
+"""
+import random
+from typing import Dict, List, Tuple
+
+ITEM_NAMES = [
+    "Milk", "Bread", "Eggs", "Butter", "Cheese", "Apples", "Bananas", "Rice",
+    "Pasta", "Coffee", "Tea", "Sugar", "Flour", "Yogurt", "Chicken", "Beef",
+    "Tomatoes", "Onions", "Potatoes", "Juice", "Cereal", "Soap", "Shampoo", "Pens",
+]
+
+LINE_HEIGHT = 14  # pixels per text line before scaling
+MARGIN = 8
+
+
+def receipt_items(seed: int = 0, line_count: int = 20) -> List[Dict]:
+    """
+    Generate the line items of a receipt.
+
+    Returns:
+        list: Dicts with name, quantity and price.
+    """
+    rng = random.Random(seed)
+    return [
+        {
+            "name": f"{rng.choice(ITEM_NAMES)}{index}",
+            "quantity": rng.randint(1, 12),
+            "price": round(rng.uniform(0.5, 80.0), 2),
+        }
+        for index in range(line_count)
+    ]
+
+
+def receipt_lines(seed: int = 0, line_count: int = 20) -> List[str]:
+    """Text lines as printed on the receipt, in the format OCRService parses."""
+    items = receipt_items(seed, line_count)
+    total = sum(item["quantity"] * item["price"] for item in items)
+    return (
+        [f"Receipt # {1000 + seed}", "03/14/2024"]
+        + [f"{item['name']} x{item['quantity']} ${item['price']:.2f}" for item in items]
+        + [f"Total ${total:.2f}"]
+    )
+
+
+def parser_text(seed: int = 0, line_count: int = 20) -> str:
+    """Receipt text in the 'name qty price' format app.parser.parse_items expects."""
+    return "\n".join(
+        f"{item['name']} {item['quantity']} {item['price']:.2f}"
+        for item in receipt_items(seed, line_count)
+    )
+
+
+def ocr_results(seed: int = 0, line_count: int = 20) -> List[Tuple]:
+    """Fake easyocr output for the receipt: (bbox, text, confidence) per line."""
+    results = []
+    for index, line in enumerate(receipt_lines(seed, line_count)):
+        top = MARGIN + index * LINE_HEIGHT
+        bbox = [[MARGIN, top], [300, top], [300, top + LINE_HEIGHT], [MARGIN, top + LINE_HEIGHT]]
+        results.append((bbox, line, 0.95))
+    return results
+
+
+def render_receipt(seed: int = 0, line_count: int = 20, width: int = 400, noise: float = 0.0):
+    """
+    Render the receipt to an RGB image.
+
+    Args:
+        seed (int): Selects the items and the noise pattern.
+        line_count (int): Number of item lines.
+        width (int): Output width in pixels; height scales with it.
+        noise (float): Standard deviation of added pixel noise, as a fraction of 255.
+
+    Returns:
+        PIL.Image.Image: The rendered receipt.
+    """
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFont
+
+    lines = receipt_lines(seed, line_count)
+    base_width = 320
+    image = Image.new("L", (base_width, 2 * MARGIN + LINE_HEIGHT * len(lines)), 255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    for index, line in enumerate(lines):
+        draw.text((MARGIN, MARGIN + index * LINE_HEIGHT), line, fill=0, font=font)
+
+    scale = width / base_width
+    image = image.resize((width, max(1, round(image.height * scale))), Image.BILINEAR)
+
+    if noise:
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += np.random.default_rng(seed).normal(0, noise * 255, pixels.shape)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+    return image.convert("RGB")
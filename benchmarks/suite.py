@@ -0,0 +1,234 @@
+"""
+suite.py
+
+Benchmarks for the OCR, parsing and inventory update paths.
+
+Each benchmark is timed on deterministic synthetic receipts and compared
+with the stored baseline; the run fails when any benchmark is slower than
+its baseline by more than the threshold. Baselines are machine-specific,
+so refresh them with --update-baseline when moving to new hardware.
+
+Usage:
+    python -m benchmarks.suite                      # compare with baseline
+    python -m benchmarks.suite --update-baseline    # record a new baseline
+    python -m benchmarks.suite -k parse --threshold 0.5
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from itertools import count
+from pathlib import Path
+from typing import Callable, Dict
+
+from . import receipts
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+class Skip(Exception):
+    """Raised by a benchmark setup whose dependencies are missing."""
+
+
+def benchmark(name: str):
+    """Register a setup function returning the zero-argument callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def measure(fn: Callable, repeat: int, min_time: float = 0.2) -> float:
+    """
+    Time ``fn`` and return the best per-call duration in seconds.
+
+    The number of calls per round is grown until a round takes at least
+    ``min_time``, then the fastest of ``repeat`` rounds is kept.
+    """
+    fn()  # warm up caches and lazy imports
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 16:
+            break
+        number *= 2
+
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def _ocr_service():
+    from app.services.ocr_service import OCRService
+
+    return OCRService()
+
+
+PREPROCESS_CASES = {
+    "small": dict(width=400, line_count=20, noise=0.0),
+    "noisy": dict(width=400, line_count=20, noise=0.1),
+    "large": dict(width=1000, line_count=60, noise=0.05),
+}
+
+for _case, _options in PREPROCESS_CASES.items():
+    @benchmark(f"preprocess_image[{_case}]")
+    def _preprocess(options=_options):
+        try:
+            import cv2  # noqa: F401
+        except ImportError:
+            raise Skip("cv2 not installed")
+        service = _ocr_service()
+        image = receipts.render_receipt(seed=1, **options)
+        return lambda: service.preprocess_image(image)
+
+
+@benchmark("extract_text[small]")
+def _extract_text():
+    try:
+        import easyocr  # noqa: F401
+    except ImportError:
+        raise Skip("easyocr not installed")
+    service = _ocr_service()
+    service.load_reader()
+    image = receipts.render_receipt(seed=2, **PREPROCESS_CASES["small"])
+    return lambda: service.extract_text(image)
+
+
+@benchmark("extract_text[tall]")
+def _extract_text_tall():
+    try:
+        import easyocr  # noqa: F401
+    except ImportError:
+        raise Skip("easyocr not installed")
+    service = _ocr_service()
+    service.load_reader()
+    image = receipts.render_receipt(seed=6, width=400, line_count=150, noise=0.05)
+    return lambda: service.extract_text(image)
+
+
+for _lines in (20, 200):
+    @benchmark(f"parse_bill_data[{_lines}]")
+    def _parse_bill_data(lines=_lines):
+        service = _ocr_service()
+        results = receipts.ocr_results(seed=3, line_count=lines)
+        return lambda: service.parse_bill_data(results)
+
+
+@benchmark("parse_items[200]")
+def _parse_items():
+    from app.parser import parse_items
+
+    text = receipts.parser_text(seed=4, line_count=200)
+    return lambda: parse_items(text)
+
+
+@benchmark("update_inventory[50x1000]")
+def _update_inventory():
+    from app import inventory
+
+    path = Path(tempfile.mkdtemp(prefix="bench-")) / "inventory.csv"
+    inventory.inventory_file = str(path)
+    catalog = [{"item": f"Item{n}", "quantity": 100, "price": 1.0} for n in range(1000)]
+    inventory.update_inventory(catalog, "purchase")
+    bill = [
+        {"item": f"Item{n * 7 % 1000}", "quantity": 1, "price": 1.0}
+        for n in range(50)
+    ]
+    return lambda: inventory.update_inventory(bill, "purchase")
+
+
+@benchmark("record_bill[20]")
+def _record_bill():
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app import bills, models
+
+    db_path = Path(tempfile.mkdtemp(prefix="bench-")) / "bench.db"
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    user = models.User(email="bench@example.com", hashed_password="x", business_name="Bench")
+    db.add(user)
+    db.commit()
+
+    bill_data = _ocr_service().parse_bill_data(receipts.ocr_results(seed=5, line_count=20))
+    numbers = count()
+
+    def run():
+        bill_data["bill_number"] = f"BENCH-{next(numbers)}"
+        bills.record_bill(db, user.id, bill_data, "purchase", "bench.png")
+
+    return run
+
+
+def load_baseline() -> Dict[str, float]:
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Smart Inventory Scanner benchmarks")
+    parser.add_argument("-k", dest="keyword", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing rounds per benchmark")
+    parser.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", "0.25")),
+                        help="Allowed slowdown over baseline, as a fraction")
+    parser.add_argument("--update-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this file")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline()
+    results = {}
+    regressions = []
+
+    print(f"{'benchmark':<28}{'time':>12}{'baseline':>12}{'change':>9}")
+    for name, setup in BENCHMARKS.items():
+        if args.keyword not in name:
+            continue
+        try:
+            fn = setup()
+        except Skip as reason:
+            print(f"{name:<28}{'skipped':>12}  ({reason})")
+            continue
+
+        seconds = measure(fn, args.repeat)
+        results[name] = seconds
+        reference = baseline.get(name)
+        if reference:
+            change = seconds / reference - 1
+            flag = "  REGRESSION" if change > args.threshold else ""
+            if flag:
+                regressions.append(name)
+            print(f"{name:<28}{seconds * 1e3:>10.3f}ms{reference * 1e3:>10.3f}ms{change:>+8.0%}{flag}")
+        else:
+            print(f"{name:<28}{seconds * 1e3:>10.3f}ms{'-':>12}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.update_baseline:
+        baseline.update(results)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {BASELINE_PATH}")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,7 +27,8 @@ const BillUpload = () => {
   const onDrop = (acceptedFiles) => {
     const selectedFile = acceptedFiles[0];
     setFile(selectedFile);
-    setPreview(URL.createObjectURL(selectedFile));
+    // PDFs have no inline preview; their name is shown instead
+    setPreview(selectedFile.type.startsWith('image/') ? URL.createObjectURL(selectedFile) : null);
     setError(null);
     setSuccess(false);
   };
@@ -36,6 +37,7 @@ const BillUpload = () => {
     onDrop,
     accept: {
       'image/*': ['.jpeg', '.jpg', '.png'],
+      'application/pdf': ['.pdf'],
     },
     maxFiles: 1,
   });
@@ -117,8 +119,8 @@ const BillUpload = () => {
             <CloudUploadIcon sx={{ fontSize: 48, color: 'primary.main', mb: 1 }} />
             <Typography>
               {isDragActive
-                ? 'Drop the bill image here'
-                : 'Drag and drop a bill image here, or click to select'}
+                ? 'Drop the bill here'
+                : 'Drag and drop a bill image or PDF here, or click to select'}
             </Typography>
           </Box>
 
@@ -132,6 +134,12 @@ const BillUpload = () => {
             </Box>
           )}
 
+          {file && !preview && (
+            <Typography sx={{ mb: 2, textAlign: 'center' }}>
+              {file.name}
+            </Typography>
+          )}
+
           {error && (
             <Alert severity="error" sx={{ mb: 2 }}>
               {error}
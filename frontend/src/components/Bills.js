@@ -29,11 +29,34 @@ const Bills = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [searchTerm, setSearchTerm] = useState('');
+  const [imageUrls, setImageUrls] = useState({});
 
   useEffect(() => {
     fetchBills();
   }, []);
 
+  useEffect(() => {
+    // Signed image URLs expire after a few minutes; renew them while the page is open
+    const ids = bills.filter((bill) => bill.image_path).map((bill) => bill.id);
+    if (ids.length === 0) {
+      return undefined;
+    }
+    const fetchImageUrls = async () => {
+      try {
+        const response = await axios.get('http://localhost:8000/bills/image-urls', {
+          params: { bill_id: ids },
+          paramsSerializer: { indexes: null },
+        });
+        setImageUrls(response.data);
+      } catch (error) {
+        console.error('Error:', error);
+      }
+    };
+    fetchImageUrls();
+    const timer = setInterval(fetchImageUrls, 4 * 60 * 1000);
+    return () => clearInterval(timer);
+  }, [bills]);
+
   const fetchBills = async () => {
     try {
       const response = await axios.get('http://localhost:8000/bills/');
@@ -99,6 +122,7 @@ const Bills = () => {
             <Table>
               <TableHead>
                 <TableRow>
+                  <TableCell>Image</TableCell>
                   <TableCell>Bill Number</TableCell>
                   <TableCell>Date</TableCell>
                   <TableCell>Type</TableCell>
@@ -109,6 +133,18 @@ const Bills = () => {
               <TableBody>
                 {filteredBills.map((bill) => (
                   <TableRow key={bill.id}>
+                    <TableCell>
+                      {imageUrls[bill.id] && (
+                        <a href={imageUrls[bill.id].image} target="_blank" rel="noreferrer">
+                          <img
+                            src={imageUrls[bill.id].thumbnail}
+                            alt={`Bill ${bill.bill_number}`}
+                            loading="lazy"
+                            style={{ maxHeight: 48 }}
+                          />
+                        </a>
+                      )}
+                    </TableCell>
                     <TableCell>{bill.bill_number}</TableCell>
                     <TableCell>{formatDate(bill.bill_date)}</TableCell>
                     <TableCell>
@@ -133,7 +169,7 @@ const Bills = () => {
                 ))}
                 {filteredBills.length === 0 && (
                   <TableRow>
-                    <TableCell colSpan={5} align="center">
+                    <TableCell colSpan={6} align="center">
                       No bills found
                     </TableCell>
                   </TableRow>
@@ -35,9 +35,10 @@ const Dashboard = () => {
 
   const fetchStats = async () => {
     try {
-      const [itemsResponse, billsResponse] = await Promise.all([
+      const [itemsResponse, billsResponse, alertsResponse] = await Promise.all([
         axios.get('http://localhost:8000/items/'),
         axios.get('http://localhost:8000/bills/'),
+        axios.get('http://localhost:8000/alerts/count'),
       ]);
 
       const items = itemsResponse.data;
@@ -47,7 +48,7 @@ const Dashboard = () => {
         (sum, item) => sum + item.quantity * item.unit_price,
         0
       );
-      const lowStockItems = items.filter((item) => item.quantity < 10).length;
+      const lowStockItems = alertsResponse.data.low_stock_items;
 
       setStats({
         totalItems: items.length,
@@ -27,6 +27,51 @@ const Inventory = () => {
 
   useEffect(() => {
     fetchItems();
+
+    // Live stock updates replace polling. EventSource resumes on its own after network
+    // errors but gives up once the server refuses it (e.g. the token in the URL expired),
+    // so then open a new stream with the current token and refetch what was missed.
+    let events = null;
+    let retry = null;
+    let closed = false;
+
+    const applyStock = (event) => {
+      const { items: changed } = JSON.parse(event.data);
+      setItems((current) => {
+        const byId = new Map(current.map((item) => [item.id, item]));
+        changed.forEach((item) => {
+          // Only add items the page has not loaded when the event carries a full row
+          if (byId.has(item.id) || item.name !== undefined) {
+            byId.set(item.id, { ...byId.get(item.id), ...item });
+          }
+        });
+        return Array.from(byId.values());
+      });
+    };
+
+    const connect = () => {
+      const token = localStorage.getItem('token');
+      if (closed || !token) return;
+      events = new EventSource(
+        `http://localhost:8000/items/events?token=${encodeURIComponent(token)}`
+      );
+      events.addEventListener('stock', applyStock);
+      events.addEventListener('reset', () => fetchItems());
+      events.onerror = () => {
+        if (events.readyState !== EventSource.CLOSED) return;
+        retry = setTimeout(() => {
+          fetchItems();
+          connect();
+        }, 5000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (events) events.close();
+    };
   }, []);
 
   const fetchItems = async () => {
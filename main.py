@@ -51,14 +51,70 @@ def run_frontend(port=3000):
     else:  # Unix-like
         subprocess.run(f"PORT={port} npm start", shell=True)
 
-def run_production():
+def default_workers():
+    """Size the worker pool to the available cores."""
+    return os.cpu_count() or 1
+
+def run_production_backend(host="0.0.0.0", port=8000, workers=None, max_requests=1000,
+                           limit_concurrency=0, keep_alive=5, graceful_timeout=30):
+    """
+    Run the FastAPI backend under gunicorn with preloaded uvicorn workers.
+
+    The app is imported once in the master process (--preload) so the OCR
+    model weights are shared copy-on-write between workers, and each worker
+    is recycled after roughly max_requests requests to bound memory growth.
+    """
+    workers = workers or default_workers()
+    if workers > 1:
+        # Stock events must reach subscribers connected to any worker
+        os.environ.setdefault("FEED_BACKEND", "database")
+
+    if os.name == "nt":  # gunicorn does not run on Windows
+        cmd = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--host", host,
+            "--port", str(port),
+            "--workers", str(workers),
+            "--timeout-keep-alive", str(keep_alive)
+        ]
+        if limit_concurrency:
+            cmd += ["--limit-concurrency", str(limit_concurrency)]
+        subprocess.run(cmd, cwd=os.environ["PROJECT_ROOT"])
+        return
+
+    os.environ["LIMIT_CONCURRENCY"] = str(limit_concurrency)
+    os.environ.setdefault("OCR_PRELOAD", "True")
+    cmd = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "app.main:app",
+        "--bind", f"{host}:{port}",
+        "--workers", str(workers),
+        "--worker-class", "app.workers.ProductionUvicornWorker",
+        "--preload",
+        "--keep-alive", str(keep_alive),
+        "--graceful-timeout", str(graceful_timeout),
+        "--timeout", "120"  # OCR on large bills can take a while
+    ]
+    if max_requests:
+        cmd += [
+            "--max-requests", str(max_requests),
+            "--max-requests-jitter", str(max(1, max_requests // 10))
+        ]
+
+    subprocess.run(cmd, cwd=os.environ["PROJECT_ROOT"])
+
+def run_production(host="0.0.0.0", port=8000, **server_options):
     """Run the application in production mode."""
     # Build the frontend
-    os.chdir(os.environ["FRONTEND_DIR"])
-    subprocess.run("npm run build", shell=True)
+    subprocess.run("npm run build", shell=True, cwd=os.environ["FRONTEND_DIR"])
     
     # Run the backend server
-    run_backend(reload=False)
+    run_production_backend(host=host, port=port, **server_options)
 
 def run_development():
     """Run the application in development mode."""
@@ -112,6 +168,30 @@ def main():
         default=3000,
         help="Port for the frontend server"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of backend worker processes in production (default: CPU count)"
+    )
+    parser.add_argument(
+        "--max-requests",
+        type=int,
+        default=1000,
+        help="Recycle a production worker after this many requests (0 disables)"
+    )
+    parser.add_argument(
+        "--limit-concurrency",
+        type=int,
+        default=0,
+        help="Maximum concurrent connections per worker before returning 503 (0 disables)"
+    )
+    parser.add_argument(
+        "--keep-alive",
+        type=int,
+        default=5,
+        help="Seconds to hold idle keep-alive connections open"
+    )
     
     args = parser.parse_args()
     
@@ -120,7 +200,14 @@ def main():
     
     # Run the application
     if args.mode == "production":
-        run_production()
+        run_production(
+            host=args.host,
+            port=args.backend_port,
+            workers=args.workers,
+            max_requests=args.max_requests,
+            limit_concurrency=args.limit_concurrency,
+            keep_alive=args.keep_alive
+        )
     else:
         run_development()
 
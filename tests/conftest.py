@@ -0,0 +1,60 @@
+"""
+conftest.py
+
+Shared fixtures. Points the app at a throwaway SQLite database and upload
+directory before any app module is imported.
+"""
+import os
+import tempfile
+
+import pytest
+
+_db_dir = tempfile.mkdtemp(prefix="inventory-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ["UPLOAD_DIR"] = f"{_db_dir}/uploads"
+
+
+@pytest.fixture
+def db():
+    from app import models
+    from app.database import SessionLocal, engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def user(db):
+    from app import models
+    from app.main import get_password_hash
+
+    db_user = models.User(
+        email="owner@example.com",
+        hashed_password=get_password_hash("secret"),
+        business_name="Test Store",
+    )
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+@pytest.fixture
+def auth_headers(user):
+    from app.main import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': user.email})}"}
@@ -0,0 +1,139 @@
+"""
+test_adjustments.py
+
+Tests for bulk stock adjustments.
+"""
+import time
+
+from app import models
+
+
+def seed(db, user, count=3, quantity=20):
+    items = [
+        models.Item(name=f"Item {i}", quantity=quantity, unit_price=1.0, sku=f"SKU-{i}", owner_id=user.id)
+        for i in range(count)
+    ]
+    db.add_all(items)
+    db.commit()
+    return items
+
+
+def test_counts_and_deltas_record_movements(client, db, user, auth_headers):
+    items = seed(db, user)
+    response = client.post("/items/adjustments", headers=auth_headers, json={
+        "note": "cycle count",
+        "lines": [
+            {"item_id": items[0].id, "counted": 15},
+            {"sku": "SKU-1", "delta": -4},
+            {"sku": "SKU-1", "delta": 1},
+            {"item_id": items[2].id, "counted": 20},  # unchanged
+        ],
+    })
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["lines"], result["changed"]) == (4, 2)
+
+    db.expire_all()
+    assert [item.quantity for item in db.query(models.Item).order_by(models.Item.id)] == [15, 17, 20]
+
+    movements = client.get(f"/items/adjustments/{result['batch_id']}", headers=auth_headers).json()
+    assert [(m["reason"], m["previous_quantity"], m["quantity"], m["change"]) for m in movements] == [
+        ("count", 20, 15, -5), ("delta", 20, 16, -4), ("delta", 16, 17, 1),
+    ]
+    assert all(m["note"] == "cycle count" for m in movements)
+
+
+def test_stock_event_carries_full_items(client, db, user, auth_headers, monkeypatch):
+    from app import events
+
+    published = []
+    monkeypatch.setattr(events.change_feed, "publish", lambda *args: published.append(args))
+    items = seed(db, user, count=1)
+    client.post("/items/adjustments", headers=auth_headers, json={"lines": [{"item_id": items[0].id, "delta": 1}]})
+    _, event_type, data = published[0]
+    assert event_type == "stock"
+    assert data["items"] == [{"id": items[0].id, "name": "Item 0", "sku": "SKU-0", "quantity": 21, "unit_price": 1.0}]
+
+
+def test_unknown_items_reject_whole_request(client, db, user, auth_headers):
+    items = seed(db, user)
+    response = client.post("/items/adjustments", headers=auth_headers, json={
+        "lines": [{"item_id": items[0].id, "counted": 1}, {"sku": "NOPE", "delta": 1}],
+    })
+    assert response.status_code == 422
+    assert response.json()["detail"]["unknown"] == [{"sku": "NOPE"}]
+    db.expire_all()
+    assert db.get(models.Item, items[0].id).quantity == 20
+    assert db.query(models.StockMovement).count() == 0
+
+
+def test_lines_need_one_reference_and_one_quantity(client, db, user, auth_headers):
+    for line in ({"item_id": 1, "sku": "SKU-0", "counted": 1}, {"item_id": 1}, {"item_id": 1, "counted": -1}):
+        response = client.post("/items/adjustments", headers=auth_headers, json={"lines": [line]})
+        assert response.status_code == 422
+
+
+def test_adjustment_opens_and_resolves_alerts_and_bumps_version(client, db, user, auth_headers):
+    items = seed(db, user, count=2)
+    version = db.get(models.User, user.id).data_version
+
+    client.post("/items/adjustments", headers=auth_headers, json={
+        "lines": [{"item_id": items[0].id, "counted": 2}],
+    })
+    alerts = client.get("/alerts/", headers=auth_headers).json()
+    assert [(a["item_id"], a["quantity"]) for a in alerts] == [(items[0].id, 2)]
+
+    client.post("/items/adjustments", headers=auth_headers, json={
+        "lines": [{"item_id": items[0].id, "delta": 50}],
+    })
+    assert client.get("/alerts/", headers=auth_headers).json() == []
+
+    db.expire_all()
+    assert db.get(models.User, user.id).data_version == version + 2
+
+
+def test_large_count_is_applied_quickly(client, db, user, auth_headers):
+    seed(db, user, count=20_000)
+    lines = [{"sku": f"SKU-{i}", "counted": i % 50} for i in range(20_000)]
+    start = time.perf_counter()
+    response = client.post("/items/adjustments", headers=auth_headers, json={"lines": lines})
+    assert response.status_code == 200
+    assert time.perf_counter() - start < 10
+    assert response.json()["changed"] == 19_600
+    assert db.query(models.StockMovement).count() == 19_600
+
+
+def test_bill_committed_during_adjustment_is_kept(db, user, monkeypatch):
+    import threading
+
+    from app import adjustments, bills, schemas
+    from app.database import SessionLocal
+
+    items = seed(db, user, count=1)
+    load_items = adjustments._load_items
+
+    def record_purchase():
+        session = SessionLocal()
+        try:
+            bills.record_bill(session, user.id, {
+                "bill_number": "B-1", "bill_date": None, "total_amount": 5.0,
+                "items": [{"name": "Item 0", "quantity": 5, "price": 1.0}],
+            }, "purchase", None)
+        finally:
+            session.close()
+
+    purchase = threading.Thread(target=record_purchase)
+
+    def load_then_race(*args):
+        rows = load_items(*args)
+        # A bill arrives after the quantities were read
+        purchase.start()
+        time.sleep(0.3)
+        return rows
+
+    monkeypatch.setattr(adjustments, "_load_items", load_then_race)
+    adjustments.apply_adjustments(db, user.id, [schemas.StockAdjustmentLine(item_id=items[0].id, delta=-4)])
+    purchase.join()
+
+    db.expire_all()
+    assert db.get(models.Item, items[0].id).quantity == 21
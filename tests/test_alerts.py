@@ -0,0 +1,84 @@
+"""
+test_alerts.py
+
+Tests for incremental low-stock alerts.
+"""
+from app import models
+
+
+def open_alerts(db, item):
+    return db.query(models.StockAlert).filter(
+        models.StockAlert.item_id == item.id,
+        models.StockAlert.resolved_at.is_(None)
+    ).all()
+
+
+def test_new_low_item_raises_alert(db, user):
+    item = models.Item(name="Pen", quantity=3, unit_price=1.0, owner_id=user.id)
+    db.add(item)
+    db.commit()
+    [alert] = open_alerts(db, item)
+    assert (alert.quantity, alert.threshold, alert.owner_id) == (3, 10, user.id)
+
+
+def test_crossing_down_then_up(db, user):
+    item = models.Item(name="Pen", quantity=12, unit_price=1.0, reorder_threshold=5, owner_id=user.id)
+    db.add(item)
+    db.commit()
+    assert open_alerts(db, item) == []
+
+    item.quantity -= 8
+    db.commit()
+    assert len(open_alerts(db, item)) == 1
+
+    # Staying below the threshold does not raise a second alert
+    item.quantity -= 1
+    db.commit()
+    assert db.query(models.StockAlert).count() == 1
+
+    item.quantity += 10
+    db.commit()
+    assert open_alerts(db, item) == []
+    assert db.query(models.StockAlert).one().resolved_at is not None
+
+
+def test_only_changed_items_are_checked(db, user):
+    low = models.Item(name="Low", quantity=1, unit_price=1.0, owner_id=user.id)
+    db.add(low)
+    db.commit()
+    db.query(models.StockAlert).delete()
+    db.commit()
+
+    other = models.Item(name="Other", quantity=50, unit_price=1.0, owner_id=user.id)
+    db.add(other)
+    db.commit()
+    other.quantity -= 1
+    db.commit()
+    # The untouched low item is not re-evaluated
+    assert db.query(models.StockAlert).count() == 0
+
+
+def test_threshold_endpoint_and_alert_listing(client, db, user, auth_headers):
+    item = models.Item(name="Pen", quantity=20, unit_price=1.0, owner_id=user.id)
+    db.add(item)
+    db.commit()
+
+    response = client.put(f"/items/{item.id}/reorder-threshold", headers=auth_headers,
+                          json={"reorder_threshold": 25})
+    assert response.status_code == 200
+    assert response.json()["reorder_threshold"] == 25
+
+    alerts = client.get("/alerts/", headers=auth_headers).json()
+    assert [(alert["item_id"], alert["quantity"], alert["threshold"]) for alert in alerts] == [(item.id, 20, 25)]
+    assert client.put("/items/999/reorder-threshold", headers=auth_headers, json={}).status_code == 404
+    assert client.put(f"/items/{item.id}/reorder-threshold", headers=auth_headers,
+                      json={"reorder_threshold": -1}).status_code == 422
+
+
+def test_alert_count_is_not_capped_by_page_size(client, db, user, auth_headers):
+    db.add_all([models.Item(name=f"Item {n}", quantity=1, unit_price=1.0, owner_id=user.id) for n in range(120)])
+    db.add(models.Item(name="Plenty", quantity=50, unit_price=1.0, owner_id=user.id))
+    db.commit()
+
+    assert len(client.get("/alerts/", headers=auth_headers).json()) == 100
+    assert client.get("/alerts/count", headers=auth_headers).json() == {"low_stock_items": 120}
@@ -0,0 +1,47 @@
+"""
+test_api_inventory.py
+
+Tests for the Streamlit-facing inventory API.
+"""
+import pytest
+
+pytest.importorskip("pytesseract")
+pymupdf = pytest.importorskip("pymupdf")
+
+from fastapi.testclient import TestClient
+
+from api.main import app
+from app import inventory
+
+
+@pytest.fixture
+def api_client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(inventory, "inventory_file", str(tmp_path / "inventory.csv"))
+    return TestClient(app)
+
+
+def test_pdf_bill_uses_text_layer(api_client, monkeypatch):
+    from app import ocr
+
+    monkeypatch.setattr(ocr.pytesseract, "image_to_string", lambda image: pytest.fail("text layer was OCR'd"))
+    doc = pymupdf.open()
+    page = doc.new_page()
+    page.insert_text((50, 50), "Pen 3 1.50\nPaper 10 0.25\nThank you for shopping with us")
+    contents = doc.tobytes()
+    doc.close()
+
+    response = api_client.post("/inventory/upload-bill/", data={"bill_type": "purchase"},
+                               files={"file": ("bill.pdf", contents, "application/pdf")})
+    assert response.status_code == 200
+    assert response.json()["items"] == [
+        {"item": "Pen", "quantity": 3, "price": 1.5},
+        {"item": "Paper", "quantity": 10, "price": 0.25},
+    ]
+
+
+def test_unreadable_bills_are_rejected(api_client):
+    for name, contents in [("bill.png", b"not an image"), ("bill.pdf", b"%PDF-1.4 garbage")]:
+        response = api_client.post("/inventory/upload-bill/", data={"bill_type": "purchase"},
+                                   files={"file": (name, contents)})
+        assert response.status_code == 400, name
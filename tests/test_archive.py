@@ -0,0 +1,100 @@
+"""
+test_archive.py
+
+Tests for archiving old bills to Parquet.
+"""
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from app import archive, config, models
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_DIR", tmp_path)
+    return tmp_path
+
+
+def add_bill(db, user, item, number, date, quantity=2):
+    bill = models.Bill(bill_number=number, bill_date=date, total_amount=quantity * 1.5,
+                       bill_type="purchase", image_path=f"{number}.png", owner_id=user.id)
+    db.add(bill)
+    db.flush()
+    db.add(models.BillItem(bill_id=bill.id, item_id=item.id, quantity=quantity,
+                           unit_price=1.5, total_price=quantity * 1.5))
+    db.commit()
+    return bill
+
+
+def test_old_bills_move_to_monthly_files(db, user, archive_dir):
+    item = models.Item(name="Pen", quantity=40, unit_price=1.5, owner_id=user.id)
+    db.add(item)
+    db.commit()
+    add_bill(db, user, item, "OLD-1", datetime(2022, 3, 5))
+    add_bill(db, user, item, "OLD-2", datetime(2022, 3, 20))
+    add_bill(db, user, item, "OLD-3", datetime(2022, 4, 1))
+    add_bill(db, user, item, "NEW-1", datetime(2024, 6, 1))
+
+    assert archive.archive_bills(db, datetime(2023, 1, 1), batch_size=1) == 3
+
+    assert sorted(path.name for path in (archive_dir / f"owner={user.id}").iterdir()) == ["2022-03", "2022-04"]
+    # OLD-1 and OLD-2 were archived by different batches, each adding a part
+    assert len(list((archive_dir / f"owner={user.id}" / "2022-03").glob("part-*.parquet"))) == 2
+    assert [bill.bill_number for bill in db.query(models.Bill)] == ["NEW-1"]
+    assert db.query(models.BillItem).count() == 1
+    # Stock is not touched by archiving
+    assert db.get(models.Item, item.id).quantity == 40
+
+    march = archive.read_archived_bills(user.id, datetime(2022, 3, 1), datetime(2022, 4, 1))
+    assert [bill["bill_number"] for bill in march] == ["OLD-1", "OLD-2"]
+    assert march[0]["items"][0]["quantity"] == 2
+
+
+def test_rewriting_a_month_does_not_duplicate(db, user, archive_dir):
+    item = models.Item(name="Pen", quantity=40, unit_price=1.5, owner_id=user.id)
+    db.add(item)
+    db.commit()
+    bill = add_bill(db, user, item, "OLD-1", datetime(2022, 3, 5))
+    rows = archive.bill_rows(bill)
+    path = archive.archive_path(user.id, "2022-03")
+    assert archive.write_month(path, rows) == archive.write_month(path, rows)
+    [archived] = archive.read_archived_bills(user.id)
+    assert len(archived["items"]) == 1
+
+
+def test_history_endpoint_merges_archive_and_database(client, db, user, auth_headers):
+    item = models.Item(name="Pen", quantity=40, unit_price=1.5, owner_id=user.id)
+    db.add(item)
+    db.commit()
+    add_bill(db, user, item, "OLD-1", datetime(2022, 3, 5))
+    add_bill(db, user, item, "NEW-1", datetime(2024, 6, 1))
+    archive.archive_bills(db, datetime(2023, 1, 1))
+
+    response = client.get("/bills/history", headers=auth_headers)
+    assert [bill["bill_number"] for bill in response.json()] == ["OLD-1", "NEW-1"]
+    assert response.json()[0]["items"][0]["item_id"] == item.id
+
+    recent = client.get("/bills/history?start=2023-01-01T00:00:00", headers=auth_headers).json()
+    assert [bill["bill_number"] for bill in recent] == ["NEW-1"]
+
+
+def test_history_pages_merge_both_sources(client, db, user, auth_headers):
+    item = models.Item(name="Pen", quantity=40, unit_price=1.5, owner_id=user.id)
+    db.add(item)
+    db.commit()
+    for month in range(1, 7):
+        add_bill(db, user, item, f"OLD-{month}", datetime(2022, month, 1))
+    archive.archive_bills(db, datetime(2023, 1, 1), batch_size=4)
+    # Dated inside the archived range but still in the database
+    add_bill(db, user, item, "LATE-3", datetime(2022, 3, 15))
+    add_bill(db, user, item, "NEW-1", datetime(2024, 6, 1))
+
+    pages = [
+        [bill["bill_number"] for bill in client.get(f"/bills/history?skip={skip}&limit=3", headers=auth_headers).json()]
+        for skip in (0, 3, 6)
+    ]
+    assert pages == [["OLD-1", "OLD-2", "OLD-3"], ["LATE-3", "OLD-4", "OLD-5"], ["OLD-6", "NEW-1"]]
+    assert [bill["bill_number"] for bill in archive.read_archived_bills(user.id, limit=2)] == ["OLD-1", "OLD-2"]
@@ -0,0 +1,16 @@
+"""
+test_bills.py
+
+Tests for recording processed bills.
+"""
+from app import bills, models
+
+
+def test_unnumbered_bills_get_distinct_numbers(db, user):
+    bill_data = {"bill_number": None, "bill_date": None, "total_amount": 0.0, "items": []}
+    first, _ = bills.record_bill(db, user.id, bill_data, "purchase", None)
+    second, _ = bills.record_bill(db, user.id, bill_data, "purchase", None)
+
+    assert first.bill_number.startswith("BILL-")
+    assert first.bill_number != second.bill_number
+    assert db.query(models.Bill).count() == 2
@@ -0,0 +1,54 @@
+"""
+test_conditional_get.py
+
+Tests for ETag / If-None-Match handling on list endpoints.
+"""
+from datetime import datetime
+
+from app import cache, models
+
+
+def test_if_none_match_returns_304(client, auth_headers):
+    first = client.get("/items/", headers=auth_headers)
+    etag = first.headers["etag"]
+    second = client.get("/items/", headers={**auth_headers, "If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+
+
+def test_item_write_moves_etag(client, db, user, auth_headers):
+    etag = client.get("/items/", headers=auth_headers).headers["etag"]
+    db.add(models.Item(name="Pen", quantity=1, unit_price=1.0, owner_id=user.id))
+    db.commit()
+    response = client.get("/items/", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [item["name"] for item in response.json()] == ["Pen"]
+
+
+def test_bill_item_only_commit_moves_version(db, user):
+    bill = models.Bill(bill_number="B-1", bill_date=datetime(2024, 1, 1), total_amount=1.0,
+                       bill_type="purchase", image_path="x.png", owner_id=user.id)
+    item = models.Item(name="Pen", quantity=1, unit_price=1.0, owner_id=user.id)
+    db.add_all([bill, item])
+    db.commit()
+    version = db.get(models.User, user.id).data_version
+
+    db.add(models.BillItem(bill_id=bill.id, item_id=item.id, quantity=1, unit_price=1.0, total_price=1.0))
+    db.commit()
+    assert db.get(models.User, user.id).data_version > version
+
+
+def test_response_cache_serves_repeat_requests(client, db, user, auth_headers, monkeypatch):
+    monkeypatch.setattr(cache, "response_cache", cache.ResponseCache(8))
+    calls = []
+    import orjson
+
+    original = orjson.dumps
+    monkeypatch.setattr(orjson, "dumps", lambda payload: calls.append(1) or original(payload))
+
+    client.get("/items/", headers=auth_headers)
+    client.get("/items/", headers=auth_headers)
+    assert len(calls) == 1
+    client.get("/items/?limit=5", headers=auth_headers)
+    assert len(calls) == 2
@@ -0,0 +1,106 @@
+"""
+test_database.py
+
+Tests for the async engine setup and async list queries.
+"""
+import asyncio
+
+import pytest
+
+from app import models, queries
+from app.database import AsyncSessionLocal, async_database_url
+
+
+def test_async_database_url_swaps_driver():
+    assert async_database_url("sqlite:///./inventory.db") == "sqlite+aiosqlite:///./inventory.db"
+    assert async_database_url("postgresql://u:p@db/inventory") == "postgresql+asyncpg://u:p@db/inventory"
+    with pytest.raises(ValueError):
+        async_database_url("mysql://u:p@db/inventory")
+
+
+def test_async_queries_match_sync(db, user):
+    db.add_all([models.Item(name=f"Item {i}", quantity=i, unit_price=1.0, owner_id=user.id) for i in range(3)])
+    db.add(models.Bill(bill_number="B-1", total_amount=1.0, bill_type="purchase",
+                       image_path="bill.png", owner_id=user.id))
+    db.commit()
+
+    async def load():
+        async with AsyncSessionLocal() as session:
+            return (await queries.list_items_async(session, user.id),
+                    await queries.list_bills_async(session, user.id))
+
+    items, bills = asyncio.run(load())
+    assert items == queries.list_items(db, user.id)
+    assert bills == queries.list_bills(db, user.id)
+
+
+def test_concurrent_uploads_and_lists_succeed(db, user, auth_headers, monkeypatch):
+    import io
+    import itertools
+
+    import httpx
+    from PIL import Image
+
+    from app import database, main
+
+    # A fresh async engine: the pool's wait queue belongs to the event loop that first used it
+    monkeypatch.setattr(database, "_async_engine", None)
+    monkeypatch.setattr(database, "_async_session_factory", None)
+    numbers = itertools.count()
+    monkeypatch.setattr(main.ocr_service, "process_bill_image", lambda image: {
+        "bill_number": f"B-{next(numbers)}", "bill_date": None, "total_amount": 2.0,
+        "items": [{"name": "Pen", "quantity": 1, "price": 2.0}],
+    })
+
+    def png(seed):
+        buffer = io.BytesIO()
+        Image.new("RGB", (20, 20), (seed, 0, 0)).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=auth_headers) as client:
+            uploads = [client.post("/bills/upload/", files={"file": ("bill.png", png(n), "image/png")})
+                       for n in range(20)]
+            lists = [client.get(path) for _ in range(20) for path in ("/bills/", "/items/")]
+            responses = await asyncio.gather(*uploads, *lists)
+        await database.dispose_async_engine()
+        return [response.status_code for response in responses]
+
+    assert all(code < 500 for code in asyncio.run(run()))
+    assert db.query(models.Bill).count() == 20
+
+
+BASELINE_SCHEMA = """
+CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR UNIQUE, hashed_password VARCHAR, is_active BOOLEAN,
+                    business_name VARCHAR, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), updated_at DATETIME);
+CREATE TABLE items (id INTEGER PRIMARY KEY, name VARCHAR, description VARCHAR, quantity INTEGER, unit_price FLOAT,
+                    sku VARCHAR UNIQUE, owner_id INTEGER REFERENCES users (id),
+                    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), updated_at DATETIME);
+INSERT INTO users (id, email, hashed_password, is_active, business_name) VALUES (1, 'old@example.com', 'x', 1, 'Old');
+INSERT INTO items (name, quantity, unit_price, sku, owner_id) VALUES ('Pen', 3, 1.0, 'PEN', 1);
+"""
+
+
+def test_create_schema_upgrades_baseline_database(tmp_path):
+    import sqlite3
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    path = tmp_path / "inventory.db"
+    with sqlite3.connect(path) as connection:
+        connection.executescript(BASELINE_SCHEMA)
+    engine = create_engine(f"sqlite:///{path}")
+    models.create_schema(engine)
+    models.create_schema(engine)  # idempotent
+
+    with Session(engine) as session:
+        user = session.get(models.User, 1)
+        assert (user.data_version, user.is_admin, user.shard) == (0, False, None)
+        item = session.query(models.Item).one()
+        assert item.reorder_threshold is None
+        item.quantity = 10
+        session.commit()
+        assert session.get(models.User, 1).data_version == 1
+    engine.dispose()
@@ -0,0 +1,154 @@
+"""
+test_events.py
+
+Tests for the stock change feed.
+"""
+import asyncio
+import io
+
+from sqlalchemy import create_engine
+
+from app import events, models
+from app.events import ChangeFeed, OutboxFeed, format_sse
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_subscribers_receive_published_events():
+    async def scenario():
+        feed = ChangeFeed(history_size=10, client_buffer=10)
+        subscription, backlog = feed.subscribe(1)
+        other, _ = feed.subscribe(2)
+        feed.publish(1, "stock", {"items": []})
+        event = await asyncio.wait_for(subscription.queue.get(), 1)
+        return backlog, event, other.queue.qsize()
+
+    backlog, event, other_size = run(scenario())
+    assert backlog == []
+    assert event == {"id": 1, "event": "stock", "data": {"items": []}}
+    assert other_size == 0
+
+
+def test_resume_replays_missed_events():
+    async def scenario():
+        feed = ChangeFeed(history_size=3, client_buffer=10)
+        for n in range(5):
+            feed.publish(1, "stock", {"n": n})
+        _, resumed = feed.subscribe(1, last_event_id=3)
+        _, too_old = feed.subscribe(1, last_event_id=1)
+        _, from_restart = feed.subscribe(1, last_event_id=99)
+        return resumed, too_old, from_restart
+
+    resumed, too_old, from_restart = run(scenario())
+    assert [event["id"] for event in resumed] == [4, 5]
+    assert too_old == [{"id": 5, "event": "reset", "data": {}}]
+    assert from_restart[0]["event"] == "reset"
+
+
+def test_slow_subscriber_is_dropped():
+    async def scenario():
+        feed = ChangeFeed(history_size=10, client_buffer=2)
+        subscription, _ = feed.subscribe(1)
+        for n in range(3):
+            feed.publish(1, "stock", {"n": n})
+        await asyncio.sleep(0)
+        return subscription
+
+    assert run(scenario()).overflowed
+
+
+def outbox(tmp_path, **options):
+    engine = create_engine(f"sqlite:///{tmp_path}/feed.db")
+    models.FeedEvent.__table__.create(engine)
+    return OutboxFeed(engine, **options)
+
+
+def test_outbox_shares_events_between_workers(tmp_path):
+    async def scenario():
+        publisher = outbox(tmp_path)
+        listener = OutboxFeed(publisher.engine)
+        listener.poll_once()
+        subscription, _ = listener.subscribe(1)
+        other, _ = listener.subscribe(2)
+        event_id = publisher.publish(1, "stock", {"items": []})
+        listener.poll_once()
+        event = await asyncio.wait_for(subscription.queue.get(), 1)
+        return event_id, event, other.queue.qsize()
+
+    event_id, event, other_size = run(scenario())
+    assert event == {"id": event_id, "event": "stock", "data": {"items": []}}
+    assert other_size == 0
+
+
+def test_outbox_resume_and_prune(tmp_path):
+    async def scenario():
+        feed = outbox(tmp_path, outbox_size=3)
+        for n in range(5):
+            feed.publish(1 if n != 3 else 2, "stock", {"n": n})
+        feed.prune()
+        _, resumed = feed.subscribe(1, last_event_id=2)
+        _, too_old = feed.subscribe(1, last_event_id=1)
+        _, from_other_database = feed.subscribe(1, last_event_id=99)
+        return resumed, too_old, from_other_database
+
+    resumed, too_old, from_other_database = run(scenario())
+    assert [event["id"] for event in resumed] == [3, 5]
+    assert too_old == [{"id": 5, "event": "reset", "data": {}}]
+    assert from_other_database[0]["event"] == "reset"
+
+
+
+def test_outbox_delivers_ids_committed_out_of_order(tmp_path):
+    from sqlalchemy import insert
+
+    def commit(feed, event_id):
+        # As if a transaction that took this id earlier committed only now
+        with feed.engine.begin() as conn:
+            conn.execute(insert(feed.table).values(id=event_id, owner_id=1, event="stock", data="{}"))
+
+    async def scenario():
+        feed = outbox(tmp_path)
+        feed.poll_once()
+        subscription, _ = feed.subscribe(1)
+        commit(feed, 1)
+        commit(feed, 3)
+        feed.poll_once()
+        commit(feed, 2)
+        feed.poll_once()
+        feed.poll_once()
+        feed.gap_seconds = 0  # id 4 was rolled back: stop waiting for it
+        commit(feed, 5)
+        feed.poll_once()
+        feed.poll_once()
+        await asyncio.sleep(0)
+        return [subscription.queue.get_nowait()["id"] for _ in range(subscription.queue.qsize())], feed._gaps
+
+    delivered, gaps = run(scenario())
+    assert delivered == [1, 3, 2, 5]
+    assert gaps == {}
+
+def test_format_sse():
+    assert format_sse({"id": 7, "event": "stock", "data": {"a": 1}}) == b'id: 7\nevent: stock\ndata: {"a":1}\n\n'
+
+
+def test_upload_bill_publishes_stock_event(client, user, auth_headers, monkeypatch):
+    from PIL import Image
+    from app import main
+
+    published = []
+    monkeypatch.setattr(main.ocr_service, "process_bill_image", lambda image: {
+        "bill_number": "42", "bill_date": None, "total_amount": 6.0,
+        "items": [{"name": "Pen", "quantity": 3, "price": 2.0}],
+    })
+    monkeypatch.setattr(events.change_feed, "publish", lambda *args: published.append(args))
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (10, 10)).save(buffer, format="PNG")
+    response = client.post("/bills/upload/", headers=auth_headers,
+                           files={"file": ("bill.png", buffer.getvalue(), "image/png")})
+    assert response.status_code == 200
+    owner_id, event_type, data = published[0]
+    assert (owner_id, event_type) == (user.id, "stock")
+    assert data["items"] == [{"id": 1, "name": "Pen", "quantity": 3, "unit_price": 2.0}]
@@ -0,0 +1,223 @@
+"""
+test_image_store.py
+
+Tests for the content-addressed bill image store and image endpoints.
+"""
+import hashlib
+import io
+import random
+
+import pytest
+from PIL import Image
+
+from app import models
+from app.services.image_store import ImageStore
+from app.utils import is_pdf, parse_range
+
+
+def photo_bytes(width=1600, height=1200, seed=0) -> bytes:
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), "white")
+    for _ in range(200):
+        x, y = rng.randrange(width - 40), rng.randrange(height - 10)
+        image.paste((rng.randrange(256), 0, 0), (x, y, x + 40, y + 10))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_save_recompresses_and_deduplicates(tmp_path):
+    store = ImageStore(tmp_path, format="webp", quality=70, max_side=800)
+    contents = photo_bytes()
+
+    key = store.save(contents)
+    assert key.endswith(".webp")
+    assert store.save(contents) == key
+    assert len(list(tmp_path.rglob("*.webp"))) == 1
+
+    path = store.path(key)
+    assert path.stat().st_size < len(contents)
+    assert max(Image.open(path).size) == 800
+
+
+def test_thumbnail_is_small(tmp_path):
+    store = ImageStore(tmp_path, format="jpeg", thumbnail_size=100)
+    key = store.save(photo_bytes())
+    thumbnail = store.make_thumbnail(key)
+    assert max(Image.open(thumbnail).size) == 100
+    assert store.make_thumbnail(key) == thumbnail
+
+
+def test_path_rejects_keys_outside_store(tmp_path):
+    store = ImageStore(tmp_path)
+    assert store.path("bill.png") is None
+    assert store.path("images/../../etc/passwd") is None
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=100-", 100) is None
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+
+def test_upload_stores_image_for_review(client, db, user, auth_headers, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main.ocr_service, "process_bill_image", lambda image: {
+        "bill_number": "7", "bill_date": None, "total_amount": 0.0, "items": [],
+    })
+    contents = photo_bytes(seed=1)
+    response = client.post("/bills/upload/", headers=auth_headers,
+                           files={"file": ("bill.png", contents, "image/png")})
+    bill_id = response.json()["bill_id"]
+    bill = db.get(models.Bill, bill_id)
+    assert main.image_store.path(bill.image_path) is not None
+
+    image = client.get(f"/bills/{bill_id}/image", headers=auth_headers)
+    assert image.status_code == 200
+    assert image.headers["content-type"] == "image/webp"
+    assert "immutable" in image.headers["cache-control"]
+
+    partial = client.get(f"/bills/{bill_id}/image", headers={**auth_headers, "Range": "bytes=0-99"})
+    assert partial.status_code == 206
+    assert partial.content == image.content[:100]
+    assert partial.headers["content-range"] == f"bytes 0-99/{len(image.content)}"
+
+    cached = client.get(f"/bills/{bill_id}/image", headers={**auth_headers, "If-None-Match": image.headers["etag"]})
+    assert cached.status_code == 304
+
+    thumbnail = client.get(f"/bills/{bill_id}/thumbnail", headers=auth_headers)
+    assert thumbnail.status_code == 200
+    assert len(thumbnail.content) < len(image.content)
+
+
+def test_image_of_other_owner_is_hidden(client, db, user, auth_headers):
+    other = models.User(email="other@example.com", hashed_password="x", business_name="Other")
+    db.add(other)
+    db.flush()
+    bill = models.Bill(bill_number="X", total_amount=0.0, bill_type="purchase",
+                       image_path="images/00/none.webp", owner_id=other.id)
+    db.add(bill)
+    db.commit()
+    assert client.get(f"/bills/{bill.id}/image", headers=auth_headers).status_code == 404
+
+
+def test_upload_rejects_unsupported_files(client, auth_headers):
+    response = client.post("/bills/upload/", headers=auth_headers,
+                           files={"file": ("bill.txt", b"not a bill", "text/plain")})
+    assert response.status_code == 415
+
+
+def test_signed_image_urls(client, db, user, auth_headers, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main.ocr_service, "process_bill_image", lambda image: {
+        "bill_number": "7", "bill_date": None, "total_amount": 0.0, "items": [],
+    })
+    bill_id = client.post("/bills/upload/", headers=auth_headers,
+                          files={"file": ("bill.png", photo_bytes(seed=2), "image/png")}).json()["bill_id"]
+
+    urls = client.get(f"/bills/image-urls?bill_id={bill_id}&bill_id=999", headers=auth_headers).json()
+    assert list(urls) == [str(bill_id)]
+    assert client.get(urls[str(bill_id)]["image"]).headers["content-type"] == "image/webp"
+    assert client.get(urls[str(bill_id)]["thumbnail"]).status_code == 200
+
+    # The signature is tied to its bill and is not an access token
+    signature = urls[str(bill_id)]["image"].split("signature=")[1]
+    assert client.get(f"/bills/{bill_id + 1}/image?signature={signature}").status_code == 401
+    assert client.get("/items/", headers={"Authorization": f"Bearer {signature}"}).status_code == 401
+    # Access tokens are no longer accepted in image URLs
+    token = auth_headers["Authorization"].split()[1]
+    assert client.get(f"/bills/{bill_id}/image?token={token}").status_code == 401
+
+
+def test_failed_upload_removes_stored_image(client, db, user, auth_headers, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main.ocr_service, "process_bill_image", lambda image: {
+        "bill_number": "7", "bill_date": None, "total_amount": 0.0, "items": [],
+    })
+
+    def fail(*args):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(main.bills, "record_bill", fail)
+    contents = photo_bytes(seed=3)
+    with pytest.raises(RuntimeError):
+        client.post("/bills/upload/", headers=auth_headers, files={"file": ("bill.png", contents, "image/png")})
+    digest = hashlib.sha256(contents).hexdigest()
+    assert not list(main.image_store.root.rglob(f"{digest}.*"))
+
+    # An image that was already stored for another bill is kept
+    bill = models.Bill(bill_number="8", total_amount=0.0, bill_type="purchase",
+                       image_path=main.image_store.save(contents), owner_id=user.id)
+    db.add(bill)
+    db.commit()
+    with pytest.raises(RuntimeError):
+        client.post("/bills/upload/", headers=auth_headers, files={"file": ("bill.png", contents, "image/png")})
+    assert main.image_store.path(bill.image_path) is not None
+
+
+
+def test_release_keeps_images_held_by_other_uploads(tmp_path):
+    store = ImageStore(tmp_path)
+    contents = photo_bytes(seed=5)
+    key, created = store.add(contents)
+    assert created
+    assert store.add(contents) == (key, False)
+
+    store.release(key, unused=lambda: True)
+    assert store.path(key) is not None
+    store.release(key, unused=lambda: False)
+    assert store.path(key) is not None
+
+    key, _ = store.add(contents)
+    store.release(key, unused=lambda: True)
+    assert store.path(key) is None
+
+
+def test_failed_upload_keeps_image_of_upload_in_flight(client, auth_headers, monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main.ocr_service, "process_bill_image", lambda image: {
+        "bill_number": "7", "bill_date": None, "total_amount": 0.0, "items": [],
+    })
+    contents = photo_bytes(seed=6)
+    in_flight = []
+
+    def fail(*args):
+        # A second upload of the same file has stored it but not committed its bill yet
+        in_flight.append(main.image_store.add(contents)[0])
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(main.bills, "record_bill", fail)
+    with pytest.raises(RuntimeError):
+        client.post("/bills/upload/", headers=auth_headers, files={"file": ("bill.png", contents, "image/png")})
+    [key] = in_flight
+    assert main.image_store.path(key) is not None
+    main.image_store.release(key)
+
+def test_is_pdf_checks_contents():
+    assert is_pdf(b"%PDF-1.7\n...")
+    assert is_pdf(b"\xef\xbb\xbf%PDF-1.4\n...")
+    assert not is_pdf(b"\x89PNG\r\n\x1a\n...")
+
+
+def test_upload_rejects_unreadable_files(client, auth_headers):
+    for name, contents in [("bill.png", b"not an image"), ("bill.png", photo_bytes(seed=4)[:300]),
+                           ("bill.pdf", b"not a pdf either")]:
+        response = client.post("/bills/upload/", headers=auth_headers, files={"file": (name, contents)})
+        assert response.status_code == 400, name
+        assert "readable" in response.json()["detail"]
+
+
+def test_upload_rejects_damaged_pdf(client, auth_headers):
+    pytest.importorskip("pymupdf")
+
+    response = client.post("/bills/upload/", headers=auth_headers,
+                           files={"file": ("bill.pdf", b"%PDF-1.4 garbage", "application/pdf")})
+    assert response.status_code == 400
+    assert "readable PDF" in response.json()["detail"]
@@ -0,0 +1,45 @@
+"""
+test_import_time.py
+
+Guards the import cost of the API module.
+"""
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = {"cv2", "easyocr", "torch", "numpy", "PIL", "pymupdf", "fitz", "pyarrow"}
+# Only needed once the first request arrives
+LAZY_MODULES = {"brotli", "brotli_asgi", "aiosqlite", "asyncpg", "sqlalchemy.ext.asyncio"}
+
+
+def loaded_modules(module: str) -> set:
+    """Names in sys.modules after importing a module in a fresh interpreter."""
+    code = f"import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return set(json.loads(result.stdout))
+
+
+def import_seconds(module: str) -> float:
+    """Wall-clock time to import a module in a fresh interpreter."""
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+def test_app_main_skips_heavy_imports():
+    modules = loaded_modules("app.main")
+    assert not HEAVY_MODULES & {name.split(".")[0] for name in modules}
+    assert not LAZY_MODULES & modules
+
+
+@pytest.mark.skipif(not os.getenv("IMPORT_TIME_BUDGET"), reason="set IMPORT_TIME_BUDGET (seconds) to check")
+def test_app_main_import_budget():
+    # Wall-clock time depends on the machine, so the budget is opt-in;
+    # best of five keeps a cold disk cache from failing the run
+    best = min(import_seconds("app.main") for _ in range(5))
+    assert best < float(os.environ["IMPORT_TIME_BUDGET"])
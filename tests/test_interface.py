@@ -0,0 +1,48 @@
+"""
+test_interface.py
+
+Tests for the Streamlit upload helpers.
+"""
+import io
+
+import pytest
+
+pytest.importorskip("streamlit")
+
+from PIL import Image
+
+from webapp.interface import file_key, shrink_image
+
+
+def encode(image: Image.Image, **options) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", **options)
+    return buffer.getvalue()
+
+
+def test_file_key_depends_on_contents_and_bill_type():
+    assert file_key(b"bill", "purchase") == file_key(b"bill", "purchase")
+    assert file_key(b"bill", "purchase") != file_key(b"bill", "sale")
+    assert file_key(b"bill", "purchase") != file_key(b"other", "purchase")
+
+
+def test_shrink_image_downscales_to_jpeg():
+    data = encode(Image.effect_noise((2000, 1000), 64).convert("RGB"))
+    shrunk, suffix = shrink_image(data, max_width=500)
+    assert suffix == ".jpg"
+    assert Image.open(io.BytesIO(shrunk)).size == (500, 250)
+
+
+def test_shrink_image_applies_exif_orientation():
+    image = Image.effect_noise((2000, 1000), 64).convert("RGB")
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees
+    shrunk, suffix = shrink_image(encode(image, exif=exif), max_width=500)
+    assert suffix == ".jpg"
+    assert Image.open(io.BytesIO(shrunk)).size == (500, 1000)
+
+
+def test_shrink_image_keeps_unreadable_files():
+    assert shrink_image(b"%PDF-1.7 not an image") == (b"%PDF-1.7 not an image", None)
+    truncated = encode(Image.effect_noise((400, 400), 64).convert("RGB"))[:500]
+    assert shrink_image(truncated) == (truncated, None)
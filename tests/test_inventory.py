@@ -3,9 +3,33 @@ test_inventory.py
 
 Tests for inventory functions.
 """
+import csv
+
+import pytest
+
+from app import inventory
 from app.inventory import update_inventory
 
-def test_update_inventory_add():
+
+@pytest.fixture(autouse=True)
+def inventory_file(tmp_path, monkeypatch):
+    path = tmp_path / "inventory.csv"
+    monkeypatch.setattr(inventory, "inventory_file", str(path))
+    return path
+
+
+def read_inventory(path):
+    with open(path, newline="") as file:
+        return {row["item"]: int(row["quantity"]) for row in csv.DictReader(file)}
+
+
+def test_update_inventory_add(inventory_file):
     items = [{"item": "Pen", "quantity": 10, "price": 5.0}]
     update_inventory(items, "purchase")
-    assert True
+    assert read_inventory(inventory_file) == {"Pen": 10}
+
+
+def test_update_inventory_sale(inventory_file):
+    update_inventory([{"item": "Pen", "quantity": 10, "price": 5.0}], "purchase")
+    update_inventory([{"item": "Pen", "quantity": 4, "price": 5.0}], "sale")
+    assert read_inventory(inventory_file) == {"Pen": 6}
@@ -0,0 +1,51 @@
+"""
+test_list_responses.py
+
+Tests for the /items/ and /bills/ list endpoints.
+"""
+from datetime import datetime
+
+from app import models, schemas
+
+
+def seed(db, user, count=3):
+    items = [
+        models.Item(name=f"Item {i}", quantity=i, unit_price=1.5 * i, sku=f"SKU-{i}", owner_id=user.id)
+        for i in range(count)
+    ]
+    db.add_all(items)
+    bill = models.Bill(
+        bill_number="B-1", bill_date=datetime(2024, 1, 2), total_amount=9.0,
+        bill_type="purchase", image_path="bill.png", owner_id=user.id,
+    )
+    db.add(bill)
+    db.flush()
+    db.add_all([
+        models.BillItem(bill_id=bill.id, item_id=item.id, quantity=1, unit_price=1.0, total_price=1.0)
+        for item in items
+    ])
+    db.commit()
+    return items, bill
+
+
+def test_items_match_schema(client, db, user, auth_headers):
+    items, _ = seed(db, user)
+    response = client.get("/items/", headers=auth_headers)
+    assert response.status_code == 200
+    expected = [schemas.Item.model_validate(item).model_dump(mode="json") for item in items]
+    assert response.json() == expected
+
+
+def test_bills_include_line_items(client, db, user, auth_headers):
+    _, bill = seed(db, user)
+    response = client.get("/bills/", headers=auth_headers)
+    assert response.status_code == 200
+    db.refresh(bill)
+    assert response.json() == [schemas.Bill.model_validate(bill).model_dump(mode="json")]
+
+
+def test_large_pages_are_compressed(client, db, user, auth_headers):
+    seed(db, user, count=200)
+    response = client.get("/items/?limit=1000", headers={**auth_headers, "Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert len(response.json()) == 200
@@ -0,0 +1,68 @@
+"""
+test_load.py
+
+Smoke test for the HTTP load generator.
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from benchmarks import load
+
+
+def test_run_load_reports_each_scenario(db):
+    from app.main import app
+
+    args = argparse.Namespace(
+        users=1, duration=0.3, concurrency=2, page_size=10, pages=2, receipt_lines=3,
+        mix=load.parse_mix("login=1,items=2,bills=2"),
+    )
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+            return await load.run_load(client, args)
+
+    report = asyncio.run(scenario())["scenarios"]
+    assert set(report) == {"login", "items", "bills", "total"}
+    assert report["total"]["requests"] > 0
+    assert report["total"]["error_rate"] == 0.0
+    assert report["items"]["latency_ms"]["p99"] >= report["items"]["latency_ms"]["p50"]
+
+
+def test_unexpected_exceptions_are_counted_as_errors(db, monkeypatch):
+    from app.main import app
+
+    async def broken(client, user):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(load.SCENARIOS, "items", broken)
+    args = argparse.Namespace(
+        users=1, duration=0.2, concurrency=2, page_size=10, pages=2, receipt_lines=3,
+        mix=load.parse_mix("items=1"),
+    )
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+            return await load.run_load(client, args)
+
+    report = asyncio.run(scenario())["scenarios"]
+    assert report["items"]["error_rate"] == 1.0
+
+
+def test_prepare_database_uses_and_removes_a_temp_dir(monkeypatch):
+    import os
+
+    monkeypatch.setenv("UPLOAD_DIR", "/srv/uploads")
+    monkeypatch.delenv("PROFILE_DIR", raising=False)
+    with load.prepare_database() as directory:
+        assert os.environ["DATABASE_URL"] == f"sqlite:///{directory / 'load.db'}"
+        assert os.environ["UPLOAD_DIR"] == str(directory / "uploads")
+        assert os.environ["PROFILE_DIR"] == str(directory / "profiles")
+        (directory / "uploads").mkdir()
+        (directory / "uploads" / "bill.webp").write_bytes(b"x")
+    assert not directory.exists()
+    assert os.environ["UPLOAD_DIR"] == "/srv/uploads"
+    assert "PROFILE_DIR" not in os.environ
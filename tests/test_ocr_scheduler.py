@@ -0,0 +1,133 @@
+"""
+test_ocr_scheduler.py
+
+Tests for per-tenant fair OCR scheduling.
+"""
+import threading
+import time
+
+import pytest
+
+from app.services.ocr_scheduler import OCRQueueFull, OCRScheduler
+
+
+def test_small_tenant_is_not_starved_by_bulk_import():
+    scheduler = OCRScheduler(workers=1, per_tenant_concurrency=1, max_queue_depth=0)
+    order = []
+    gate = threading.Event()
+
+    def job(owner, n):
+        gate.wait()
+        order.append((owner, n))
+
+    bulk = [scheduler.submit(1, job, 1, n) for n in range(20)]
+    small = scheduler.submit(2, job, 2, 0)
+    gate.set()
+    small.result(timeout=5)
+    for future in bulk:
+        future.result(timeout=5)
+
+    # Only the bulk job already running and one more get ahead of tenant 2
+    assert order.index((2, 0)) <= 2
+    assert scheduler.metrics(2)[2]["completed"] == 1
+
+
+def test_per_tenant_concurrency_cap():
+    scheduler = OCRScheduler(workers=4, per_tenant_concurrency=2, max_queue_depth=0)
+    lock = threading.Lock()
+    running = {"now": 0, "peak": 0}
+
+    def job():
+        with lock:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+        time.sleep(0.01)
+        with lock:
+            running["now"] -= 1
+
+    for future in [scheduler.submit(1, job) for _ in range(8)]:
+        future.result(timeout=5)
+    assert running["peak"] == 2
+
+
+def test_queue_depth_limit():
+    scheduler = OCRScheduler(workers=1, per_tenant_concurrency=1, max_queue_depth=2)
+    gate = threading.Event()
+    scheduler.submit(1, gate.wait)  # running
+    scheduler.submit(1, gate.wait)
+    scheduler.submit(1, gate.wait)
+    with pytest.raises(OCRQueueFull):
+        scheduler.submit(1, gate.wait)
+    scheduler.submit(2, gate.wait)  # other tenants are unaffected
+    gate.set()
+    assert scheduler.metrics(1)[1]["rejected"] == 1
+
+
+def test_weights_share_workers_proportionally():
+    scheduler = OCRScheduler(workers=1, per_tenant_concurrency=1, max_queue_depth=0,
+                             weight=lambda owner: 2.0 if owner == 1 else 1.0)
+    order = []
+    gate = threading.Event()
+
+    def job(owner):
+        gate.wait()
+        order.append(owner)
+
+    futures = [scheduler.submit(owner, job, owner) for _ in range(6) for owner in (1, 2)]
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    # After the first job, tenant 1 gets two turns for each of tenant 2's
+    assert order[1:7].count(1) == 4
+
+
+def test_errors_propagate_and_free_the_worker():
+    scheduler = OCRScheduler(workers=1)
+
+    def fail():
+        raise ValueError("unreadable image")
+
+    with pytest.raises(ValueError):
+        scheduler.submit(1, fail).result(timeout=5)
+    assert scheduler.submit(1, lambda: "ok").result(timeout=5) == "ok"
+
+
+def test_cost_is_charged_against_the_quantum():
+    scheduler = OCRScheduler(workers=1, per_tenant_concurrency=1, max_queue_depth=0)
+    order = []
+    gate = threading.Event()
+
+    def job(owner):
+        gate.wait()
+        order.append(owner)
+
+    # Tenant 1's jobs are three times the work of tenant 2's
+    futures = [scheduler.submit(1, job, 1, cost=3.0) for _ in range(3)]
+    futures += [scheduler.submit(2, job, 2, cost=1.0) for _ in range(9)]
+    gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    assert order[1:9].count(2) >= 5
+
+
+def test_non_positive_weight_is_rejected():
+    scheduler = OCRScheduler(workers=1, weight=lambda owner: 0.0)
+    with pytest.raises(ValueError):
+        scheduler.submit(1, lambda: None)
+    with pytest.raises(ValueError):
+        OCRScheduler(quantum=0)
+
+
+def test_tenant_weights_setting():
+    from app import config
+
+    assert config._tenant_weights("12=2, 40=0.5") == {12: 2.0, 40: 0.5}
+    with pytest.raises(ValueError):
+        config._tenant_weights("12=0")
+
+
+def test_pixel_cost():
+    from app import config
+    from app.services.ocr_scheduler import pixel_cost
+
+    assert pixel_cost(1000, 2 * config.OCR_COST_PIXELS // 1000) == 2.0
@@ -0,0 +1,70 @@
+"""
+test_ocr_service.py
+
+Tests for strip-based OCR of tall receipts.
+"""
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from app.services.ocr_service import OCRService
+
+BARS = 32
+
+
+class BarReader:
+    """Stands in for easyocr: every dark horizontal bar is a word named after its width."""
+
+    def __init__(self):
+        self.heights = []
+
+    def readtext(self, array):
+        self.heights.append(array.shape[0])
+        dark_rows = np.flatnonzero((array < 128).any(axis=1))
+        results = []
+        for run in np.split(dark_rows, np.flatnonzero(np.diff(dark_rows) > 1) + 1):
+            if not len(run):
+                continue
+            columns = np.flatnonzero((array[run[0]:run[-1] + 1] < 128).any(axis=0))
+            x0, x1, y0, y1 = int(columns[0]), int(columns[-1]), int(run[0]), int(run[-1])
+            results.append(([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], f"w{x1 - x0 + 1}", 0.9))
+        return results
+
+
+def receipt(height=2000, width=200):
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    for i in range(BARS):
+        top = 30 + 60 * i
+        draw.rectangle((10, top, 10 + 20 + 4 * i - 1, top + 11), fill="black")
+    return image
+
+
+def service(**options):
+    ocr = OCRService(**options)
+    ocr._reader = BarReader()
+    ocr.preprocess_image = lambda image: np.array(image.convert("L"))
+    return ocr
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_tall_image_is_read_in_strips_without_duplicates(workers):
+    ocr = service(tiled_min_aspect=2.5, strip_aspect=1.0, strip_overlap=0.2, strip_workers=workers)
+    results = ocr.extract_text(receipt())
+
+    assert [text for _, text, _ in results] == [f"w{20 + 4 * i}" for i in range(BARS)]
+    assert [bbox[0][1] for bbox, _, _ in results] == [30 + 60 * i for i in range(BARS)]
+    assert max(ocr.reader.heights) == 200
+
+
+def test_strips_cover_image_and_end_at_bottom():
+    strips = list(service(strip_aspect=1.0, strip_overlap=0.25).iter_strips(receipt(height=1000)))
+    assert strips[0] == (0, 200)
+    assert strips[-1] == (800, 1000)
+    assert all(top < previous_bottom for (_, previous_bottom), (top, _) in zip(strips, strips[1:]))
+
+
+def test_short_image_is_read_whole():
+    ocr = service(tiled_min_aspect=2.5)
+    ocr.extract_text(receipt(height=400))
+    assert ocr.reader.heights == [400]
@@ -0,0 +1,70 @@
+"""
+test_pdf_service.py
+
+Tests for PDF bill ingestion.
+"""
+import pytest
+
+pymupdf = pytest.importorskip("pymupdf")
+
+from app.services.pdf_service import PDFService
+
+
+class FakeOCR:
+    def __init__(self):
+        self.images = []
+
+    def extract_text(self, image):
+        self.images.append(image.size)
+        return [([[0, 0]], f"Scanned page {len(self.images)} $1.50", 0.9)]
+
+    def parse_bill_data(self, ocr_results):
+        return list(ocr_results)
+
+
+def make_pdf(pages):
+    doc = pymupdf.open()
+    for text in pages:
+        page = doc.new_page(width=200, height=100)
+        if text:
+            page.insert_text((10, 50), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_text_layer_skips_ocr():
+    ocr = FakeOCR()
+    service = PDFService(ocr, min_text_chars=5)
+    results = service.process_bill_pdf(make_pdf(["Invoice # 42 Total $9.99"]))
+    assert ocr.images == []
+    assert results == [("Invoice # 42 Total $9.99", 1.0)]
+
+
+def test_scanned_pages_are_rasterized_in_order():
+    ocr = FakeOCR()
+    service = PDFService(ocr, dpi=36, max_workers=2, min_text_chars=5)
+    pages = list(service.iter_page_results(make_pdf(["", "Widget x2 $3.00", "", ""])))
+    assert len(pages) == 4
+    assert pages[1] == [("Widget x2 $3.00", 1.0)]
+    assert len(ocr.images) == 3
+    # 200x100pt at 36 dpi
+    assert ocr.images[0] == (100, 50)
+
+
+def test_scanned_pages_go_through_submit():
+    from concurrent.futures import Future
+
+    ocr = FakeOCR()
+    service = PDFService(ocr, dpi=36, min_text_chars=5)
+    submitted = []
+
+    def submit(fn, image):
+        submitted.append(image.size)
+        future = Future()
+        future.set_result(fn(image))
+        return future
+
+    pages = list(service.iter_page_results(make_pdf(["", "Widget x2 $3.00", ""]), submit))
+    assert len(pages) == 3
+    assert submitted == [(100, 50), (100, 50)]
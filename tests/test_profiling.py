@@ -0,0 +1,192 @@
+"""
+test_profiling.py
+
+Tests for on-demand request profiling.
+"""
+import pytest
+
+from app import config, models, profiling
+
+
+@pytest.fixture(autouse=True)
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "toggle_store", profiling.ToggleStore(tmp_path / "toggles.json"))
+    monkeypatch.setattr(profiling, "rate_limiter", profiling.RateLimiter(100))
+    return tmp_path
+
+
+@pytest.fixture
+def admin_headers(db, user):
+    from app.main import create_access_token
+
+    admin = models.User(email="admin@example.com", hashed_password="x", business_name="Admin", is_admin=True)
+    db.add(admin)
+    db.commit()
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': admin.email})}"}
+
+
+def test_admin_header_profiles_request_with_sql(client, admin_headers):
+    response = client.get("/items/", headers={**admin_headers, "X-Profile-Request": "cprofile"})
+    profile_id = response.headers["x-profile-id"]
+
+    profile = client.get(f"/admin/profiles/{profile_id}", headers=admin_headers).json()
+    assert profile["path"] == "/items/"
+    assert profile["status_code"] == 200
+    assert any("FROM users" in entry["statement"] for entry in profile["sql"])
+
+    dump = client.get(f"/admin/profiles/{profile_id}/download", headers=admin_headers)
+    assert dump.status_code == 200
+    assert dump.headers["content-disposition"].endswith(f'{profile_id}.pstats"')
+
+
+def test_header_ignored_for_non_admins(client, auth_headers):
+    response = client.get("/items/", headers={**auth_headers, "X-Profile-Request": "sample"})
+    assert "x-profile-id" not in response.headers
+    assert client.get("/admin/profiles", headers=auth_headers).status_code == 403
+
+
+def test_toggle_profiles_tenant_requests_up_to_limit(client, user, auth_headers, admin_headers):
+    toggle = client.post("/admin/profiling/toggles", headers=admin_headers, json={
+        "email": user.email, "path_prefix": "/items", "max_profiles": 1,
+    }).json()
+    assert client.get("/admin/profiling/toggles", headers=admin_headers).json()[0]["id"] == toggle["id"]
+
+    assert "x-profile-id" not in client.get("/bills/", headers=auth_headers).headers
+    first = client.get("/items/", headers=auth_headers)
+    second = client.get("/items/", headers=auth_headers)
+    assert "x-profile-id" in first.headers
+    assert "x-profile-id" not in second.headers
+
+    [profile] = client.get("/admin/profiles", headers=admin_headers).json()
+    assert profile["reason"] == f"toggle:{toggle['id']}"
+    dump = client.get(f"/admin/profiles/{profile['id']}/download", headers=admin_headers).text
+    # Folded stacks: "frame;frame;frame count" per line
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in dump.splitlines())
+
+    assert client.delete(f"/admin/profiling/toggles/{toggle['id']}", headers=admin_headers).status_code == 200
+    assert client.get("/admin/profiling/toggles", headers=admin_headers).json() == []
+
+
+def test_rate_limiter():
+    limiter = profiling.RateLimiter(2)
+    assert [limiter.acquire() for _ in range(3)] == [True, True, False]
+
+
+def test_cprofile_covers_sync_endpoint_threads(client, db, user, admin_headers):
+    import pstats
+
+    item = models.Item(name="Pen", quantity=5, unit_price=1.0, sku="PEN", owner_id=user.id)
+    db.add(item)
+    db.commit()
+    response = client.post("/items/adjustments", headers={**admin_headers, "X-Profile-Request": "cprofile"},
+                           json={"lines": [{"sku": "PEN", "delta": 1}]})
+    profile_id = response.headers["x-profile-id"]
+    stats = pstats.Stats(str(config.PROFILE_DIR / f"{profile_id}.pstats"))
+    assert any(name == "apply_adjustments" for _, _, name in stats.stats)
+
+
+def test_streaming_responses_are_not_profiled(profile_dir):
+    import asyncio
+
+    middleware = profiling.ProfilingMiddleware(None, token_subject=lambda token: "admin@example.com",
+                                               is_admin=lambda email: True)
+
+    async def stream_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        await send({"type": "http.response.body", "body": b"data: 1\n\n"})
+
+    async def send(message):
+        sent.append(message)
+
+    sent = []
+    middleware.app = stream_app
+    scope = {"type": "http", "method": "GET", "path": "/items/events",
+             "headers": [(b"authorization", b"Bearer x"), (b"x-profile-request", b"sample")]}
+    asyncio.run(middleware(scope, None, send))
+    assert b"x-profile-id" not in dict(sent[0]["headers"])
+    assert profiling.list_profiles(profile_dir) == []
+    assert middleware._busy.acquire(blocking=False)
+
+
+def test_profiles_stop_at_time_limit(profile_dir, monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(config, "PROFILE_MAX_SECONDS", 0.05)
+    middleware = profiling.ProfilingMiddleware(None, token_subject=lambda token: "admin@example.com",
+                                               is_admin=lambda email: True)
+
+    async def slow_app(scope, receive, send):
+        await asyncio.sleep(0.2)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware.app = slow_app
+    scope = {"type": "http", "method": "GET", "path": "/items/",
+             "headers": [(b"authorization", b"Bearer x"), (b"x-profile-request", b"cprofile")]}
+    asyncio.run(middleware(scope, None, send))
+    [profile] = profiling.list_profiles(profile_dir)
+    assert profile["truncated"]
+    assert profile["duration_ms"] < 200
+
+
+def test_prune_keeps_newest_profiles(tmp_path):
+    import os
+
+    for n in range(4):
+        (tmp_path / f"{n}.json").write_text("{}")
+        (tmp_path / f"{n}.folded").write_text("")
+        os.utime(tmp_path / f"{n}.json", (n, n))
+    (tmp_path / "toggles.json").write_text("[]")
+    profiling.prune_profiles(tmp_path, keep=2)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "2.folded", "2.json", "3.folded", "3.json", "toggles.json",
+    ]
+
+
+def test_cprofile_pdf_upload_enables_one_profiler_at_a_time(client, admin_headers, monkeypatch):
+    import cProfile
+    import threading
+
+    pymupdf = pytest.importorskip("pymupdf")
+    from app import main
+
+    class SingleProfile(cProfile.Profile):
+        """Fails like Python 3.12+ when a second profiler is enabled."""
+        enabled = set()
+        lock = threading.Lock()
+
+        def enable(self, *args, **kwargs):
+            with self.lock:
+                if self.enabled - {id(self)}:
+                    raise ValueError("Another profiling tool is already active")
+                self.enabled.add(id(self))
+            super().enable(*args, **kwargs)
+
+        def disable(self):
+            super().disable()
+            with self.lock:
+                self.enabled.discard(id(self))
+
+    monkeypatch.setattr(profiling, "EXCLUSIVE_CPROFILE", True)
+    monkeypatch.setattr(profiling.cProfile, "Profile", SingleProfile)
+    monkeypatch.setattr(main.ocr_service, "extract_text", lambda image: [([[0, 0]], "Pen $1.00", 0.9)])
+    monkeypatch.setattr(main.ocr_service, "parse_bill_data", lambda results: {
+        "bill_number": "PDF-1", "bill_date": None, "total_amount": 1.0, "items": [],
+    })
+    doc = pymupdf.open()
+    for _ in range(3):
+        doc.new_page(width=200, height=100)  # blank pages go through OCR threads
+    contents = doc.tobytes()
+    doc.close()
+
+    response = client.post("/bills/upload/", headers={**admin_headers, "X-Profile-Request": "cprofile"},
+                           files={"file": ("bill.pdf", contents, "application/pdf")})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    assert (config.PROFILE_DIR / f"{profile_id}.pstats").exists()
+    assert not SingleProfile.enabled
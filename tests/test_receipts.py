@@ -0,0 +1,27 @@
+"""
+test_receipts.py
+
+Tests for the synthetic receipt generator used by the benchmarks.
+"""
+from app.parser import parse_items
+from app.services.ocr_service import OCRService
+from benchmarks import receipts
+
+
+def test_generator_is_deterministic():
+    first = receipts.render_receipt(seed=7, line_count=5, width=300, noise=0.1)
+    second = receipts.render_receipt(seed=7, line_count=5, width=300, noise=0.1)
+    assert first.tobytes() == second.tobytes()
+    assert first.width == 300
+    assert receipts.receipt_items(seed=7) != receipts.receipt_items(seed=8)
+
+
+def test_generated_text_parses_back():
+    items = receipts.receipt_items(seed=3, line_count=10)
+    parsed = parse_items(receipts.parser_text(seed=3, line_count=10))
+    assert [(p["item"], p["quantity"], p["price"]) for p in parsed] == \
+        [(i["name"], i["quantity"], i["price"]) for i in items]
+
+    bill = OCRService().parse_bill_data(receipts.ocr_results(seed=3, line_count=10))
+    assert bill["bill_number"] == "1003"
+    assert [i["quantity"] for i in bill["items"][:10]] == [i["quantity"] for i in items]
@@ -0,0 +1,87 @@
+"""
+test_sharding.py
+
+Tests for per-tenant shard routing and moves.
+"""
+import pytest
+
+from app import models, sharding
+
+
+@pytest.fixture
+def shards(monkeypatch, tmp_path):
+    shard_set = sharding.ShardSet(2, f"sqlite:///{tmp_path}/shard-{{shard}}.db")
+    shard_set.create_all()
+    monkeypatch.setattr(sharding, "shard_set", shard_set)
+    return shard_set
+
+
+def register(client, email):
+    client.post("/users/", json={"email": email, "business_name": "Shop", "password": "secret"})
+    token = client.post("/token", data={"username": email, "password": "secret"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_owner_data_is_routed_to_their_shard(client, db, shards):
+    headers = register(client, "sharded@example.com")
+    user = db.query(models.User).filter(models.User.email == "sharded@example.com").one()
+    assert user.shard == user.id % 2
+
+    with shards.sessionmakers[user.shard]() as shard_db:
+        assert shard_db.get(models.User, user.id).email == user.email
+        shard_db.add(models.Item(name="Tape", quantity=5, unit_price=1.0, sku="T-1", owner_id=user.id))
+        shard_db.commit()
+
+    first = client.get("/items/", headers=headers)
+    assert [item["name"] for item in first.json()] == ["Tape"]
+    assert db.query(models.Item).count() == 0
+
+    client.post("/items/adjustments", headers=headers, json={"lines": [{"sku": "T-1", "delta": 3}]})
+    second = client.get("/items/", headers=headers)
+    assert second.json()[0]["quantity"] == 8
+    assert second.headers["etag"] != first.headers["etag"]
+
+
+def test_current_user_comes_from_the_directory(client, db, shards):
+    headers = register(client, "promoted@example.com")
+    user = db.query(models.User).filter(models.User.email == "promoted@example.com").one()
+    user.is_admin = True  # changed in the directory only; the shard's copy is stale
+    db.commit()
+    assert client.get("/admin/profiles", headers=headers).status_code == 200
+
+
+def test_move_tenant_copies_and_remaps(client, db, shards):
+    headers = register(client, "mover@example.com")
+    user = db.query(models.User).filter(models.User.email == "mover@example.com").one()
+    source, target = user.shard, 1 - user.shard
+
+    with shards.sessionmakers[source]() as shard_db:
+        item = models.Item(name="Glue", quantity=4, unit_price=2.0, sku="G-1", owner_id=user.id)
+        bill = models.Bill(bill_number="M-1", total_amount=8.0, bill_type="purchase",
+                           image_path="", owner_id=user.id)
+        shard_db.add_all([item, bill])
+        shard_db.flush()
+        shard_db.add(models.BillItem(bill_id=bill.id, item_id=item.id, quantity=4, unit_price=2.0, total_price=8.0))
+        shard_db.commit()
+
+    sharding.move_tenant(user.id, target)
+
+    db.expire_all()
+    assert db.get(models.User, user.id).shard == target
+    with shards.sessionmakers[source]() as shard_db:
+        assert shard_db.query(models.Item).count() == 0
+        assert shard_db.get(models.User, user.id) is None
+    bills = client.get("/bills/", headers=headers).json()
+    items = client.get("/items/", headers=headers).json()
+    assert [item["name"] for item in items] == ["Glue"]
+    assert bills[0]["items"][0]["item_id"] == items[0]["id"]
+
+
+def test_plan_moves_places_and_balances():
+    loads = {1: (0, 100), 2: (0, 60), 3: (0, 10), 4: (None, 30)}
+    moves = dict(sharding.plan_moves(loads, 2))
+    assert moves[4] == 1
+    totals = [0, 0]
+    for owner_id, (shard, weight) in loads.items():
+        totals[moves.get(owner_id, shard)] += weight
+    assert totals == [100, 100]
@@ -2,21 +2,99 @@
 interface.py
 
 Streamlit interface for uploading bills and viewing results.
+
+Streamlit reruns this script on every widget interaction, so uploads only
+happen when the form is submitted, and each result is remembered in the
+session by file hash and bill type so the same bill is never sent twice.
+Images are shrunk to the width OCR needs before upload; PDFs are sent as they are.
+
+Run with ``streamlit run webapp/interface.py``.
 """
-import streamlit as st
+import hashlib
+import io
+import os
+
 import requests
+import streamlit as st
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+API_URL = os.getenv("BACKEND_URL", "http://127.0.0.1:8000") + "/inventory/upload-bill/"
+OCR_TARGET_WIDTH = int(os.getenv("OCR_TARGET_WIDTH", "1280"))  # pixels
+JPEG_QUALITY = int(os.getenv("UPLOAD_JPEG_QUALITY", "85"))
+
+
+def file_key(data: bytes, bill_type: str) -> str:
+    return f"{bill_type}:{hashlib.sha256(data).hexdigest()}"
+
+
+def shrink_image(data: bytes, max_width: int = OCR_TARGET_WIDTH, quality: int = JPEG_QUALITY):
+    """
+    Downscale an image to at most ``max_width`` and recompress it as JPEG.
+
+    Returns:
+        tuple: (bytes, filename suffix). The original bytes are kept when
+        recompressing would not make them smaller, or when PIL cannot read
+        them; the backend then decides whether the file is usable.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        # Phone photos are often stored sideways with an EXIF orientation tag
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        if image.width > max_width:
+            height = round(image.height * max_width / image.width)
+            image = image.resize((max_width, height), Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    except (UnidentifiedImageError, OSError):
+        return data, None
+    if buffer.tell() >= len(data):
+        return data, None
+    return buffer.getvalue(), ".jpg"
+
+
+def upload(name: str, data: bytes, bill_type: str) -> dict:
+    payload, suffix = shrink_image(data)
+    if suffix:
+        name = os.path.splitext(name)[0] + suffix
+    response = requests.post(API_URL, files={"file": (name, payload)}, data={"bill_type": bill_type})
+    response.raise_for_status()
+    return response.json()
+
+
+def main():
+    st.title("Smart Inventory Scanner")
+
+    results = st.session_state.setdefault("results", {})
+
+    with st.form("upload"):
+        uploaded_files = st.file_uploader("Upload Bills", type=["jpg", "png", "jpeg", "pdf"],
+                                          accept_multiple_files=True)
+        bill_type = st.selectbox("Bill Type", ["purchase", "sale"])
+        submitted = st.form_submit_button("Process Bills")
+
+    if submitted and uploaded_files:
+        progress = st.progress(0.0, text="Processing bills...")
+        for index, uploaded_file in enumerate(uploaded_files, start=1):
+            data = uploaded_file.getvalue()
+            key = file_key(data, bill_type)
+            if key not in results:
+                try:
+                    results[key] = {"name": uploaded_file.name,
+                                    "response": upload(uploaded_file.name, data, bill_type)}
+                except requests.RequestException as exc:
+                    # Failures are not cached so the bill can be retried
+                    st.error(f"Failed to process {uploaded_file.name}: {exc}")
+            progress.progress(index / len(uploaded_files), text=f"Processed {index} of {len(uploaded_files)}")
+        progress.empty()
 
-st.title("Smart Inventory Scanner")
+    for uploaded_file in uploaded_files or []:
+        result = results.get(file_key(uploaded_file.getvalue(), bill_type))
+        if result:
+            st.success(f"Inventory Updated from {result['name']}!")
+            st.json(result["response"])
 
-uploaded_file = st.file_uploader("Upload Bill Image", type=["jpg", "png", "jpeg"])
-bill_type = st.selectbox("Bill Type", ["purchase", "sale"])
 
-if uploaded_file and bill_type:
-    files = {"file": uploaded_file.getvalue()}
-    data = {"bill_type": bill_type}
-    response = requests.post("http://127.0.0.1:8000/inventory/upload-bill/", files={"file": uploaded_file}, data=data)
-    if response.ok:
-        st.success("Inventory Updated!")
-        st.json(response.json())
-    else:
-        st.error("Failed to process bill.")
+# Streamlit runs the script as __main__; importing it (e.g. in tests) only defines the helpers
+if __name__ == "__main__":
+    main()